@@ -22,3 +22,51 @@ module "dynamodb_table" {
 
   tags = var.tags
 }
+
+# optional table of /search results shared by all lambda_search containers.
+# items expire via DynamoDB TTL on ExpiresAt. see python/rekognition_api/search_cache.py
+module "dynamodb_search_cache_table" {
+  source  = "terraform-aws-modules/dynamodb-table/aws"
+  version = "~> 5.0"
+  count   = var.aws_search_cache_dynamodb ? 1 : 0
+
+  name                        = local.search_cache_table_name
+  hash_key                    = "CacheKey"
+  table_class                 = "STANDARD"
+  deletion_protection_enabled = false
+  billing_mode                = "PAY_PER_REQUEST"
+  ttl_enabled                 = true
+  ttl_attribute_name          = "ExpiresAt"
+
+  attributes = [
+    {
+      name = "CacheKey"
+      type = "S"
+    }
+  ]
+
+  tags = var.tags
+}
+
+# ingest ledger of indexed S3 objects, keyed by bucket/key/ETag.
+# see python/rekognition_api/index_ledger.py
+module "dynamodb_index_ledger_table" {
+  source  = "terraform-aws-modules/dynamodb-table/aws"
+  version = "~> 5.0"
+  count   = var.aws_index_ledger ? 1 : 0
+
+  name                        = local.index_ledger_table_name
+  hash_key                    = "LedgerKey"
+  table_class                 = "STANDARD"
+  deletion_protection_enabled = false
+  billing_mode                = "PAY_PER_REQUEST"
+
+  attributes = [
+    {
+      name = "LedgerKey"
+      type = "S"
+    }
+  ]
+
+  tags = var.tags
+}
@@ -17,7 +17,20 @@
     },
     {
       "Effect": "Allow",
-      "Action": ["dynamodb:PutItem"],
+      "Action": ["s3:PutObject", "s3:DeleteObject"],
+      "Resource": ["${s3_bucket_arn}/${aws_faceprint_snapshot_prefix}/*"]
+    },
+    {
+      "Effect": "Allow",
+      "Action": ["s3:ListBucket"],
+      "Resource": ["${s3_bucket_arn}"],
+      "Condition": {
+        "StringLike": {"s3:prefix": ["${aws_faceprint_snapshot_prefix}/*"]}
+      }
+    },
+    {
+      "Effect": "Allow",
+      "Action": ["dynamodb:PutItem", "dynamodb:BatchWriteItem"],
       "Resource": [
         "${dynamodb_table_arn}/*"
       ]
@@ -2,10 +2,11 @@ locals {
   lambda_role_name   = "${var.shared_resource_identifier}-lambda"
   lambda_policy_name = "${var.shared_resource_identifier}-lambda"
   iam_policy_lambda = templatefile("${path.module}/json/iam_policy_lambda.json.tpl", {
-    s3_bucket_arn      = module.s3_bucket.s3_bucket_arn
-    dynamodb_table_arn = module.dynamodb_table.dynamodb_table_arn
-    aws_region         = var.aws_region
-    aws_account_id     = var.aws_account_id
+    s3_bucket_arn                 = module.s3_bucket.s3_bucket_arn
+    dynamodb_table_arn            = module.dynamodb_table.dynamodb_table_arn
+    aws_region                    = var.aws_region
+    aws_account_id                = var.aws_account_id
+    aws_faceprint_snapshot_prefix = var.aws_faceprint_snapshot_prefix
   })
 }
 
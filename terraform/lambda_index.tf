@@ -30,6 +30,7 @@ resource "aws_lambda_function" "index" {
   environment {
     variables = {
       DEBUG_MODE                             = var.debug_mode
+      DEBUG_LOG_SAMPLE_PERCENT               = var.debug_log_sample_percent
       AWS_REKOGNITION_COLLECTION_ID          = local.aws_rekognition_collection_id
       AWS_DYNAMODB_TABLE_ID                  = local.table_name
       MAX_FACES_COUNT                        = var.aws_rekognition_max_faces_count
@@ -37,6 +38,12 @@ resource "aws_lambda_function" "index" {
       AWS_REKOGNITION_FACE_DETECT_ATTRIBUTES = var.aws_rekognition_face_detect_attributes
       QUALITY_FILTER                         = var.aws_rekognition_face_detect_quality_filter
       AWS_DEPLOYED                           = true
+      AWS_ACCOUNT_ID                         = data.aws_caller_identity.current.account_id
+      AWS_S3_BUCKET_NAME                     = module.s3_bucket.s3_bucket_id
+      AWS_INDEX_LEDGER_TABLE_ID              = var.aws_index_ledger ? local.index_ledger_table_name : ""
+      AWS_REKOGNITION_INDEX_FACES_TPS        = var.aws_rekognition_index_faces_tps
+      AWS_FACEPRINT_SNAPSHOT_ENABLED         = var.aws_faceprint_snapshot
+      AWS_FACEPRINT_SNAPSHOT_PREFIX          = var.aws_faceprint_snapshot_prefix
     }
   }
 }
@@ -78,11 +85,15 @@ resource "aws_lambda_permission" "s3_permission_to_trigger_lambda" {
 resource "aws_s3_bucket_notification" "incoming_jpg" {
   bucket = module.s3_bucket.s3_bucket_id
 
-  lambda_function {
-    lambda_function_arn = aws_lambda_function.index.arn
-    events              = ["s3:ObjectCreated:*"]
-    #filter_suffix       = ".jpg"
-    #filter_prefix       = ""
+  # one notification per image suffix, so that the faceprint snapshot's own objects,
+  # ie snapshot.bin and its .json deltas, do not invoke lambda_index
+  dynamic "lambda_function" {
+    for_each = toset(var.aws_s3_index_suffixes)
+    content {
+      lambda_function_arn = aws_lambda_function.index.arn
+      events              = ["s3:ObjectCreated:*"]
+      filter_suffix       = lambda_function.value
+    }
   }
 
   depends_on = [
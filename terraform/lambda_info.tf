@@ -41,7 +41,10 @@ resource "aws_lambda_function" "info" {
       AWS_REKOGNITION_FACE_DETECT_ATTRIBUTES = var.aws_rekognition_face_detect_attributes
       AWS_DYNAMODB_TABLE_ID                  = local.table_name
       AWS_DEPLOYED                           = true
+      AWS_ACCOUNT_ID                         = data.aws_caller_identity.current.account_id
+      AWS_S3_BUCKET_NAME                     = module.s3_bucket.s3_bucket_id
       AWS_REKOGNITION_COLLECTION_ID          = local.aws_rekognition_collection_id
+      AWS_INFO_CACHE_TTL                     = var.aws_info_cache_ttl
     }
   }
 }
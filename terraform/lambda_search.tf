@@ -32,13 +32,26 @@ resource "aws_lambda_function" "search" {
   environment {
     variables = {
       DEBUG_MODE                             = var.debug_mode
+      DEBUG_LOG_SAMPLE_PERCENT               = var.debug_log_sample_percent
       MAX_FACES_COUNT                        = var.aws_rekognition_max_faces_count
       AWS_REKOGNITION_FACE_DETECT_THRESHOLD  = var.aws_rekognition_face_detect_threshold
       QUALITY_FILTER                         = var.aws_rekognition_face_detect_quality_filter
       AWS_REKOGNITION_FACE_DETECT_ATTRIBUTES = var.aws_rekognition_face_detect_attributes
       AWS_DYNAMODB_TABLE_ID                  = local.table_name
       AWS_DEPLOYED                           = true
+      AWS_ACCOUNT_ID                         = data.aws_caller_identity.current.account_id
+      AWS_S3_BUCKET_NAME                     = module.s3_bucket.s3_bucket_id
+      AWS_SEARCH_CACHE_TTL                   = var.aws_search_cache_ttl
+      AWS_SEARCH_CACHE_MAX_SIZE              = var.aws_search_cache_max_size
+      AWS_SEARCH_CACHE_TABLE_ID              = var.aws_search_cache_dynamodb ? local.search_cache_table_name : ""
       AWS_REKOGNITION_COLLECTION_ID          = local.aws_rekognition_collection_id
+      AWS_REKOGNITION_SEARCH_FACES_TPS       = var.aws_rekognition_search_faces_tps
+      AWS_FACEPRINT_SNAPSHOT_ENABLED         = var.aws_faceprint_snapshot
+      AWS_FACEPRINT_SNAPSHOT_PREFIX          = var.aws_faceprint_snapshot_prefix
+      AWS_SEARCH_PREPROCESS_ENABLED          = var.aws_search_preprocess
+      AWS_SEARCH_PREPROCESS_MAX_DIMENSION    = var.aws_search_preprocess_max_dimension
+      # preprocessed images are shrunk below Rekognition's 5 MiB limit, so accept up to API Gateway's 10 MB
+      AWS_SEARCH_MAX_PAYLOAD_BYTES           = var.aws_search_preprocess ? 10485760 : 5242880
     }
   }
 }
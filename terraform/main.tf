@@ -9,4 +9,6 @@
 locals {
   aws_rekognition_collection_id = "${var.shared_resource_identifier}-collection"
   table_name                    = var.shared_resource_identifier
+  search_cache_table_name       = "${var.shared_resource_identifier}-search-cache"
+  index_ledger_table_name       = "${var.shared_resource_identifier}-index-ledger"
 }
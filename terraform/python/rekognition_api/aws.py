@@ -1,8 +1,22 @@
 # -*- coding: utf-8 -*-
-"""A utility class for introspecting AWS infrastructure."""
+"""
+A utility class for introspecting AWS infrastructure.
+
+dump, returned by /info, is assembled from one section per enabled service.
+The sections are independent, so they run concurrently on a thread pool of
+aws_info_max_workers threads, and lookups that more than one section makes,
+ie apigateway get_rest_apis(), are memoized for the duration of the dump.
+Each Lambda container caches the assembled dump for aws_info_cache_ttl
+seconds. get_dump(refresh=True), ie /info?refresh=true, rebuilds it.
+"""
 
 # python stuff
 import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
 
 # our stuff
 from rekognition_api.conf import Services, settings
@@ -13,36 +27,123 @@ from rekognition_api.utils import recursive_sort_dict
 class AWSInfrastructureConfig:
     """AWS Infrastructure Config"""
 
+    def __init__(self):
+        self._dump = None
+        self._dump_lock = threading.Lock()
+        self._lookups = None
+        self._lookups_lock = threading.Lock()
+
     @property
     def dump(self):
         """Return a dict of the AWS infrastructure config."""
-        retval = {}
-        if Services.enabled(Services.AWS_APIGATEWAY):
-            api = self.get_api(settings.aws_apigateway_name)
-            retval["apigateway"] = {
-                "api_id": api.get("id"),
-                "stage": self.get_api_stage(),
-                "domains": self.get_api_custom_domains(),
-            }
-        if Services.enabled(Services.AWS_S3):
-            retval["s3"] = {"bucket_name": self.get_bucket_by_prefix(settings.aws_s3_bucket_name)}
-        if Services.enabled(Services.AWS_DYNAMODB):
-            retval["dynamodb"] = {"table_name": self.get_dyanmodb_table_by_name(settings.aws_dynamodb_table_id)}
-        if Services.enabled(Services.AWS_REKOGNITION):
-            retval["rekognition"] = {
-                "collection_id": self.get_rekognition_collection_by_id(settings.aws_rekognition_collection_id)
-            }
-        if Services.enabled(Services.AWS_IAM):
-            retval["iam"] = {"policies": self.get_iam_policies(), "roles": self.get_iam_roles()}
-        if Services.enabled(Services.AWS_LAMBDA):
-            retval["lambda"] = self.get_lambdas()
-        if Services.enabled(Services.AWS_ROUTE53):
-            retval["route53"] = self.get_dns_record_from_hosted_zone()
+        return self.get_dump()
+
+    def get_dump(self, refresh: bool = False) -> dict:
+        """
+        Return the cached dict of the AWS infrastructure config, building it
+        when it is missing, older than aws_info_cache_ttl seconds, or when
+        refresh is True. An aws_info_cache_ttl of 0 disables the cache.
+        """
+        use_cache = not refresh and settings.aws_info_cache_ttl
+        cached = self._dump
+        if use_cache and cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+        with self._dump_lock:
+            # another thread may have built the dump while this one waited for the lock
+            cached = self._dump
+            if use_cache and cached is not None and time.monotonic() < cached[1]:
+                return cached[0]
+            retval = self.build_dump()
+            self._dump = (retval, time.monotonic() + settings.aws_info_cache_ttl) if settings.aws_info_cache_ttl else None
+        return retval
+
+    def invalidate_dump(self) -> None:
+        """Discard the cached dump."""
+        with self._dump_lock:
+            self._dump = None
+
+    def get_dump_sections(self) -> Dict[str, Callable[[], Any]]:
+        """Return the dump section resolvers of the enabled services, keyed by section name."""
+        sections = {
+            "apigateway": (Services.AWS_APIGATEWAY, self.get_apigateway_section),
+            "s3": (Services.AWS_S3, lambda: {"bucket_name": self.get_bucket_by_prefix(settings.aws_s3_bucket_name)}),
+            "dynamodb": (
+                Services.AWS_DYNAMODB,
+                lambda: {"table_name": self.get_dyanmodb_table_by_name(settings.aws_dynamodb_table_id)},
+            ),
+            "rekognition": (
+                Services.AWS_REKOGNITION,
+                lambda: {
+                    "collection_id": self.get_rekognition_collection_by_id(settings.aws_rekognition_collection_id)
+                },
+            ),
+            "iam": (Services.AWS_IAM, lambda: {"policies": self.get_iam_policies(), "roles": self.get_iam_roles()}),
+            "lambda": (Services.AWS_LAMBDA, self.get_lambdas),
+            "route53": (Services.AWS_ROUTE53, self.get_dns_record_from_hosted_zone),
+        }
+        return {name: resolver for name, (service, resolver) in sections.items() if Services.enabled(service)}
+
+    def build_dump(self) -> dict:
+        """Build the dict of the AWS infrastructure config, one concurrent section per enabled service."""
+        sections = self.get_dump_sections()
+        with self.memoized_lookups(), ThreadPoolExecutor(max_workers=settings.aws_info_max_workers) as executor:
+            futures = {name: executor.submit(resolver) for name, resolver in sections.items()}
+            retval = {name: future.result() for name, future in futures.items()}
         return recursive_sort_dict(retval)
 
+    @contextmanager
+    def memoized_lookups(self):
+        """Memoize the lookups made with lookup() until the context exits."""
+        with self._lookups_lock:
+            self._lookups = {}
+        try:
+            yield
+        finally:
+            with self._lookups_lock:
+                self._lookups = None
+
+    def lookup(self, name: str, resolver: Callable[[], Any]) -> Any:
+        """
+        Return resolver(), memoized as name inside memoized_lookups(). When
+        sections look up the same name concurrently, the first one calls
+        resolver() and the others wait for its result.
+        """
+        future, owner = None, False
+        with self._lookups_lock:
+            if self._lookups is not None:
+                future = self._lookups.get(name)
+                owner = future is None
+                if owner:
+                    future = self._lookups[name] = Future()
+        if future is None:
+            return resolver()
+        if owner:
+            try:
+                future.set_result(resolver())
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                future.set_exception(e)
+        return future.result()
+
+    def fan_out(self, func: Callable[[Any], Any], items: list) -> list:
+        """Return [func(item) for item in items], called concurrently."""
+        if len(items) < 2:
+            return [func(item) for item in items]
+        # a pool of its own, since waiting on the dump's pool from one of its sections could deadlock
+        with ThreadPoolExecutor(max_workers=min(len(items), settings.aws_info_max_workers)) as executor:
+            return list(executor.map(func, items))
+
+    def get_apigateway_section(self) -> dict:
+        """Return the apigateway section of the dump."""
+        api = self.get_api(settings.aws_apigateway_name)
+        return {
+            "api_id": api.get("id"),
+            "stage": self.get_api_stage(),
+            "domains": self.get_api_custom_domains(),
+        }
+
     def get_lambdas(self):
         """Return a dict of the AWS Lambdas."""
-        lambda_client = settings.aws_session.client("lambda")
+        lambda_client = settings.get_aws_client("lambda")
         lambdas = lambda_client.list_functions()["Functions"]
         rekognition_lambdas = {
             lambda_function["FunctionName"]: lambda_function["FunctionArn"]
@@ -53,34 +154,34 @@ class AWSInfrastructureConfig:
 
     def get_iam_policies(self):
         """Return a dict of the AWS IAM policies."""
-        iam_client = settings.aws_session.client("iam")
+        iam_client = settings.get_aws_client("iam")
+        # list_policies() returns the DefaultVersionId of each policy, so get_policy() is not needed
         policies = iam_client.list_policies()["Policies"]
-        rekognition_policies = {}
-        for policy in policies:
-            if settings.shared_resource_identifier in policy["PolicyName"]:
-                policy_version = iam_client.get_policy(PolicyArn=policy["Arn"])["Policy"]["DefaultVersionId"]
-                policy_document = iam_client.get_policy_version(PolicyArn=policy["Arn"], VersionId=policy_version)[
-                    "PolicyVersion"
-                ]["Document"]
-                rekognition_policies[policy["PolicyName"]] = {"Arn": policy["Arn"], "Policy": policy_document}
-        return rekognition_policies
+        policies = [policy for policy in policies if settings.shared_resource_identifier in policy["PolicyName"]]
+
+        def get_policy_document(policy):
+            return iam_client.get_policy_version(PolicyArn=policy["Arn"], VersionId=policy["DefaultVersionId"])[
+                "PolicyVersion"
+            ]["Document"]
+
+        return {
+            policy["PolicyName"]: {"Arn": policy["Arn"], "Policy": policy_document}
+            for policy, policy_document in zip(policies, self.fan_out(get_policy_document, policies))
+        }
 
     def get_iam_roles(self):
         """Return a dict of the AWS IAM roles."""
-        iam_client = settings.aws_session.client("iam")
+        iam_client = settings.get_aws_client("iam")
         roles = iam_client.list_roles()["Roles"]
-        rekognition_roles = {}
-        for role in roles:
-            if settings.shared_resource_identifier in role["RoleName"]:
-                attached_policies = iam_client.list_attached_role_policies(RoleName=role["RoleName"])[
-                    "AttachedPolicies"
-                ]
-                rekognition_roles[role["RoleName"]] = {
-                    "Arn": role["Arn"],
-                    "Role": role,
-                    "AttachedPolicies": attached_policies,
-                }
-        return rekognition_roles or {}
+        roles = [role for role in roles if settings.shared_resource_identifier in role["RoleName"]]
+
+        def get_attached_policies(role):
+            return iam_client.list_attached_role_policies(RoleName=role["RoleName"])["AttachedPolicies"]
+
+        return {
+            role["RoleName"]: {"Arn": role["Arn"], "Role": role, "AttachedPolicies": attached_policies}
+            for role, attached_policies in zip(roles, self.fan_out(get_attached_policies, roles))
+        }
 
     def get_api_stage(self) -> str:
         """Return the API stage."""
@@ -156,7 +257,7 @@ class AWSInfrastructureConfig:
 
     def api_exists(self, api_name: str) -> bool:
         """Test that the API Gateway exists."""
-        response = settings.aws_apigateway_client.get_rest_apis()
+        response = self.lookup("apigateway.get_rest_apis", settings.aws_apigateway_client.get_rest_apis)
 
         for item in response["items"]:
             if item["name"] == api_name:
@@ -165,7 +266,7 @@ class AWSInfrastructureConfig:
 
     def get_api(self, api_name: str) -> dict:
         """Test that the API Gateway exists."""
-        response = settings.aws_apigateway_client.get_rest_apis()
+        response = self.lookup("apigateway.get_rest_apis", settings.aws_apigateway_client.get_rest_apis)
 
         for item in response["items"]:
             if item["name"] == api_name:
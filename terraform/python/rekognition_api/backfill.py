@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk, resumable indexing of the images that are already in S3.
+
+lambda_index only sees objects as they are uploaded. backfill indexes an
+existing archive in place, with the same code path as lambda_index
+(lambda_index.process_record(), ie the ingest ledger, get_faces() and
+persist_faceprints()), so images that are already indexed are skipped.
+
+Keys are streamed either from a bucket listing (the list_objects_v2
+paginator) or from an S3 Inventory manifest (CSV format), and indexed on a
+bounded thread pool. Progress is checkpointed, every checkpoint_interval
+seconds and on exit, to a local JSON file or to a DynamoDB table, so that a
+crashed or interrupted run resumes where it stopped. The checkpoint only
+ever advances past keys whose records have completed, so resuming never
+skips an image; at worst a few are handed to the ledger a second time.
+
+Failed records are logged and counted but not retried by the run itself.
+Run it again without its checkpoint to retry them; the ingest ledger skips
+everything that was indexed.
+
+usage:
+    python -m rekognition_api.backfill --prefix photos/ --max-workers 16
+    python -m rekognition_api.backfill --inventory s3://inventory-bucket/path/manifest.json \\
+        --checkpoint dynamodb://rekognition-backfill
+"""
+
+# python stuff
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+from urllib.parse import quote_plus, unquote_plus
+
+# our stuff
+from rekognition_api.conf import settings
+from rekognition_api.const import THROTTLING_ERROR_CODES
+from rekognition_api.exceptions import RekognitionValueError
+from rekognition_api.lambda_index import process_record
+from rekognition_api.utils import parse_s3_uri
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+DYNAMODB_CHECKPOINT_SCHEME = "dynamodb://"
+
+
+def is_image_key(key: str, suffixes=IMAGE_SUFFIXES) -> bool:
+    """is the key an image that Rekognition can index?"""
+    return key.lower().endswith(tuple(suffixes))
+
+
+class BucketSource:
+    """The objects under a prefix of a bucket, in key order, from list_objects_v2."""
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def name(self) -> str:
+        """a name that identifies this source in a checkpoint"""
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def iter_objects(self, position: int = 0, last_key: Optional[str] = None) -> Iterator[tuple]:
+        """
+        yield (position, bucket, key, size, eTag) of every object after last_key.
+        Listing is in key order, so last_key alone is enough to resume.
+        """
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix}
+        if last_key:
+            kwargs["StartAfter"] = last_key
+        paginator = settings.aws_s3_client.meta.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**kwargs):
+            for obj in page.get("Contents", []):
+                position += 1
+                yield position, self.bucket, obj["Key"], obj.get("Size"), obj.get("ETag", "").strip('"') or None
+
+
+class InventorySource:
+    """
+    The objects listed by an S3 Inventory report, from its manifest.json.
+    Only the CSV format is supported; ORC and Parquet need a columnar reader.
+    see https://docs.aws.amazon.com/AmazonS3/latest/userguide/storage-inventory-location.html
+    """
+
+    def __init__(self, manifest_uri: str):
+        self.manifest_uri = manifest_uri
+
+    @property
+    def name(self) -> str:
+        """a name that identifies this source in a checkpoint"""
+        return self.manifest_uri
+
+    def get_manifest(self) -> dict:
+        """return the parsed manifest.json"""
+        bucket, key = parse_s3_uri(self.manifest_uri)
+        body = settings.aws_s3_client.meta.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        manifest = json.loads(body)
+        if manifest.get("fileFormat", "CSV").upper() != "CSV":
+            raise RekognitionValueError(f"unsupported S3 Inventory format: {manifest['fileFormat']}. Use CSV.")
+        return manifest
+
+    def iter_objects(self, position: int = 0, last_key: Optional[str] = None) -> Iterator[tuple]:
+        """
+        yield (position, bucket, key, size, eTag) of every inventory row after
+        the first position rows. Inventory files are not in global key order,
+        so the row count is what resumes.
+        """
+        # pylint: disable=unused-argument
+        manifest = self.get_manifest()
+        columns = [column.strip() for column in manifest["fileSchema"].split(",")]
+        manifest_bucket, _ = parse_s3_uri(self.manifest_uri)
+        s3_client = settings.aws_s3_client.meta.client
+        row_number = 0
+        for inventory_file in manifest["files"]:
+            body = s3_client.get_object(Bucket=manifest_bucket, Key=inventory_file["key"])["Body"]
+            with gzip.open(body, mode="rt", encoding="utf-8", newline="") as rows:
+                for row in csv.reader(rows):
+                    row_number += 1
+                    if row_number <= position:
+                        continue
+                    values = dict(zip(columns, row))
+                    size = values.get("Size")
+                    yield (
+                        row_number,
+                        values["Bucket"],
+                        # inventory keys are URL-encoded
+                        unquote_plus(values["Key"]),
+                        int(size) if size else None,
+                        values.get("ETag") or None,
+                    )
+
+
+class FileCheckpoint:
+    """Backfill progress, in a local JSON file that is replaced atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        """return the saved state, or an empty dict"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def save(self, state: dict) -> None:
+        """save the state"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as file:
+            json.dump(state, file, indent=2)
+        os.replace(file.name, self.path)
+
+
+class DynamoDBCheckpoint:
+    """
+    Backfill progress, as one item of a DynamoDB table. The table only needs
+    a string hash key, of any name, so an existing table can be reused.
+    """
+
+    def __init__(self, table_id: str, run_id: str):
+        self.table = settings.get_dynamodb_table(table_id)
+        self.key = {self.table.key_schema[0]["AttributeName"]: f"backfill#{run_id}"}
+
+    def load(self) -> dict:
+        """return the saved state, or an empty dict"""
+        item = self.table.get_item(Key=self.key, ConsistentRead=True).get("Item")
+        return json.loads(item["State"]) if item else {}
+
+    def save(self, state: dict) -> None:
+        """save the state"""
+        self.table.put_item(Item={**self.key, "State": json.dumps(state)})
+
+
+def get_checkpoint(checkpoint: str, run_id: str):
+    """return a DynamoDBCheckpoint for dynamodb://<table>, and a FileCheckpoint otherwise"""
+    if checkpoint.startswith(DYNAMODB_CHECKPOINT_SCHEME):
+        return DynamoDBCheckpoint(checkpoint[len(DYNAMODB_CHECKPOINT_SCHEME) :], run_id)
+    return FileCheckpoint(checkpoint)
+
+
+class ThrottleCounter:
+    """Counts throttled api calls, which botocore retries, by hooking the clients' needs-retry events."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._clients = []
+
+    def __call__(self, response=None, **kwargs):
+        # return None, so that botocore's own retry handler decides
+        if response is not None and response[1].get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+            with self._lock:
+                self.count += 1
+
+    def register(self, client) -> None:
+        """count the throttles of a boto3 client. other clients, ie the local Rekognition stand-in, are ignored"""
+        events = getattr(getattr(client, "meta", None), "events", None)
+        if events is not None:
+            events.register("needs-retry", self)
+            self._clients.append(client)
+
+    def unregister(self) -> None:
+        """stop counting"""
+        for client in self._clients:
+            client.meta.events.unregister("needs-retry", self)
+        self._clients = []
+
+
+def get_event_record(bucket: str, key: str, size: Optional[int], etag: Optional[str]) -> dict:
+    """return an S3 event record for the object, as lambda_index receives it"""
+    return {
+        "eventSource": "aws:s3",
+        "eventName": "ObjectCreated:Put",
+        "s3": {
+            "bucket": {"name": bucket},
+            "object": {"key": quote_plus(key), "size": size, "eTag": etag},
+        },
+    }
+
+
+class Backfill:
+    """
+    Index every image of a source, on max_workers threads, checkpointing
+    progress. At most max_workers * 4 records are in flight at a time.
+    """
+
+    def __init__(
+        self,
+        source,
+        checkpoint,
+        max_workers: int = 16,
+        reindex: bool = False,
+        limit: Optional[int] = None,
+        checkpoint_interval: float = 10.0,
+        suffixes=IMAGE_SUFFIXES,
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.source = source
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self.reindex = reindex
+        self.limit = limit
+        self.checkpoint_interval = checkpoint_interval
+        self.suffixes = suffixes
+        self.throttles = ThrottleCounter()
+        self.state = {}
+        # throughput is reported for this run only, the counts in state are cumulative
+        self.run_images = 0
+        self.run_faces = 0
+
+    def load_state(self) -> dict:
+        """return the checkpointed state of this source, or a fresh one"""
+        state = self.checkpoint.load()
+        if state.get("source") != self.source.name:
+            state = {}
+        return {
+            "source": self.source.name,
+            "position": state.get("position", 0),
+            "lastKey": state.get("lastKey"),
+            "completed": False,
+            "images": state.get("images", 0),
+            "indexed": state.get("indexed", 0),
+            "skipped": state.get("skipped", 0),
+            "failed": state.get("failed", 0),
+            "faces": state.get("faces", 0),
+            "throttles": state.get("throttles", 0),
+            "dynamodbRetries": state.get("dynamodbRetries", 0),
+            "elapsedSeconds": state.get("elapsedSeconds", 0.0),
+        }
+
+    def add_result(self, position: int, key: str, result: Optional[dict]) -> None:
+        """advance the state past a completed object. result is None for objects that are not images"""
+        self.state["position"] = position
+        self.state["lastKey"] = key
+        if result is None:
+            return
+        self.state["images"] += 1
+        self.run_images += 1
+        if result["error"]:
+            self.state["failed"] += 1
+            logger.warning("backfill failed to index %s: %s", key, result["error"])
+        elif result["skipped"]:
+            self.state["skipped"] += 1
+        else:
+            self.state["indexed"] += 1
+        self.state["faces"] += result["facesIndexed"]
+        self.run_faces += result["facesIndexed"]
+        self.state["dynamodbRetries"] += result["dynamodbRetries"]
+
+    def metrics(self, elapsed: float) -> dict:
+        """return the state, with throughput and throttles"""
+        elapsed = max(elapsed, 1e-9)
+        return {
+            **self.state,
+            "throttles": self.state["throttles"] + self.throttles.count,
+            "elapsedSeconds": round(self.state["elapsedSeconds"] + elapsed, 3),
+            "imagesPerSecond": round(self.run_images / elapsed, 2),
+            "facesPerSecond": round(self.run_faces / elapsed, 2),
+        }
+
+    def save(self, start: float) -> dict:
+        """checkpoint the state, and return its metrics"""
+        metrics = self.metrics(time.monotonic() - start)
+        self.checkpoint.save({key: value for key, value in metrics.items() if not key.endswith("PerSecond")})
+        return metrics
+
+    def run(self) -> dict:
+        """index the source, from its checkpoint. returns the run's metrics"""
+        self.state = self.load_state()
+        self.throttles.register(settings.aws_rekognition_client)
+        self.throttles.register(settings.dynamodb_table.meta.client)
+        start = last_checkpoint = time.monotonic()
+        submitted = 0
+        window = deque()
+
+        def drain(block: bool):
+            while window and (block or window[0][2] is None or window[0][2].done()):
+                position, key, future = window.popleft()
+                self.add_result(position, key, future.result() if future is not None else None)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backfill") as executor:
+                objects = self.source.iter_objects(self.state["position"], self.state["lastKey"])
+                for position, bucket, key, size, etag in objects:
+                    if self.limit is not None and submitted >= self.limit:
+                        break
+                    future = None
+                    if is_image_key(key, self.suffixes):
+                        record = get_event_record(bucket, key, size, etag)
+                        future = executor.submit(process_record, record, self.reindex)
+                        submitted += 1
+                    window.append((position, key, future))
+                    drain(block=len(window) >= self.max_workers * 4)
+                    if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                        metrics = self.save(start)
+                        logger.info("backfill progress: %s", json.dumps(metrics))
+                        last_checkpoint = time.monotonic()
+                else:
+                    self.state["completed"] = True
+                drain(block=True)
+        finally:
+            # KeyboardInterrupt and crashes alike: checkpoint what has completed
+            drain(block=True)
+            metrics = self.save(start)
+            self.throttles.unregister()
+        return metrics
+
+
+def main(argv=None):
+    """index every image in a bucket prefix or S3 Inventory report"""
+    parser = argparse.ArgumentParser(description="Index the images that are already in S3, resumably.")
+    parser.add_argument("--bucket", help="bucket to list (default: the Rekognition bucket)")
+    parser.add_argument("--prefix", default="", help="key prefix to list")
+    parser.add_argument("--inventory", help="s3:// uri of an S3 Inventory manifest.json, instead of listing")
+    parser.add_argument(
+        "--checkpoint",
+        default=".backfill-checkpoint.json",
+        help="checkpoint file, or dynamodb://<table> (default .backfill-checkpoint.json)",
+    )
+    parser.add_argument("--max-workers", type=int, default=16, help="concurrent records (default 16)")
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0, help="seconds between checkpoints")
+    parser.add_argument("--limit", type=int, help="stop after this many images")
+    parser.add_argument("--reindex", action="store_true", help="index images that are already indexed")
+    parser.add_argument(
+        "--suffixes", default=",".join(IMAGE_SUFFIXES), help=f"image key suffixes (default {','.join(IMAGE_SUFFIXES)})"
+    )
+    args = parser.parse_args(argv)
+
+    if args.inventory:
+        source = InventorySource(args.inventory)
+    else:
+        source = BucketSource(args.bucket or settings.aws_s3_bucket_name, args.prefix)
+    backfill = Backfill(
+        source,
+        get_checkpoint(args.checkpoint, run_id=source.name),
+        max_workers=args.max_workers,
+        reindex=args.reindex,
+        limit=args.limit,
+        checkpoint_interval=args.checkpoint_interval,
+        suffixes=[suffix.strip().lower() for suffix in args.suffixes.split(",") if suffix.strip()],
+    )
+    json.dump(backfill.run(), sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
@@ -17,24 +17,39 @@ configuration values. This is useful for debugging and logging.
 """
 
 # python stuff
+import importlib.metadata
 import importlib.util
 import logging
 import os  # library for interacting with the operating system
 import platform  # library to view information about the server host this Lambda runs on
 import re
-from typing import Any, Dict, List, Optional, Tuple, Union
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 # 3rd party stuff
 import boto3  # AWS SDK for Python https://boto3.amazonaws.com/v1/documentation/api/latest/index.html
-import pkg_resources
-from botocore.config import Config
+from botocore.config import Config as BotocoreConfig
 from botocore.exceptions import ProfileNotFound
 from dotenv import load_dotenv
-from pydantic import Field, SecretStr, ValidationError, ValidationInfo, field_validator
+from pydantic import (
+    AliasChoices,
+    Field,
+    PrivateAttr,
+    SecretStr,
+    ValidationError,
+    ValidationInfo,
+    field_validator,
+)
 from pydantic_settings import BaseSettings
 
 # our stuff
-from rekognition_api.const import HERE, IS_USING_TFVARS, TFVARS
+from rekognition_api.const import (
+    HERE,
+    IS_USING_TFVARS,
+    get_tfvars,
+    get_tfvars_defaults,
+)
 from rekognition_api.exceptions import (
     RekognitionConfigurationError,
     RekognitionValueError,
@@ -43,7 +58,7 @@ from rekognition_api.utils import recursive_sort_dict
 
 
 logger = logging.getLogger(__name__)
-TFVARS = TFVARS or {}
+TFVARS = get_tfvars_defaults()
 DOT_ENV_LOADED = load_dotenv()
 
 
@@ -148,6 +163,9 @@ class SettingsDefaults:
     SHARED_RESOURCE_IDENTIFIER = TFVARS.get("shared_resource_identifier", "rekognition")
     DEBUG_MODE: bool = bool(TFVARS.get("debug_mode", False))
     DUMP_DEFAULTS: bool = bool(TFVARS.get("dump_defaults", True))
+    # debug_mode diagnostics logging. see structured_logging.py
+    DEBUG_LOG_SAMPLE_PERCENT: int = int(TFVARS.get("debug_log_sample_percent", 100))
+    DEBUG_LOG_MAX_FIELD_LENGTH: int = int(TFVARS.get("debug_log_max_field_length", 512))
 
     # aws auth
     AWS_PROFILE = TFVARS.get("aws_profile", None)
@@ -172,6 +190,90 @@ class SettingsDefaults:
     AWS_REKOGNITION_FACE_DETECT_ATTRIBUTES = TFVARS.get("aws_rekognition_face_detect_attributes", "DEFAULT")
     AWS_REKOGNITION_FACE_DETECT_QUALITY_FILTER = TFVARS.get("aws_rekognition_face_detect_quality_filter", "AUTO")
 
+    # "aws", or "local" for an in-memory stand-in. see local_rekognition.py
+    AWS_REKOGNITION_BACKEND = TFVARS.get("aws_rekognition_backend", "aws")
+    AWS_REKOGNITION_LOCAL_LATENCY_MS: int = int(TFVARS.get("aws_rekognition_local_latency_ms", 0))
+    AWS_REKOGNITION_LOCAL_FACES_COUNT: int = int(TFVARS.get("aws_rekognition_local_faces_count", 1))
+
+    # client-side rate limits of the Rekognition client, in TPS per process. 0 is unlimited. see rate_limiter.py
+    AWS_REKOGNITION_RATE_LIMIT_ENABLED: bool = bool(TFVARS.get("aws_rekognition_rate_limit_enabled", True))
+    AWS_REKOGNITION_INDEX_FACES_TPS: int = int(TFVARS.get("aws_rekognition_index_faces_tps", 50))
+    AWS_REKOGNITION_SEARCH_FACES_TPS: int = int(TFVARS.get("aws_rekognition_search_faces_tps", 50))
+    AWS_REKOGNITION_MAX_ATTEMPTS: int = int(TFVARS.get("aws_rekognition_max_attempts", 8))
+
+    # botocore connection profiles of the S3, DynamoDB and Rekognition clients. see Settings.get_botocore_config()
+    # max_pool_connections 0 sizes the pool to the most concurrent requests that the thread pools can make.
+    # timeouts are in seconds, and are kept well under the Lambda timeout so that a hung read is retried.
+    AWS_S3_MAX_POOL_CONNECTIONS: int = int(TFVARS.get("aws_s3_max_pool_connections", 0))
+    AWS_S3_RETRY_MODE = TFVARS.get("aws_s3_retry_mode", "standard")
+    AWS_S3_MAX_ATTEMPTS: int = int(TFVARS.get("aws_s3_max_attempts", 5))
+    AWS_S3_CONNECT_TIMEOUT: int = int(TFVARS.get("aws_s3_connect_timeout", 5))
+    AWS_S3_READ_TIMEOUT: int = int(TFVARS.get("aws_s3_read_timeout", 30))
+    AWS_S3_TCP_KEEPALIVE: bool = bool(TFVARS.get("aws_s3_tcp_keepalive", True))
+    AWS_DYNAMODB_MAX_POOL_CONNECTIONS: int = int(TFVARS.get("aws_dynamodb_max_pool_connections", 0))
+    AWS_DYNAMODB_RETRY_MODE = TFVARS.get("aws_dynamodb_retry_mode", "standard")
+    AWS_DYNAMODB_MAX_ATTEMPTS: int = int(TFVARS.get("aws_dynamodb_max_attempts", 10))
+    AWS_DYNAMODB_CONNECT_TIMEOUT: int = int(TFVARS.get("aws_dynamodb_connect_timeout", 5))
+    AWS_DYNAMODB_READ_TIMEOUT: int = int(TFVARS.get("aws_dynamodb_read_timeout", 10))
+    AWS_DYNAMODB_TCP_KEEPALIVE: bool = bool(TFVARS.get("aws_dynamodb_tcp_keepalive", True))
+    AWS_REKOGNITION_MAX_POOL_CONNECTIONS: int = int(TFVARS.get("aws_rekognition_max_pool_connections", 0))
+    AWS_REKOGNITION_RETRY_MODE = TFVARS.get("aws_rekognition_retry_mode", "standard")
+    AWS_REKOGNITION_CONNECT_TIMEOUT: int = int(TFVARS.get("aws_rekognition_connect_timeout", 5))
+    AWS_REKOGNITION_READ_TIMEOUT: int = int(TFVARS.get("aws_rekognition_read_timeout", 30))
+    AWS_REKOGNITION_TCP_KEEPALIVE: bool = bool(TFVARS.get("aws_rekognition_tcp_keepalive", True))
+
+    # cache of values derived from aws api calls (account id, api gateway domain, etc)
+    AWS_CACHE_TTL: int = int(TFVARS.get("aws_cache_ttl", 3600))
+
+    # lambda_search request defaults. Rekognition accepts image Bytes of up to 5 MiB
+    AWS_SEARCH_MAX_PAYLOAD_BYTES: int = int(TFVARS.get("aws_search_max_payload_bytes", 5 * 1024 * 1024))
+
+    # lambda_search image preprocessing defaults. see image_preprocessing.py
+    AWS_SEARCH_PREPROCESS_ENABLED: bool = bool(TFVARS.get("aws_search_preprocess_enabled", False))
+    AWS_SEARCH_PREPROCESS_MAX_DIMENSION: int = int(TFVARS.get("aws_search_preprocess_max_dimension", 1920))
+    AWS_SEARCH_PREPROCESS_JPEG_QUALITY: int = int(TFVARS.get("aws_search_preprocess_jpeg_quality", 90))
+
+    # lambda_search multi-face search defaults
+    AWS_SEARCH_MULTI_FACE_MAX_FACES: int = int(TFVARS.get("aws_search_multi_face_max_faces", 20))
+    AWS_SEARCH_MULTI_FACE_MAX_WORKERS: int = int(TFVARS.get("aws_search_multi_face_max_workers", 8))
+
+    # lambda_search result cache defaults
+    AWS_SEARCH_CACHE_MAX_SIZE: int = int(TFVARS.get("aws_search_cache_max_size", 256))
+    AWS_SEARCH_CACHE_TTL: int = int(TFVARS.get("aws_search_cache_ttl", 300))
+    AWS_SEARCH_CACHE_TABLE_ID = TFVARS.get("aws_search_cache_table_id", None)
+
+    # lambda_index ingest ledger defaults
+    AWS_INDEX_LEDGER_TABLE_ID = TFVARS.get("aws_index_ledger_table_id", None)
+    AWS_INDEX_REINDEX: bool = bool(TFVARS.get("aws_index_reindex", False))
+
+    # concurrency of the async Lambda handlers. see lambda_index.async_lambda_handler()
+    AWS_ASYNC_MAX_CONCURRENCY: int = int(TFVARS.get("aws_async_max_concurrency", 16))
+
+    # lambda_search faceprint snapshot defaults. see face_snapshot.py
+    AWS_FACEPRINT_SNAPSHOT_ENABLED: bool = bool(TFVARS.get("aws_faceprint_snapshot_enabled", False))
+    AWS_FACEPRINT_SNAPSHOT_PREFIX = TFVARS.get("aws_faceprint_snapshot_prefix", "snapshots/faceprints")
+    AWS_FACEPRINT_SNAPSHOT_MAX_DELTAS: int = int(TFVARS.get("aws_faceprint_snapshot_max_deltas", 256))
+
+    # compression of http response bodies, for requests that send Accept-Encoding. see utils.http_response_factory()
+    AWS_RESPONSE_COMPRESSION_ENABLED: bool = bool(TFVARS.get("aws_response_compression_enabled", True))
+    AWS_RESPONSE_COMPRESSION_MIN_BYTES: int = int(TFVARS.get("aws_response_compression_min_bytes", 1024))
+
+    # per-stage latency metrics of the Lambda handlers, in CloudWatch Embedded Metric Format. see metrics.py
+    AWS_METRICS_ENABLED: bool = bool(TFVARS.get("aws_metrics_enabled", True))
+    AWS_METRICS_NAMESPACE = TFVARS.get("aws_metrics_namespace", SHARED_RESOURCE_IDENTIFIER)
+    AWS_METRICS_SERVER_TIMING_ENABLED: bool = bool(TFVARS.get("aws_metrics_server_timing_enabled", False))
+
+    # lambda_info aws infrastructure introspection. see aws.AWSInfrastructureConfig.get_dump()
+    AWS_INFO_CACHE_TTL: int = int(TFVARS.get("aws_info_cache_ttl", 300))
+    AWS_INFO_MAX_WORKERS: int = int(TFVARS.get("aws_info_max_workers", 8))
+
+    # aws s3 defaults
+    AWS_S3_FETCH_OBJECT_METADATA: bool = bool(TFVARS.get("aws_s3_fetch_object_metadata", True))
+
+    # aws lambda defaults
+    AWS_LAMBDA_FUNCTION_MEMORY_SIZE: int = int(TFVARS.get("lambda_memory_size", 256))
+    AWS_LAMBDA_INDEX_MAX_WORKERS: int = int(TFVARS.get("lambda_index_max_workers", 0))
+
     @classmethod
     def to_dict(cls):
         """Convert SettingsDefaults to dict"""
@@ -182,11 +284,30 @@ class SettingsDefaults:
         }
 
 
-AWS_REGIONS = []
-if Services.enabled(Services.AWS_EC2):
-    ec2 = boto3.Session().client("ec2")
-    regions = ec2.describe_regions()
-    AWS_REGIONS = [region["RegionName"] for region in regions["Regions"]]
+# eg us-east-1, eu-central-2, us-gov-west-1, cn-northwest-1
+AWS_REGION_PATTERN = re.compile(r"^[a-z]{2}(-[a-z]+)+-\d+$")
+
+# see https://boto3.amazonaws.com/v1/documentation/api/latest/guide/retries.html
+BOTOCORE_RETRY_MODES = ("legacy", "standard", "adaptive")
+
+
+def get_aws_regions(session: boto3.Session = None) -> List[str]:
+    """
+    Return the list of AWS region codes known to botocore.
+
+    Regions are read from the endpoint data bundled with botocore rather than
+    from ec2.describe_regions(), so this never makes an AWS api call. Pass the
+    session that is about to create clients so that the endpoint data it loads
+    is shared with them.
+    """
+    session = session or boto3.Session()
+    return sorted(
+        {
+            region
+            for partition in session.get_available_partitions()
+            for region in session.get_available_regions("ec2", partition_name=partition)
+        }
+    )
 
 
 def empty_str_to_bool_default(v: str, default: bool) -> bool:
@@ -212,10 +333,12 @@ class Settings(BaseSettings):
     """Settings for Lambda functions"""
 
     _aws_session: boto3.Session = None
-    _aws_apigateway_client = None
-    _aws_s3_client = None
-    _aws_dynamodb_client = None
-    _aws_rekognition_client = None
+    _aws_clients: dict = PrivateAttr(default_factory=dict)
+    _aws_client_timings: dict = PrivateAttr(default_factory=dict)
+    _aws_clients_lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+    _aws_region_verified: bool = False
+    _cached_values: dict = PrivateAttr(default_factory=dict)
+    _cached_values_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
     _aws_access_key_id_source: str = "unset"
     _aws_secret_access_key_source: str = "unset"
     _dump: dict = None
@@ -317,6 +440,21 @@ class Settings(BaseSettings):
         pre=True,
         getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.DUMP_DEFAULTS),
     )
+    debug_log_sample_percent: Optional[int] = Field(
+        SettingsDefaults.DEBUG_LOG_SAMPLE_PERCENT,
+        ge=0,
+        le=100,
+        env="DEBUG_LOG_SAMPLE_PERCENT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.DEBUG_LOG_SAMPLE_PERCENT),
+    )
+    debug_log_max_field_length: Optional[int] = Field(
+        SettingsDefaults.DEBUG_LOG_MAX_FIELD_LENGTH,
+        gt=0,
+        env="DEBUG_LOG_MAX_FIELD_LENGTH",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.DEBUG_LOG_MAX_FIELD_LENGTH),
+    )
     aws_profile: Optional[str] = Field(
         SettingsDefaults.AWS_PROFILE,
         env="AWS_PROFILE",
@@ -329,7 +467,9 @@ class Settings(BaseSettings):
         SettingsDefaults.AWS_SECRET_ACCESS_KEY,
         env="AWS_SECRET_ACCESS_KEY",
     )
-    aws_regions: Optional[List[str]] = Field(AWS_REGIONS, description="The list of AWS regions")
+    aws_regions: Optional[List[str]] = Field(
+        None, description="The list of AWS regions. Checked lazily, via get_aws_regions(), if unset"
+    )
     aws_region: Optional[str] = Field(
         SettingsDefaults.AWS_REGION,
         env="AWS_REGION",
@@ -375,6 +515,337 @@ class Settings(BaseSettings):
         pre=True,
         getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_FACE_DETECT_THRESHOLD),
     )
+    aws_rekognition_backend: Optional[str] = Field(
+        SettingsDefaults.AWS_REKOGNITION_BACKEND,
+        env="AWS_REKOGNITION_BACKEND",
+    )
+    aws_rekognition_local_latency_ms: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_LOCAL_LATENCY_MS,
+        ge=0,
+        env="AWS_REKOGNITION_LOCAL_LATENCY_MS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_LOCAL_LATENCY_MS),
+    )
+    aws_rekognition_local_faces_count: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_LOCAL_FACES_COUNT,
+        ge=0,
+        env="AWS_REKOGNITION_LOCAL_FACES_COUNT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_LOCAL_FACES_COUNT),
+    )
+    aws_rekognition_rate_limit_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_REKOGNITION_RATE_LIMIT_ENABLED,
+        env="AWS_REKOGNITION_RATE_LIMIT_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_REKOGNITION_RATE_LIMIT_ENABLED),
+    )
+    aws_rekognition_index_faces_tps: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_INDEX_FACES_TPS,
+        ge=0,
+        env="AWS_REKOGNITION_INDEX_FACES_TPS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_INDEX_FACES_TPS),
+    )
+    aws_rekognition_search_faces_tps: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_SEARCH_FACES_TPS,
+        ge=0,
+        env="AWS_REKOGNITION_SEARCH_FACES_TPS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_SEARCH_FACES_TPS),
+    )
+    aws_rekognition_max_attempts: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_MAX_ATTEMPTS,
+        ge=1,
+        env="AWS_REKOGNITION_MAX_ATTEMPTS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_MAX_ATTEMPTS),
+    )
+    aws_s3_max_pool_connections: Optional[int] = Field(
+        SettingsDefaults.AWS_S3_MAX_POOL_CONNECTIONS,
+        ge=0,
+        env="AWS_S3_MAX_POOL_CONNECTIONS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_S3_MAX_POOL_CONNECTIONS),
+    )
+    aws_s3_retry_mode: Optional[str] = Field(
+        SettingsDefaults.AWS_S3_RETRY_MODE,
+        env="AWS_S3_RETRY_MODE",
+    )
+    aws_s3_max_attempts: Optional[int] = Field(
+        SettingsDefaults.AWS_S3_MAX_ATTEMPTS,
+        ge=1,
+        env="AWS_S3_MAX_ATTEMPTS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_S3_MAX_ATTEMPTS),
+    )
+    aws_s3_connect_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_S3_CONNECT_TIMEOUT,
+        gt=0,
+        env="AWS_S3_CONNECT_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_S3_CONNECT_TIMEOUT),
+    )
+    aws_s3_read_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_S3_READ_TIMEOUT,
+        gt=0,
+        env="AWS_S3_READ_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_S3_READ_TIMEOUT),
+    )
+    aws_s3_tcp_keepalive: Optional[bool] = Field(
+        SettingsDefaults.AWS_S3_TCP_KEEPALIVE,
+        env="AWS_S3_TCP_KEEPALIVE",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_S3_TCP_KEEPALIVE),
+    )
+    aws_dynamodb_max_pool_connections: Optional[int] = Field(
+        SettingsDefaults.AWS_DYNAMODB_MAX_POOL_CONNECTIONS,
+        ge=0,
+        env="AWS_DYNAMODB_MAX_POOL_CONNECTIONS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_DYNAMODB_MAX_POOL_CONNECTIONS),
+    )
+    aws_dynamodb_retry_mode: Optional[str] = Field(
+        SettingsDefaults.AWS_DYNAMODB_RETRY_MODE,
+        env="AWS_DYNAMODB_RETRY_MODE",
+    )
+    aws_dynamodb_max_attempts: Optional[int] = Field(
+        SettingsDefaults.AWS_DYNAMODB_MAX_ATTEMPTS,
+        ge=1,
+        env="AWS_DYNAMODB_MAX_ATTEMPTS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_DYNAMODB_MAX_ATTEMPTS),
+    )
+    aws_dynamodb_connect_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_DYNAMODB_CONNECT_TIMEOUT,
+        gt=0,
+        env="AWS_DYNAMODB_CONNECT_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_DYNAMODB_CONNECT_TIMEOUT),
+    )
+    aws_dynamodb_read_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_DYNAMODB_READ_TIMEOUT,
+        gt=0,
+        env="AWS_DYNAMODB_READ_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_DYNAMODB_READ_TIMEOUT),
+    )
+    aws_dynamodb_tcp_keepalive: Optional[bool] = Field(
+        SettingsDefaults.AWS_DYNAMODB_TCP_KEEPALIVE,
+        env="AWS_DYNAMODB_TCP_KEEPALIVE",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_DYNAMODB_TCP_KEEPALIVE),
+    )
+    aws_rekognition_max_pool_connections: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_MAX_POOL_CONNECTIONS,
+        ge=0,
+        env="AWS_REKOGNITION_MAX_POOL_CONNECTIONS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_MAX_POOL_CONNECTIONS),
+    )
+    aws_rekognition_retry_mode: Optional[str] = Field(
+        SettingsDefaults.AWS_REKOGNITION_RETRY_MODE,
+        env="AWS_REKOGNITION_RETRY_MODE",
+    )
+    aws_rekognition_connect_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_CONNECT_TIMEOUT,
+        gt=0,
+        env="AWS_REKOGNITION_CONNECT_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_CONNECT_TIMEOUT),
+    )
+    aws_rekognition_read_timeout: Optional[int] = Field(
+        SettingsDefaults.AWS_REKOGNITION_READ_TIMEOUT,
+        gt=0,
+        env="AWS_REKOGNITION_READ_TIMEOUT",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_REKOGNITION_READ_TIMEOUT),
+    )
+    aws_rekognition_tcp_keepalive: Optional[bool] = Field(
+        SettingsDefaults.AWS_REKOGNITION_TCP_KEEPALIVE,
+        env="AWS_REKOGNITION_TCP_KEEPALIVE",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_REKOGNITION_TCP_KEEPALIVE),
+    )
+    aws_cache_ttl: Optional[int] = Field(
+        SettingsDefaults.AWS_CACHE_TTL,
+        ge=0,
+        env="AWS_CACHE_TTL",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_CACHE_TTL),
+    )
+    pinned_aws_account_id: Optional[str] = Field(
+        None,
+        validation_alias=AliasChoices("pinned_aws_account_id", "AWS_ACCOUNT_ID"),
+        description="Pins aws_account_id, so that sts is never called",
+    )
+    pinned_aws_s3_bucket_name: Optional[str] = Field(
+        None,
+        validation_alias=AliasChoices("pinned_aws_s3_bucket_name", "AWS_S3_BUCKET_NAME"),
+        description="Pins aws_s3_bucket_name",
+    )
+    pinned_aws_apigateway_domain_name: Optional[str] = Field(
+        None,
+        validation_alias=AliasChoices("pinned_aws_apigateway_domain_name", "AWS_APIGATEWAY_DOMAIN_NAME"),
+        description="Pins aws_apigateway_domain_name, so that apigateway is never called",
+    )
+    aws_search_cache_max_size: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_CACHE_MAX_SIZE,
+        ge=0,
+        env="AWS_SEARCH_CACHE_MAX_SIZE",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_CACHE_MAX_SIZE),
+    )
+    aws_search_max_payload_bytes: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_MAX_PAYLOAD_BYTES,
+        gt=0,
+        env="AWS_SEARCH_MAX_PAYLOAD_BYTES",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_MAX_PAYLOAD_BYTES),
+    )
+    aws_search_preprocess_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_SEARCH_PREPROCESS_ENABLED,
+        env="AWS_SEARCH_PREPROCESS_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_SEARCH_PREPROCESS_ENABLED),
+    )
+    aws_search_preprocess_max_dimension: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_PREPROCESS_MAX_DIMENSION,
+        gt=0,
+        env="AWS_SEARCH_PREPROCESS_MAX_DIMENSION",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_PREPROCESS_MAX_DIMENSION),
+    )
+    aws_search_preprocess_jpeg_quality: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_PREPROCESS_JPEG_QUALITY,
+        ge=1,
+        le=95,
+        env="AWS_SEARCH_PREPROCESS_JPEG_QUALITY",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_PREPROCESS_JPEG_QUALITY),
+    )
+    aws_search_multi_face_max_faces: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_FACES,
+        gt=0,
+        env="AWS_SEARCH_MULTI_FACE_MAX_FACES",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_FACES),
+    )
+    aws_search_multi_face_max_workers: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_WORKERS,
+        gt=0,
+        env="AWS_SEARCH_MULTI_FACE_MAX_WORKERS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_WORKERS),
+    )
+    aws_search_cache_ttl: Optional[int] = Field(
+        SettingsDefaults.AWS_SEARCH_CACHE_TTL,
+        ge=0,
+        env="AWS_SEARCH_CACHE_TTL",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_SEARCH_CACHE_TTL),
+    )
+    aws_search_cache_table_id: Optional[str] = Field(
+        SettingsDefaults.AWS_SEARCH_CACHE_TABLE_ID,
+        env="AWS_SEARCH_CACHE_TABLE_ID",
+    )
+    aws_index_ledger_table_id: Optional[str] = Field(
+        SettingsDefaults.AWS_INDEX_LEDGER_TABLE_ID,
+        env="AWS_INDEX_LEDGER_TABLE_ID",
+    )
+    aws_index_reindex: Optional[bool] = Field(
+        SettingsDefaults.AWS_INDEX_REINDEX,
+        env="AWS_INDEX_REINDEX",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_INDEX_REINDEX),
+    )
+    aws_async_max_concurrency: Optional[int] = Field(
+        SettingsDefaults.AWS_ASYNC_MAX_CONCURRENCY,
+        gt=0,
+        env="AWS_ASYNC_MAX_CONCURRENCY",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_ASYNC_MAX_CONCURRENCY),
+    )
+    aws_faceprint_snapshot_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_ENABLED,
+        env="AWS_FACEPRINT_SNAPSHOT_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_ENABLED),
+    )
+    aws_faceprint_snapshot_prefix: Optional[str] = Field(
+        SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_PREFIX,
+        env="AWS_FACEPRINT_SNAPSHOT_PREFIX",
+    )
+    aws_faceprint_snapshot_max_deltas: Optional[int] = Field(
+        SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_MAX_DELTAS,
+        ge=0,
+        env="AWS_FACEPRINT_SNAPSHOT_MAX_DELTAS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_MAX_DELTAS),
+    )
+    aws_response_compression_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_RESPONSE_COMPRESSION_ENABLED,
+        env="AWS_RESPONSE_COMPRESSION_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_RESPONSE_COMPRESSION_ENABLED),
+    )
+    aws_response_compression_min_bytes: Optional[int] = Field(
+        SettingsDefaults.AWS_RESPONSE_COMPRESSION_MIN_BYTES,
+        ge=0,
+        env="AWS_RESPONSE_COMPRESSION_MIN_BYTES",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_RESPONSE_COMPRESSION_MIN_BYTES),
+    )
+    aws_info_cache_ttl: Optional[int] = Field(
+        SettingsDefaults.AWS_INFO_CACHE_TTL,
+        ge=0,
+        env="AWS_INFO_CACHE_TTL",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_INFO_CACHE_TTL),
+    )
+    aws_info_max_workers: Optional[int] = Field(
+        SettingsDefaults.AWS_INFO_MAX_WORKERS,
+        gt=0,
+        env="AWS_INFO_MAX_WORKERS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_INFO_MAX_WORKERS),
+    )
+    aws_metrics_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_METRICS_ENABLED,
+        env="AWS_METRICS_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_METRICS_ENABLED),
+    )
+    aws_metrics_namespace: Optional[str] = Field(
+        SettingsDefaults.AWS_METRICS_NAMESPACE,
+        env="AWS_METRICS_NAMESPACE",
+    )
+    aws_metrics_server_timing_enabled: Optional[bool] = Field(
+        SettingsDefaults.AWS_METRICS_SERVER_TIMING_ENABLED,
+        env="AWS_METRICS_SERVER_TIMING_ENABLED",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_METRICS_SERVER_TIMING_ENABLED),
+    )
+    aws_s3_fetch_object_metadata: Optional[bool] = Field(
+        SettingsDefaults.AWS_S3_FETCH_OBJECT_METADATA,
+        env="AWS_S3_FETCH_OBJECT_METADATA",
+        pre=True,
+        getter=lambda v: empty_str_to_bool_default(v, SettingsDefaults.AWS_S3_FETCH_OBJECT_METADATA),
+    )
+    aws_lambda_function_memory_size: Optional[int] = Field(
+        SettingsDefaults.AWS_LAMBDA_FUNCTION_MEMORY_SIZE,
+        gt=0,
+        env="AWS_LAMBDA_FUNCTION_MEMORY_SIZE",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_LAMBDA_FUNCTION_MEMORY_SIZE),
+    )
+    aws_lambda_index_max_workers: Optional[int] = Field(
+        SettingsDefaults.AWS_LAMBDA_INDEX_MAX_WORKERS,
+        ge=0,
+        env="AWS_LAMBDA_INDEX_MAX_WORKERS",
+        pre=True,
+        getter=lambda v: empty_str_to_int_default(v, SettingsDefaults.AWS_LAMBDA_INDEX_MAX_WORKERS),
+    )
     init_info: Optional[str] = Field(
         None,
         env="INIT_INFO",
@@ -385,11 +856,33 @@ class Settings(BaseSettings):
         """Is settings initialized?"""
         return self._initialized
 
-    @property
-    def aws_account_id(self):
-        """AWS account id"""
-        Services.raise_error_on_disabled(Services.AWS_CLI)
-        sts_client = self.aws_session.client("sts")
+    def get_cached_value(self, name: str, resolver: Callable[[], Any]) -> Any:
+        """
+        Return the cached value of name, calling resolver() to (re)compute it
+        when it is missing or older than aws_cache_ttl seconds. None results
+        are not cached, so a failed lookup is retried on next access. An
+        aws_cache_ttl of 0 disables the cache.
+        """
+        cached = self._cached_values.get(name)
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+        value = resolver()
+        if value is not None and self.aws_cache_ttl:
+            with self._cached_values_lock:
+                self._cached_values[name] = (value, time.monotonic() + self.aws_cache_ttl)
+        return value
+
+    def invalidate_cached_values(self, *names: str) -> None:
+        """Discard the named cached values, or all of them if no names are given."""
+        with self._cached_values_lock:
+            if not names:
+                self._cached_values.clear()
+            for name in names:
+                self._cached_values.pop(name, None)
+
+    def _get_aws_account_id(self):
+        """Look up the AWS account id with sts"""
+        sts_client = self.get_aws_client("sts")
         if not sts_client:
             logger.warning("could not initialize sts_client")
             return None
@@ -399,6 +892,14 @@ class Settings(BaseSettings):
             return None
         return retval.get("Account", None)
 
+    @property
+    def aws_account_id(self):
+        """AWS account id. Pinned by AWS_ACCOUNT_ID, otherwise cached from sts."""
+        if self.pinned_aws_account_id:
+            return self.pinned_aws_account_id
+        Services.raise_error_on_disabled(Services.AWS_CLI)
+        return self.get_cached_value("aws_account_id", self._get_aws_account_id)
+
     @property
     def aws_access_key_id_source(self):
         """Source of aws_access_key_id"""
@@ -447,59 +948,228 @@ class Settings(BaseSettings):
             self._aws_session = boto3.Session(region_name=self.aws_region)
         return self._aws_session
 
+    def get_aws_client(
+        self, service_name: str, client_type: str = "client", config: BotocoreConfig = None, cache_key: str = None
+    ):
+        """
+        Return a boto3 client (or resource, if client_type == "resource") for
+        service_name, created from aws_session. client_type == "local" returns
+        an in-memory stand-in instead, see _create_local_client().
+        Clients are cached by cache_key, service_name.client_type by default,
+        so clients of one service that need different configs need their own
+        cache_key.
+
+        Clients are created once per container and cached in a process-wide
+        registry, since constructing them means loading botocore service models,
+        which is one of the slowest things boto3 does. boto3 sessions are not
+        thread-safe, so creation is serialized; cached clients themselves are
+        safe to share across threads (resources are not, see
+        https://boto3.amazonaws.com/v1/documentation/api/latest/guide/resources.html#multithreading-or-multiprocessing-with-resources).
+        Creation time of each client is recorded in aws_client_timings.
+        """
+        key = cache_key or f"{service_name}.{client_type}"
+        client = self._aws_clients.get(key)
+        if client is not None:
+            return client
+        with self._aws_clients_lock:
+            client = self._aws_clients.get(key)
+            if client is None:
+                start = time.perf_counter()
+                if client_type == "local":
+                    client = self._create_local_client(service_name)
+                else:
+                    self.verify_aws_region()
+                    factory = self.aws_session.resource if client_type == "resource" else self.aws_session.client
+                    client = factory(service_name, config=config)
+                self._aws_client_timings[key] = round((time.perf_counter() - start) * 1000, 2)
+                self._aws_clients[key] = client
+                logger.debug("created aws %s in %sms", key, self._aws_client_timings[key])
+        return client
+
+    def _create_local_client(self, service_name: str):
+        """Create an in-memory stand-in for service_name, for offline and performance testing"""
+        if service_name != "rekognition":
+            raise RekognitionConfigurationError(f"there is no local backend for {service_name}")
+        # pylint: disable=import-outside-toplevel
+        from rekognition_api.local_rekognition import LocalRekognitionClient
+
+        return LocalRekognitionClient(
+            latency_ms=self.aws_rekognition_local_latency_ms,
+            faces_count=self.aws_rekognition_local_faces_count,
+            region_name=self.aws_region,
+        )
+
+    def verify_aws_region(self) -> None:
+        """
+        Check aws_region against botocore's region list, once, before the first
+        client is created. This is deferred from validation so that
+        constructing Settings stays free of i/o.
+        """
+        if self._aws_region_verified or self.aws_regions:
+            return
+        region_name = self.aws_session.region_name or self.aws_region
+        if region_name not in get_aws_regions(self.aws_session):
+            raise RekognitionValueError(f"aws_region {region_name} not in aws_regions")
+        self._aws_region_verified = True
+
+    def reset_aws_clients(self) -> None:
+        """Discard all cached boto3 clients and resources. They will be re-created on next use."""
+        with self._aws_clients_lock:
+            self._aws_clients.clear()
+            self._aws_client_timings.clear()
+
+    @property
+    def aws_client_timings(self) -> Dict[str, float]:
+        """Creation time, in milliseconds, of each cached boto3 client and resource."""
+        return dict(self._aws_client_timings)
+
     @property
     def aws_route53_client(self):
         """Route53 client"""
         Services.raise_error_on_disabled(Services.AWS_ROUTE53)
-        return self.aws_session.client("route53")
+        return self.get_aws_client("route53")
 
     @property
     def aws_apigateway_client(self):
         """API Gateway client"""
         Services.raise_error_on_disabled(Services.AWS_APIGATEWAY)
-        if not self._aws_apigateway_client:
-            config = Config(
-                read_timeout=SettingsDefaults.AWS_APIGATEWAY_READ_TIMEOUT,
-                connect_timeout=SettingsDefaults.AWS_APIGATEWAY_CONNECT_TIMEOUT,
-                retries={"max_attempts": SettingsDefaults.AWS_APIGATEWAY_MAX_ATTEMPTS},
-            )
-            self._aws_apigateway_client = self.aws_session.client("apigateway", config=config)
-        return self._aws_apigateway_client
+        config = BotocoreConfig(
+            read_timeout=SettingsDefaults.AWS_APIGATEWAY_READ_TIMEOUT,
+            connect_timeout=SettingsDefaults.AWS_APIGATEWAY_CONNECT_TIMEOUT,
+            retries={"max_attempts": SettingsDefaults.AWS_APIGATEWAY_MAX_ATTEMPTS},
+        )
+        return self.get_aws_client("apigateway", config=config)
 
     @property
     def aws_s3_client(self):
         """S3 client"""
         Services.raise_error_on_disabled(Services.AWS_S3)
-        if not self._aws_s3_client:
-            self._aws_s3_client = self.aws_session.resource("s3")
-        return self._aws_s3_client
+        return self.get_aws_client("s3", client_type="resource", config=self.get_botocore_config("s3"))
 
     @property
     def aws_dynamodb_client(self):
         """DynamoDB client"""
         Services.raise_error_on_disabled(Services.AWS_DYNAMODB)
-        if not self._aws_dynamodb_client:
-            self._aws_dynamodb_client = self.aws_session.client("dynamodb")
-        return self._aws_dynamodb_client
+        return self.get_aws_client("dynamodb", config=self.aws_dynamodb_config)
+
+    @property
+    def aws_dynamodb_resource(self):
+        """DynamoDB resource"""
+        Services.raise_error_on_disabled(Services.AWS_DYNAMODB)
+        return self.get_aws_client("dynamodb", client_type="resource", config=self.aws_dynamodb_config)
+
+    @property
+    def aws_dynamodb_config(self) -> BotocoreConfig:
+        """DynamoDB botocore config"""
+        return self.get_botocore_config("dynamodb")
+
+    def get_connection_profile(self, service_name: str) -> dict:
+        """
+        Return the connection profile of service_name, one of s3, dynamodb and
+        rekognition. Connection pools are shared by all threads, so a
+        max_pool_connections of 0 sizes the pool to the largest number of
+        concurrent requests that the thread pools or the async handlers can make.
+        """
+        max_pool_connections = getattr(self, f"aws_{service_name}_max_pool_connections")
+        if not max_pool_connections:
+            max_pool_connections = max(
+                10,
+                self.lambda_index_max_workers,
+                self.aws_async_max_concurrency,
+                self.aws_search_multi_face_max_workers,
+            )
+        return {
+            "max_pool_connections": max_pool_connections,
+            "retry_mode": getattr(self, f"aws_{service_name}_retry_mode"),
+            "max_attempts": getattr(self, f"aws_{service_name}_max_attempts"),
+            "connect_timeout": getattr(self, f"aws_{service_name}_connect_timeout"),
+            "read_timeout": getattr(self, f"aws_{service_name}_read_timeout"),
+            "tcp_keepalive": getattr(self, f"aws_{service_name}_tcp_keepalive"),
+        }
+
+    def get_botocore_config(self, service_name: str) -> BotocoreConfig:
+        """Return the botocore Config of the connection profile of service_name"""
+        profile = self.get_connection_profile(service_name)
+        return BotocoreConfig(
+            max_pool_connections=profile["max_pool_connections"],
+            retries={"mode": profile["retry_mode"], "total_max_attempts": profile["max_attempts"]},
+            connect_timeout=profile["connect_timeout"],
+            read_timeout=profile["read_timeout"],
+            tcp_keepalive=profile["tcp_keepalive"],
+        )
 
     @property
     def aws_rekognition_client(self):
-        """Rekognition client"""
+        """
+        Rekognition client. Unless aws_rekognition_rate_limit_enabled is
+        False, the boto3 client is wrapped in a process-wide RateLimitedClient,
+        which does the retrying, up to aws_rekognition_max_attempts, so
+        botocore's own retries are disabled.
+        """
         Services.raise_error_on_disabled(Services.AWS_REKOGNITION)
-        if not self._aws_rekognition_client:
-            self._aws_rekognition_client = self.aws_session.client("rekognition")
-        return self._aws_rekognition_client
+        if self.aws_rekognition_backend == "local":
+            return self.get_aws_client("rekognition", client_type="local")
+        config = self.get_botocore_config("rekognition")
+        if not self.aws_rekognition_rate_limit_enabled:
+            # cached apart from the rate limited client's, which has botocore's retries disabled
+            return self.get_aws_client("rekognition", config=config, cache_key="rekognition.client.retrying")
+        key = "rekognition.rate_limited"
+        client = self._aws_clients.get(key)
+        if client is None:
+            # pylint: disable=import-outside-toplevel
+            from rekognition_api.rate_limiter import RateLimitedClient
+
+            config = config.merge(
+                BotocoreConfig(retries={"mode": self.aws_rekognition_retry_mode, "total_max_attempts": 1})
+            )
+            rekognition_client = self.get_aws_client("rekognition", config=config)
+            with self._aws_clients_lock:
+                client = self._aws_clients.get(key)
+                if client is None:
+                    client = RateLimitedClient(
+                        rekognition_client,
+                        budgets=self.aws_rekognition_tps_budgets,
+                        max_attempts=self.aws_rekognition_max_attempts,
+                    )
+                    self._aws_clients[key] = client
+        return client
+
+    @property
+    def aws_rekognition_tps_budgets(self) -> Dict[str, int]:
+        """TPS budget of each rate limited Rekognition operation"""
+        return {
+            "IndexFaces": self.aws_rekognition_index_faces_tps,
+            "SearchFacesByImage": self.aws_rekognition_search_faces_tps,
+        }
+
+    def get_dynamodb_table(self, table_id: str):
+        """
+        Return a DynamoDB Table resource for table_id, cached per thread.
+        Resources are not thread-safe, so each thread of the thread pools gets
+        a Table of its own. They all share the dynamodb resource's client,
+        which is.
+        """
+        Services.raise_error_on_disabled(Services.AWS_DYNAMODB)
+        key = f"dynamodb.Table.{table_id}"
+        tables = self._aws_clients.get(key)
+        if tables is None:
+            with self._aws_clients_lock:
+                tables = self._aws_clients.setdefault(key, threading.local())
+        table = getattr(tables, "table", None)
+        if table is None:
+            table = tables.table = self.aws_dynamodb_resource.Table(table_id)
+        return table
 
     @property
     def dynamodb_table(self):
         """DynamoDB table"""
-        Services.raise_error_on_disabled(Services.AWS_DYNAMODB)
-        dynamodb_resource = boto3.resource("dynamodb")
-        return dynamodb_resource.Table(self.aws_dynamodb_table_id)
+        return self.get_dynamodb_table(self.aws_dynamodb_table_id)
 
     @property
     def aws_s3_bucket_name(self) -> str:
-        """Return the S3 bucket name."""
+        """Return the S3 bucket name. Pinned by AWS_S3_BUCKET_NAME."""
+        if self.pinned_aws_s3_bucket_name:
+            return self.pinned_aws_s3_bucket_name
         return self.aws_account_id + "-" + self.shared_resource_identifier
 
     @property
@@ -507,19 +1177,38 @@ class Settings(BaseSettings):
         """Return the API name."""
         return self.shared_resource_identifier + "-api"
 
-    @property
-    def aws_apigateway_domain_name(self) -> str:
-        """Return the API domain."""
-        if self.aws_apigateway_create_custom_domaim:
-            return "api." + self.shared_resource_identifier + "." + self.aws_apigateway_root_domain
-
+    def _get_aws_apigateway_domain_name(self) -> str:
+        """Look up the API domain"""
         response = self.aws_apigateway_client.get_rest_apis()
         for item in response["items"]:
             if item["name"] == self.aws_apigateway_name:
                 api_id = item["id"]
-                return f"{api_id}.execute-api.{settings.aws_region}.amazonaws.com"
+                return f"{api_id}.execute-api.{self.aws_region}.amazonaws.com"
         return None
 
+    @property
+    def aws_apigateway_domain_name(self) -> str:
+        """Return the API domain. Pinned by AWS_APIGATEWAY_DOMAIN_NAME, otherwise cached from apigateway."""
+        if self.pinned_aws_apigateway_domain_name:
+            return self.pinned_aws_apigateway_domain_name
+        if self.aws_apigateway_create_custom_domaim:
+            return "api." + self.shared_resource_identifier + "." + self.aws_apigateway_root_domain
+        return self.get_cached_value("aws_apigateway_domain_name", self._get_aws_apigateway_domain_name)
+
+    @property
+    def lambda_index_max_workers(self) -> int:
+        """
+        Return the thread pool size for lambda_index batches.
+
+        Lambda allocates cpu in proportion to memory, so unless the pool size is
+        set explicitly we size it to the memory tier: one worker per 128mb,
+        bounded to [2, 32]. index_faces() is i/o bound, so we can comfortably
+        run more threads than there are vCPUs.
+        """
+        if self.aws_lambda_index_max_workers:
+            return self.aws_lambda_index_max_workers
+        return max(2, min(32, self.aws_lambda_function_memory_size // 128))
+
     @property
     def is_using_dotenv_file(self) -> bool:
         """Is the dotenv file being used?"""
@@ -538,7 +1227,7 @@ class Settings(BaseSettings):
     @property
     def tfvars_variables(self) -> dict:
         """Terraform variables"""
-        masked_TFVARS = TFVARS.copy()
+        masked_TFVARS = get_tfvars().copy()
         if "aws_account_id" in masked_TFVARS:
             masked_TFVARS["aws_account_id"] = "****"
         return masked_TFVARS
@@ -563,9 +1252,9 @@ class Settings(BaseSettings):
         """Dump all settings."""
 
         def get_installed_packages():
-            installed_packages = pkg_resources.working_set
-            # pylint: disable=not-an-iterable
-            package_list = [(d.project_name, d.version) for d in installed_packages]
+            # deferred until the first dump, since scanning site-packages is slow
+            installed_packages = importlib.metadata.distributions()
+            package_list = [(d.metadata["Name"], d.version) for d in installed_packages]
             return package_list
 
         if self._dump and self.initialized:
@@ -590,6 +1279,8 @@ class Settings(BaseSettings):
                 "boto3": boto3.__version__,
                 "shared_resource_identifier": self.shared_resource_identifier,
                 "debug_mode": self.debug_mode,
+                "debug_log_sample_percent": self.debug_log_sample_percent,
+                "debug_log_max_field_length": self.debug_log_max_field_length,
                 "dump_defaults": self.dump_defaults,
                 "version": self.version,
                 "python_version": platform.python_version(),
@@ -605,6 +1296,13 @@ class Settings(BaseSettings):
                 "aws_rekognition_face_detect_attributes": self.aws_rekognition_face_detect_attributes,
                 "aws_rekognition_face_detect_quality_filter": self.aws_rekognition_face_detect_quality_filter,
                 "aws_rekognition_face_detect_threshold": self.aws_rekognition_face_detect_threshold,
+                "aws_rekognition_backend": self.aws_rekognition_backend,
+                "aws_rekognition_local_latency_ms": self.aws_rekognition_local_latency_ms,
+                "aws_rekognition_local_faces_count": self.aws_rekognition_local_faces_count,
+                "aws_rekognition_rate_limit_enabled": self.aws_rekognition_rate_limit_enabled,
+                "aws_rekognition_index_faces_tps": self.aws_rekognition_index_faces_tps,
+                "aws_rekognition_search_faces_tps": self.aws_rekognition_search_faces_tps,
+                "aws_rekognition_max_attempts": self.aws_rekognition_max_attempts,
             },
             "aws_dynamodb": {
                 "aws_dynamodb_table_id": self.aws_dynamodb_table_id,
@@ -615,9 +1313,61 @@ class Settings(BaseSettings):
                 "aws_apigateway_root_domain": self.aws_apigateway_root_domain,
                 "aws_apigateway_domain_name": self.aws_apigateway_domain_name,
             },
-            "aws_lambda": {},
+            "aws_clients": {
+                "aws_client_timings": self.aws_client_timings,
+                "aws_cache_ttl": self.aws_cache_ttl,
+                "pinned_aws_account_id": bool(self.pinned_aws_account_id),
+                "pinned_aws_s3_bucket_name": self.pinned_aws_s3_bucket_name,
+                "pinned_aws_apigateway_domain_name": self.pinned_aws_apigateway_domain_name,
+            },
+            "aws_search": {
+                "aws_search_max_payload_bytes": self.aws_search_max_payload_bytes,
+                "aws_search_preprocess_enabled": self.aws_search_preprocess_enabled,
+                "aws_search_preprocess_max_dimension": self.aws_search_preprocess_max_dimension,
+                "aws_search_preprocess_jpeg_quality": self.aws_search_preprocess_jpeg_quality,
+                "aws_search_multi_face_max_faces": self.aws_search_multi_face_max_faces,
+                "aws_search_multi_face_max_workers": self.aws_search_multi_face_max_workers,
+            },
+            "aws_search_cache": {
+                "aws_search_cache_max_size": self.aws_search_cache_max_size,
+                "aws_search_cache_ttl": self.aws_search_cache_ttl,
+                "aws_search_cache_table_id": self.aws_search_cache_table_id,
+            },
+            "aws_index_ledger": {
+                "aws_index_ledger_table_id": self.aws_index_ledger_table_id,
+                "aws_index_reindex": self.aws_index_reindex,
+            },
+            "aws_lambda": {
+                "aws_lambda_function_memory_size": self.aws_lambda_function_memory_size,
+                "aws_lambda_index_max_workers": self.aws_lambda_index_max_workers,
+                "aws_async_max_concurrency": self.aws_async_max_concurrency,
+                "lambda_index_max_workers": self.lambda_index_max_workers,
+            },
+            "aws_faceprint_snapshot": {
+                "aws_faceprint_snapshot_enabled": self.aws_faceprint_snapshot_enabled,
+                "aws_faceprint_snapshot_prefix": self.aws_faceprint_snapshot_prefix,
+                "aws_faceprint_snapshot_max_deltas": self.aws_faceprint_snapshot_max_deltas,
+            },
+            "aws_response": {
+                "aws_response_compression_enabled": self.aws_response_compression_enabled,
+                "aws_response_compression_min_bytes": self.aws_response_compression_min_bytes,
+            },
+            "aws_info": {
+                "aws_info_cache_ttl": self.aws_info_cache_ttl,
+                "aws_info_max_workers": self.aws_info_max_workers,
+            },
+            "aws_metrics": {
+                "aws_metrics_enabled": self.aws_metrics_enabled,
+                "aws_metrics_namespace": self.aws_metrics_namespace,
+                "aws_metrics_server_timing_enabled": self.aws_metrics_server_timing_enabled,
+            },
             "aws_s3": {
                 "aws_s3_bucket_prefix": self.aws_s3_bucket_name,
+                "aws_s3_fetch_object_metadata": self.aws_s3_fetch_object_metadata,
+            },
+            "aws_connection_profiles": {
+                service_name: self.get_connection_profile(service_name)
+                for service_name in ("s3", "dynamodb", "rekognition")
             },
         }
         if self.dump_defaults:
@@ -684,11 +1434,14 @@ class Settings(BaseSettings):
     # pylint: disable=no-self-argument,unused-argument
     def validate_aws_region(cls, v, values: ValidationInfo, **kwargs) -> str:
         """Validate aws_region"""
-        valid_regions = values.data.get("aws_regions", [])
+        valid_regions = values.data.get("aws_regions")
         if v in [None, ""]:
             return SettingsDefaults.AWS_REGION
-        if v not in valid_regions:
+        if valid_regions and v not in valid_regions:
             raise RekognitionValueError(f"aws_region {v} not in aws_regions")
+        # membership in botocore's region list is checked on first use. see verify_aws_region()
+        if not AWS_REGION_PATTERN.match(v):
+            raise RekognitionValueError(f"aws_region {v} is not a valid aws region code")
         return v
 
     @field_validator("aws_apigateway_root_domain")
@@ -735,6 +1488,24 @@ class Settings(BaseSettings):
             return SettingsDefaults.DEBUG_MODE
         return v.lower() in ["true", "1", "t", "y", "yes"]
 
+    @field_validator("debug_log_sample_percent")
+    def check_debug_log_sample_percent(cls, v) -> int:
+        """Check debug_log_sample_percent"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.DEBUG_LOG_SAMPLE_PERCENT
+        return int(v)
+
+    @field_validator("debug_log_max_field_length")
+    def check_debug_log_max_field_length(cls, v) -> int:
+        """Check debug_log_max_field_length"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.DEBUG_LOG_MAX_FIELD_LENGTH
+        return int(v)
+
     @field_validator("dump_defaults")
     def parse_dump_defaults(cls, v) -> bool:
         """Parse dump_defaults"""
@@ -751,6 +1522,452 @@ class Settings(BaseSettings):
             return SettingsDefaults.AWS_REKOGNITION_FACE_DETECT_MAX_FACES_COUNT
         return int(v)
 
+    @field_validator("aws_rekognition_backend")
+    def check_aws_rekognition_backend(cls, v) -> str:
+        """Check aws_rekognition_backend"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_BACKEND
+        v = v.lower()
+        if v not in ["aws", "local"]:
+            raise RekognitionValueError(f"aws_rekognition_backend {v} must be one of aws, local")
+        return v
+
+    @field_validator("aws_rekognition_local_latency_ms")
+    def check_aws_rekognition_local_latency_ms(cls, v) -> int:
+        """Check aws_rekognition_local_latency_ms"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_LOCAL_LATENCY_MS
+        return int(v)
+
+    @field_validator("aws_rekognition_local_faces_count")
+    def check_aws_rekognition_local_faces_count(cls, v) -> int:
+        """Check aws_rekognition_local_faces_count"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_LOCAL_FACES_COUNT
+        return int(v)
+
+    @field_validator("aws_rekognition_rate_limit_enabled")
+    def parse_aws_rekognition_rate_limit_enabled(cls, v) -> bool:
+        """Parse aws_rekognition_rate_limit_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_RATE_LIMIT_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_rekognition_index_faces_tps")
+    def check_aws_rekognition_index_faces_tps(cls, v) -> int:
+        """Check aws_rekognition_index_faces_tps"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_INDEX_FACES_TPS
+        return int(v)
+
+    @field_validator("aws_rekognition_search_faces_tps")
+    def check_aws_rekognition_search_faces_tps(cls, v) -> int:
+        """Check aws_rekognition_search_faces_tps"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_SEARCH_FACES_TPS
+        return int(v)
+
+    @field_validator("aws_rekognition_max_attempts")
+    def check_aws_rekognition_max_attempts(cls, v) -> int:
+        """Check aws_rekognition_max_attempts"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_MAX_ATTEMPTS
+        return int(v)
+
+    @field_validator("aws_s3_max_pool_connections")
+    def check_aws_s3_max_pool_connections(cls, v) -> int:
+        """Check aws_s3_max_pool_connections"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_MAX_POOL_CONNECTIONS
+        return int(v)
+
+    @field_validator("aws_s3_retry_mode")
+    def check_aws_s3_retry_mode(cls, v) -> str:
+        """Check aws_s3_retry_mode"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_RETRY_MODE
+        v = v.lower()
+        if v not in BOTOCORE_RETRY_MODES:
+            raise RekognitionValueError(f"aws_s3_retry_mode {v} must be one of {', '.join(BOTOCORE_RETRY_MODES)}")
+        return v
+
+    @field_validator("aws_s3_max_attempts")
+    def check_aws_s3_max_attempts(cls, v) -> int:
+        """Check aws_s3_max_attempts"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_MAX_ATTEMPTS
+        return int(v)
+
+    @field_validator("aws_s3_connect_timeout")
+    def check_aws_s3_connect_timeout(cls, v) -> int:
+        """Check aws_s3_connect_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_CONNECT_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_s3_read_timeout")
+    def check_aws_s3_read_timeout(cls, v) -> int:
+        """Check aws_s3_read_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_READ_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_s3_tcp_keepalive")
+    def parse_aws_s3_tcp_keepalive(cls, v) -> bool:
+        """Parse aws_s3_tcp_keepalive"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_TCP_KEEPALIVE
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_dynamodb_max_pool_connections")
+    def check_aws_dynamodb_max_pool_connections(cls, v) -> int:
+        """Check aws_dynamodb_max_pool_connections"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_MAX_POOL_CONNECTIONS
+        return int(v)
+
+    @field_validator("aws_dynamodb_retry_mode")
+    def check_aws_dynamodb_retry_mode(cls, v) -> str:
+        """Check aws_dynamodb_retry_mode"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_RETRY_MODE
+        v = v.lower()
+        if v not in BOTOCORE_RETRY_MODES:
+            raise RekognitionValueError(f"aws_dynamodb_retry_mode {v} must be one of {', '.join(BOTOCORE_RETRY_MODES)}")
+        return v
+
+    @field_validator("aws_dynamodb_max_attempts")
+    def check_aws_dynamodb_max_attempts(cls, v) -> int:
+        """Check aws_dynamodb_max_attempts"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_MAX_ATTEMPTS
+        return int(v)
+
+    @field_validator("aws_dynamodb_connect_timeout")
+    def check_aws_dynamodb_connect_timeout(cls, v) -> int:
+        """Check aws_dynamodb_connect_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_CONNECT_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_dynamodb_read_timeout")
+    def check_aws_dynamodb_read_timeout(cls, v) -> int:
+        """Check aws_dynamodb_read_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_READ_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_dynamodb_tcp_keepalive")
+    def parse_aws_dynamodb_tcp_keepalive(cls, v) -> bool:
+        """Parse aws_dynamodb_tcp_keepalive"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_DYNAMODB_TCP_KEEPALIVE
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_rekognition_max_pool_connections")
+    def check_aws_rekognition_max_pool_connections(cls, v) -> int:
+        """Check aws_rekognition_max_pool_connections"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_MAX_POOL_CONNECTIONS
+        return int(v)
+
+    @field_validator("aws_rekognition_retry_mode")
+    def check_aws_rekognition_retry_mode(cls, v) -> str:
+        """Check aws_rekognition_retry_mode"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_RETRY_MODE
+        v = v.lower()
+        if v not in BOTOCORE_RETRY_MODES:
+            raise RekognitionValueError(f"aws_rekognition_retry_mode {v} must be one of {', '.join(BOTOCORE_RETRY_MODES)}")
+        return v
+
+    @field_validator("aws_rekognition_connect_timeout")
+    def check_aws_rekognition_connect_timeout(cls, v) -> int:
+        """Check aws_rekognition_connect_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_CONNECT_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_rekognition_read_timeout")
+    def check_aws_rekognition_read_timeout(cls, v) -> int:
+        """Check aws_rekognition_read_timeout"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_READ_TIMEOUT
+        return int(v)
+
+    @field_validator("aws_rekognition_tcp_keepalive")
+    def parse_aws_rekognition_tcp_keepalive(cls, v) -> bool:
+        """Parse aws_rekognition_tcp_keepalive"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_REKOGNITION_TCP_KEEPALIVE
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_cache_ttl")
+    def check_aws_cache_ttl(cls, v) -> int:
+        """Check aws_cache_ttl"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_CACHE_TTL
+        return int(v)
+
+    @field_validator("aws_search_cache_max_size")
+    def check_aws_search_cache_max_size(cls, v) -> int:
+        """Check aws_search_cache_max_size"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_CACHE_MAX_SIZE
+        return int(v)
+
+    @field_validator("aws_search_max_payload_bytes")
+    def check_aws_search_max_payload_bytes(cls, v) -> int:
+        """Check aws_search_max_payload_bytes"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_MAX_PAYLOAD_BYTES
+        return int(v)
+
+    @field_validator("aws_search_preprocess_enabled")
+    def parse_aws_search_preprocess_enabled(cls, v) -> bool:
+        """Parse aws_search_preprocess_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_PREPROCESS_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_search_preprocess_max_dimension")
+    def check_aws_search_preprocess_max_dimension(cls, v) -> int:
+        """Check aws_search_preprocess_max_dimension"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_PREPROCESS_MAX_DIMENSION
+        return int(v)
+
+    @field_validator("aws_search_preprocess_jpeg_quality")
+    def check_aws_search_preprocess_jpeg_quality(cls, v) -> int:
+        """Check aws_search_preprocess_jpeg_quality"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_PREPROCESS_JPEG_QUALITY
+        return int(v)
+
+    @field_validator("aws_search_multi_face_max_faces")
+    def check_aws_search_multi_face_max_faces(cls, v) -> int:
+        """Check aws_search_multi_face_max_faces"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_FACES
+        return int(v)
+
+    @field_validator("aws_search_multi_face_max_workers")
+    def check_aws_search_multi_face_max_workers(cls, v) -> int:
+        """Check aws_search_multi_face_max_workers"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_MULTI_FACE_MAX_WORKERS
+        return int(v)
+
+    @field_validator("aws_search_cache_ttl")
+    def check_aws_search_cache_ttl(cls, v) -> int:
+        """Check aws_search_cache_ttl"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_CACHE_TTL
+        return int(v)
+
+    @field_validator("aws_search_cache_table_id")
+    def check_aws_search_cache_table_id(cls, v) -> str:
+        """Check aws_search_cache_table_id. An empty value disables the shared DynamoDB cache tier."""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_SEARCH_CACHE_TABLE_ID or None
+        return v
+
+    @field_validator("aws_index_ledger_table_id")
+    def check_aws_index_ledger_table_id(cls, v) -> str:
+        """Check aws_index_ledger_table_id. An empty value disables the ingest ledger."""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_INDEX_LEDGER_TABLE_ID or None
+        return v
+
+    @field_validator("aws_index_reindex")
+    def parse_aws_index_reindex(cls, v) -> bool:
+        """Parse aws_index_reindex"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_INDEX_REINDEX
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_async_max_concurrency")
+    def check_aws_async_max_concurrency(cls, v) -> int:
+        """Check aws_async_max_concurrency"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_ASYNC_MAX_CONCURRENCY
+        return int(v)
+
+    @field_validator("aws_faceprint_snapshot_enabled")
+    def parse_aws_faceprint_snapshot_enabled(cls, v) -> bool:
+        """Parse aws_faceprint_snapshot_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_faceprint_snapshot_prefix")
+    def check_aws_faceprint_snapshot_prefix(cls, v) -> str:
+        """Check aws_faceprint_snapshot_prefix"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_PREFIX
+        return v.strip("/")
+
+    @field_validator("aws_faceprint_snapshot_max_deltas")
+    def check_aws_faceprint_snapshot_max_deltas(cls, v) -> int:
+        """Check aws_faceprint_snapshot_max_deltas"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_FACEPRINT_SNAPSHOT_MAX_DELTAS
+        return int(v)
+
+    @field_validator("aws_response_compression_enabled")
+    def parse_aws_response_compression_enabled(cls, v) -> bool:
+        """Parse aws_response_compression_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_RESPONSE_COMPRESSION_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_response_compression_min_bytes")
+    def check_aws_response_compression_min_bytes(cls, v) -> int:
+        """Check aws_response_compression_min_bytes"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_RESPONSE_COMPRESSION_MIN_BYTES
+        return int(v)
+
+    @field_validator("aws_info_cache_ttl")
+    def check_aws_info_cache_ttl(cls, v) -> int:
+        """Check aws_info_cache_ttl"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_INFO_CACHE_TTL
+        return int(v)
+
+    @field_validator("aws_info_max_workers")
+    def check_aws_info_max_workers(cls, v) -> int:
+        """Check aws_info_max_workers"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_INFO_MAX_WORKERS
+        return int(v)
+
+    @field_validator("aws_metrics_enabled")
+    def parse_aws_metrics_enabled(cls, v) -> bool:
+        """Parse aws_metrics_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_METRICS_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_metrics_namespace")
+    def check_aws_metrics_namespace(cls, v) -> str:
+        """Check aws_metrics_namespace"""
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_METRICS_NAMESPACE
+        return v
+
+    @field_validator("aws_metrics_server_timing_enabled")
+    def parse_aws_metrics_server_timing_enabled(cls, v) -> bool:
+        """Parse aws_metrics_server_timing_enabled"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_METRICS_SERVER_TIMING_ENABLED
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_s3_fetch_object_metadata")
+    def parse_aws_s3_fetch_object_metadata(cls, v) -> bool:
+        """Parse aws_s3_fetch_object_metadata"""
+        if isinstance(v, bool):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_S3_FETCH_OBJECT_METADATA
+        return v.lower() in ["true", "1", "t", "y", "yes"]
+
+    @field_validator("aws_lambda_function_memory_size")
+    def check_aws_lambda_function_memory_size(cls, v) -> int:
+        """Check aws_lambda_function_memory_size"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_LAMBDA_FUNCTION_MEMORY_SIZE
+        return int(v)
+
+    @field_validator("aws_lambda_index_max_workers")
+    def check_aws_lambda_index_max_workers(cls, v) -> int:
+        """Check aws_lambda_index_max_workers"""
+        if isinstance(v, int):
+            return v
+        if v in [None, ""]:
+            return SettingsDefaults.AWS_LAMBDA_INDEX_MAX_WORKERS
+        return int(v)
+
     @field_validator("aws_rekognition_face_detect_threshold")
     def check_face_detect_threshold(cls, v) -> int:
         """Check aws_rekognition_face_detect_threshold"""
@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=E1101
 """A module containing constants for the OpenAI API."""
+import functools
+import json
 import logging
 import os
+import re
 from pathlib import Path
 
-import hcl2
-
 
 MODULE_NAME = "rekognition_api"
 HERE = os.path.abspath(os.path.dirname(__file__))
@@ -19,14 +20,104 @@ TERRAFORM_TFVARS = os.path.join(TERRAFORM_ROOT, "terraform.tfvars")
 if not os.path.exists(TERRAFORM_TFVARS):
     TERRAFORM_TFVARS = os.path.join(HERE, "terraform.tfvars")
 
-TFVARS = {}
-IS_USING_TFVARS = False
+IS_USING_TFVARS = os.path.exists(TERRAFORM_TFVARS)
+
+# AWS error codes that mean "slow down", of Rekognition, DynamoDB and S3
+THROTTLING_ERROR_CODES = (
+    "ThrottlingException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "SlowDown",
+)
+
+TFVARS_ASSIGNMENT = re.compile(r"^([A-Za-z_][A-Za-z0-9_-]*)\s*=\s*(.*)$")
+TFVARS_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+TFVARS_NUMBER = re.compile(r"^-?\d+(\.\d+)?([eE][-+]?\d+)?$")
 
 logger = logging.getLogger(__name__)
 
-try:
+
+def strip_tfvars_comment(text: str) -> str:
+    """return text, which has no string literals, without its trailing # or // comment"""
+    for marker in ("#", "//"):
+        text = text.split(marker, 1)[0]
+    return text.strip()
+
+
+def parse_tfvars_scalar(value: str):
+    """return the str, int, float or bool of an assignment's value, or None if it is anything else"""
+    if value.startswith('"'):
+        try:
+            retval, end = json.JSONDecoder().raw_decode(value)
+        except ValueError:
+            return None
+        # ie string concatenation, or interpolation, which hcl2 is needed for
+        return retval if not strip_tfvars_comment(value[end:]) else None
+    value = strip_tfvars_comment(value)
+    if value in ("true", "false"):
+        return value == "true"
+    if TFVARS_NUMBER.match(value):
+        return float(value) if any(char in value for char in ".eE") else int(value)
+    return None
+
+
+def parse_tfvars_scalars(text: str) -> dict:
+    """
+    return the top level string, number and bool assignments of a tfvars
+    file. Lists, maps and heredocs, and everything nested in them, are skipped.
+    """
+    retval = {}
+    depth = 0
+    heredoc = None
+    for line in text.splitlines():
+        line = line.strip()
+        if heredoc is not None:
+            if line == heredoc:
+                heredoc = None
+            continue
+        if depth == 0:
+            match = TFVARS_ASSIGNMENT.match(line)
+            if match:
+                name, value = match.groups()
+                if value.startswith("<<"):
+                    heredoc = value[2:].lstrip("-").strip()
+                    continue
+                value = parse_tfvars_scalar(value)
+                if value is not None:
+                    retval[name] = value
+        code = strip_tfvars_comment(TFVARS_STRING.sub('""', line))
+        depth += code.count("{") + code.count("[") - code.count("}") - code.count("]")
+    return retval
+
+
+@functools.lru_cache(maxsize=None)
+def get_tfvars_defaults() -> dict:
+    """
+    return the scalar assignments of terraform.tfvars, which are all that the
+    Settings defaults read, or {} if there is no file. This runs when conf.py
+    is imported, so it reads the file with parse_tfvars_scalars() rather than
+    hcl2, which builds its lark parser on first use, and is slow.
+    """
+    if not IS_USING_TFVARS:
+        logger.debug("No terraform.tfvars file found. Using default values.")
+        return {}
+    with open(TERRAFORM_TFVARS, "r", encoding="utf-8") as f:
+        return parse_tfvars_scalars(f.read())
+
+
+@functools.lru_cache(maxsize=None)
+def get_tfvars() -> dict:
+    """return terraform.tfvars, parsed with hcl2 on first call, or {} if there is no file"""
+    if not IS_USING_TFVARS:
+        return {}
+    import hcl2  # pylint: disable=import-outside-toplevel
+
     with open(TERRAFORM_TFVARS, "r", encoding="utf-8") as f:
-        TFVARS = hcl2.load(f)
-    IS_USING_TFVARS = True
-except FileNotFoundError:
-    logger.debug("No terraform.tfvars file found. Using default values.")
+        return hcl2.load(f)
+
+
+def __getattr__(name):
+    """resolve TFVARS, the values that the Settings defaults read, on first access"""
+    if name == "TFVARS":
+        return get_tfvars_defaults()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+DynamoDB batch helpers for the faceprint table.
+
+BatchWriteItem accepts at most 25 put or delete requests per call and BatchGetItem at
+most 100 keys, and under throttling DynamoDB returns whatever it could not
+process in UnprocessedItems/UnprocessedKeys rather than raising. These helpers
+chunk the requests and re-submit the unprocessed remainder with exponential
+backoff, as recommended in
+https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Programming.Errors.html#Programming.Errors.BatchOperations
+
+The async_ variants issue their chunks concurrently, at most max_concurrency
+at a time, on worker threads that share the Table's client and connection pool.
+"""
+
+# python stuff
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+# our stuff
+from rekognition_api.exceptions import (
+    RekognitionBatchGetError,
+    RekognitionBatchWriteError,
+)
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_GET_MAX_KEYS = 100
+BATCH_MAX_ATTEMPTS = 8
+BATCH_BASE_DELAY = 0.05  # seconds
+BATCH_MAX_DELAY = 5.0  # seconds
+
+
+def chunks(items: List, size: int) -> Iterable[List]:
+    """yield successive size-length chunks of items"""
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def backoff_delay(attempt: int, base_delay: float = BATCH_BASE_DELAY) -> float:
+    """exponential backoff with full jitter for the given retry attempt (1-based)"""
+    return random.uniform(0, min(BATCH_MAX_DELAY, base_delay * (2**attempt)))  # nosec B311
+
+
+def batch_write_requests(
+    table,
+    requests: List[dict],
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> dict:
+    """
+    Submit PutRequest/DeleteRequest dicts to a DynamoDB Table resource with
+    BatchWriteItem, in chunks of 25.
+
+    UnprocessedItems are re-submitted with exponential backoff until they are
+    written or max_attempts is exhausted, in which case RekognitionBatchWriteError
+    is raised. Returns a dict of metrics: items written, BatchWriteItem
+    requests made, and the number of retries that were needed.
+    """
+    client = table.meta.client
+    table_name = table.name
+    retval = {"items": 0, "requests": 0, "retries": 0}
+
+    for chunk in chunks(requests, BATCH_WRITE_MAX_ITEMS):
+        request_items = {table_name: chunk}
+        attempt = 0
+        while request_items:
+            if attempt > 0:
+                if attempt >= max_attempts:
+                    unprocessed = len(request_items.get(table_name, []))
+                    raise RekognitionBatchWriteError(
+                        f"{unprocessed} item(s) remained unprocessed in {table_name} after {attempt} attempts"
+                    )
+                retval["retries"] += 1
+                time.sleep(backoff_delay(attempt, base_delay))
+            response = client.batch_write_item(RequestItems=request_items)
+            retval["requests"] += 1
+            request_items = response.get("UnprocessedItems") or {}
+            attempt += 1
+        retval["items"] += len(chunk)
+
+    if retval["retries"]:
+        logger.warning(
+            "batch_write_items() needed %s retries to write %s items to %s",
+            retval["retries"],
+            retval["items"],
+            table_name,
+        )
+    return retval
+
+
+def batch_write_items(
+    table,
+    items: List[dict],
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> dict:
+    """
+    Write items to a DynamoDB Table resource with BatchWriteItem, in chunks of 25.
+    See batch_write_requests().
+    """
+    return batch_write_requests(table, [{"PutRequest": {"Item": item}} for item in items], max_attempts, base_delay)
+
+
+def batch_delete_items(
+    table,
+    key_name: str,
+    key_values: List[str],
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> dict:
+    """
+    Delete items from a DynamoDB Table resource with BatchWriteItem, in chunks
+    of 25. key_values are de-duplicated, since BatchWriteItem rejects duplicate
+    keys. See batch_write_requests().
+    """
+    requests = [{"DeleteRequest": {"Key": {key_name: value}}} for value in dict.fromkeys(key_values)]
+    return batch_write_requests(table, requests, max_attempts, base_delay)
+
+
+def batch_get_items(
+    table,
+    key_name: str,
+    key_values: List[str],
+    attributes: Optional[List[str]] = None,
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> Dict[str, dict]:
+    """
+    Fetch items from a DynamoDB Table resource with BatchGetItem, in chunks of 100 keys.
+
+    key_values are de-duplicated, since BatchGetItem rejects duplicate keys.
+    attributes, if provided, becomes the ProjectionExpression; the key
+    attribute is always included so that items can be mapped back to their
+    keys. UnprocessedKeys are re-submitted with exponential backoff until they
+    are read or max_attempts is exhausted, in which case
+    RekognitionBatchGetError is raised.
+
+    Returns a dict of items keyed by key value. Keys that do not exist in the
+    table are absent from the result. BatchGetItem does not preserve request
+    order, so callers that care about ordering should iterate their own keys.
+    """
+    client = table.meta.client
+    table_name = table.name
+    keys_and_attributes = {}
+    if attributes:
+        attributes = [key_name] + [attribute for attribute in attributes if attribute != key_name]
+        names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)}
+        keys_and_attributes["ProjectionExpression"] = ", ".join(names.keys())
+        keys_and_attributes["ExpressionAttributeNames"] = names
+
+    retval = {}
+    for chunk in chunks(list(dict.fromkeys(key_values)), BATCH_GET_MAX_KEYS):
+        request_items = {table_name: {"Keys": [{key_name: value} for value in chunk], **keys_and_attributes}}
+        attempt = 0
+        while request_items:
+            if attempt > 0:
+                if attempt >= max_attempts:
+                    unprocessed = len(request_items.get(table_name, {}).get("Keys", []))
+                    raise RekognitionBatchGetError(
+                        f"{unprocessed} key(s) remained unprocessed in {table_name} after {attempt} attempts"
+                    )
+                time.sleep(backoff_delay(attempt, base_delay))
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table_name, []):
+                retval[item[key_name]] = item
+            request_items = response.get("UnprocessedKeys") or {}
+            attempt += 1
+
+    return retval
+
+
+async def async_batch_write_items(
+    table,
+    items: List[dict],
+    max_concurrency: int,
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> dict:
+    """
+    Concurrent batch_write_items(): each chunk of 25 items is written by its own
+    BatchWriteItem request, at most max_concurrency at a time. Returns the
+    same metrics as batch_write_items(), summed over all chunks.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def write_chunk(chunk: List[dict]) -> dict:
+        async with semaphore:
+            return await asyncio.to_thread(batch_write_items, table, chunk, max_attempts, base_delay)
+
+    retval = {"items": 0, "requests": 0, "retries": 0}
+    for metrics in await asyncio.gather(*(write_chunk(chunk) for chunk in chunks(items, BATCH_WRITE_MAX_ITEMS))):
+        for key, value in metrics.items():
+            retval[key] += value
+    return retval
+
+
+async def async_batch_get_items(
+    table,
+    key_name: str,
+    key_values: List[str],
+    max_concurrency: int,
+    attributes: Optional[List[str]] = None,
+    max_attempts: int = BATCH_MAX_ATTEMPTS,
+    base_delay: float = BATCH_BASE_DELAY,
+) -> Dict[str, dict]:
+    """
+    Concurrent batch_get_items(): each chunk of 100 keys is read by its own
+    BatchGetItem request, at most max_concurrency at a time.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get_chunk(chunk: List[str]) -> Dict[str, dict]:
+        async with semaphore:
+            return await asyncio.to_thread(
+                batch_get_items, table, key_name, chunk, attributes, max_attempts, base_delay
+            )
+
+    retval = {}
+    key_values = list(dict.fromkeys(key_values))
+    for items in await asyncio.gather(*(get_chunk(chunk) for chunk in chunks(key_values, BATCH_GET_MAX_KEYS))):
+        retval.update(items)
+    return retval
@@ -1,25 +1,76 @@
 # -*- coding: utf-8 -*-
 """Module exceptions.py"""
 
-import boto3
-
-
-rekognition_client = boto3.client("rekognition")
-
-EXCEPTION_MAP = {
-    rekognition_client.exceptions.ThrottlingException: (401, "InvalidParameterException"),
-    rekognition_client.exceptions.ProvisionedThroughputExceededException: (401, "InvalidParameterException"),
-    rekognition_client.exceptions.ServiceQuotaExceededException: (401, "InvalidParameterException"),
-    rekognition_client.exceptions.AccessDeniedException: (403, "AccessDeniedException"),
-    rekognition_client.exceptions.ResourceNotFoundException: (404, "ResourceNotFoundException"),
-    rekognition_client.exceptions.InvalidS3ObjectException: (406, "InvalidS3ObjectException"),
-    rekognition_client.exceptions.ImageTooLargeException: (406, "ImageTooLargeException"),
-    rekognition_client.exceptions.InvalidImageFormatException: (406, "InvalidImageFormatException"),
-    rekognition_client.exceptions.InternalServerError: (500, "InternalServerError"),
-    Exception: (500, "InternalServerError"),
+# 3rd party stuff
+from botocore.exceptions import ClientError
+
+
+# Rekognition errors, and the HTTP response that each maps to.
+# see https://docs.aws.amazon.com/rekognition/latest/dg/error-handling.html
+EXCEPTION_CODE_MAP = {
+    "ThrottlingException": (401, "InvalidParameterException"),
+    "ProvisionedThroughputExceededException": (401, "InvalidParameterException"),
+    "ServiceQuotaExceededException": (401, "InvalidParameterException"),
+    "AccessDeniedException": (403, "AccessDeniedException"),
+    "ResourceNotFoundException": (404, "ResourceNotFoundException"),
+    "InvalidS3ObjectException": (406, "InvalidS3ObjectException"),
+    "ImageTooLargeException": (406, "ImageTooLargeException"),
+    "InvalidImageFormatException": (406, "InvalidImageFormatException"),
+    "InternalServerError": (500, "InternalServerError"),
 }
 
 
+def is_rekognition_exception(exception_class) -> bool:
+    """
+    was exception_class generated by botocore for a Rekognition client of
+    Settings? Only clients that already exist are checked, since one of them
+    raised the exception if any did, so this never creates a client.
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from rekognition_api.conf import settings
+
+    clients = [client for key, client in list(settings._aws_clients.items()) if key.startswith("rekognition.")]
+    return any(client.exceptions.from_code(exception_class.__name__) is exception_class for client in clients)
+
+
+class ExceptionMap(dict):
+    """
+    Map exception classes to HTTP responses.
+
+    Our own exceptions, added with the class as the key, map by class.
+    Rekognition's errors map by error code, the name that botocore gives
+    its modeled exception classes, but only when the class is the
+    Rekognition client's own: other services, ie S3 and DynamoDB, raise
+    classes with the same names, ThrottlingException for one. Neither
+    importing this module nor mapping an error creates a boto3 client.
+    """
+
+    def __init__(self, classes: dict, codes: dict):
+        super().__init__(classes)
+        self.codes = codes
+
+    def get(self, key, default=None):
+        if super().__contains__(key):
+            return super().__getitem__(key)
+        if (
+            isinstance(key, type)
+            and issubclass(key, ClientError)
+            and key.__name__ in self.codes
+            and is_rekognition_exception(key)
+        ):
+            return self.codes[key.__name__]
+        return default
+
+    def __getitem__(self, key):
+        retval = self.get(key)
+        if retval is None:
+            raise KeyError(key)
+        return retval
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
 class RekognitionConfigurationError(Exception):
     """Exception raised for errors in the configuration."""
 
@@ -42,3 +93,45 @@ class RekognitionIlligalInvocationError(Exception):
     def __init__(self, message):
         self.message = message
         super().__init__(self.message)
+
+
+class RekognitionBatchWriteError(Exception):
+    """Exception raised when a DynamoDB batch write leaves items unprocessed."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RekognitionBatchGetError(Exception):
+    """Exception raised when a DynamoDB batch get leaves keys unprocessed."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RekognitionBadRequestError(Exception):
+    """Exception raised when a request body cannot be decoded into an image."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RekognitionPayloadTooLargeError(Exception):
+    """Exception raised when a request body exceeds the maximum payload size."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+EXCEPTION_MAP = ExceptionMap(
+    {
+        RekognitionBadRequestError: (400, "BadRequest"),
+        RekognitionPayloadTooLargeError: (413, "PayloadTooLarge"),
+        Exception: (500, "InternalServerError"),
+    },
+    EXCEPTION_CODE_MAP,
+)
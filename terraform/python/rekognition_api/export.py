@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Export the faceprint table to a gzip NDJSON or Parquet file.
+
+The table is read with a parallel Scan, one thread per segment, on the
+low-level DynamoDB client. The boto3 Table resource, and its meta.client,
+deserialize every number into a Decimal, which then has to be converted
+again before it can be written; here, the raw AttributeValues are converted
+straight to native types (deserialize()), and Parquet row groups are built
+column-wise by pyarrow (Table.from_pylist()) rather than value by value.
+
+Each segment adapts its own page size (the Scan Limit): it doubles after
+every page that was read without retries, up to max_page_size, and halves
+when botocore had to retry a throttled request, down to min_page_size. Pages
+go through a bounded queue to a single writer, so at most a few pages per
+segment, plus one Parquet row group, are held in memory at a time.
+
+The run reports rows, throughput and the read capacity that the Scan
+consumed (ReturnConsumedCapacity), to size exports against provisioned
+tables. Parquet needs pyarrow (pip install pyarrow), which is not in the
+Lambda layer; gzip NDJSON has no dependencies.
+
+usage:
+    python -m rekognition_api.export faceprints.ndjson.gz --segments 16
+    python -m rekognition_api.export s3://backup-bucket/faceprints.parquet
+"""
+
+# python stuff
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# 3rd party stuff
+from botocore.exceptions import ClientError
+
+# our stuff
+from rekognition_api.conf import settings
+from rekognition_api.const import THROTTLING_ERROR_CODES
+from rekognition_api.dynamodb import BATCH_MAX_ATTEMPTS, backoff_delay
+from rekognition_api.exceptions import (
+    RekognitionConfigurationError,
+    RekognitionValueError,
+)
+from rekognition_api.utils import parse_s3_uri
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+PARQUET_ROW_GROUP_SIZE = 65536
+QUEUE_PAGES_PER_SEGMENT = 2
+
+
+def number(value: str):
+    """return a DynamoDB N value as an int or a float, without going through Decimal"""
+    if "." in value or "e" in value or "E" in value:
+        return float(value)
+    return int(value)
+
+
+def deserialize(attribute_value: dict):
+    """return the native Python value of a DynamoDB AttributeValue"""
+    # pylint: disable=too-many-return-statements
+    (attribute_type, value), *_ = attribute_value.items()
+    if attribute_type == "S":
+        return value
+    if attribute_type == "N":
+        return number(value)
+    if attribute_type == "M":
+        return {k: deserialize(v) for k, v in value.items()}
+    if attribute_type == "L":
+        return [deserialize(v) for v in value]
+    if attribute_type in ("BOOL", "SS"):
+        return value
+    if attribute_type == "NULL":
+        return None
+    if attribute_type == "NS":
+        return [number(v) for v in value]
+    if attribute_type == "B":
+        return base64.b64encode(value).decode("ascii")
+    if attribute_type == "BS":
+        return [base64.b64encode(v).decode("ascii") for v in value]
+    raise RekognitionValueError(f"unknown DynamoDB attribute type: {attribute_type}")
+
+
+def deserialize_item(item: dict) -> dict:
+    """return a DynamoDB item of AttributeValues as a dict of native Python values"""
+    return {name: deserialize(attribute_value) for name, attribute_value in item.items()}
+
+
+def get_parquet_schema():
+    """the pyarrow schema of a faceprint, as written by lambda_index"""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    bounding_box = pa.struct([(name, pa.float64()) for name in ("Width", "Height", "Left", "Top")])
+    return pa.schema(
+        [
+            ("FaceId", pa.string()),
+            ("ImageId", pa.string()),
+            ("ExternalImageId", pa.string()),
+            ("Confidence", pa.float64()),
+            ("BoundingBox", bounding_box),
+            ("bucket", pa.string()),
+            ("key", pa.string()),
+            ("metadata", pa.map_(pa.string(), pa.string())),
+        ]
+    )
+
+
+class NdjsonWriter:
+    """Writes rows as gzip-compressed newline-delimited JSON."""
+
+    def __init__(self, path: str):
+        self.file = gzip.open(path, "wt", encoding="utf-8")  # pylint: disable=consider-using-with
+
+    def write(self, rows: List[dict]) -> None:
+        """append rows"""
+        self.file.write("".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows))
+
+    def close(self) -> None:
+        """flush and close the file"""
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Writes rows to a Parquet file, in row groups of row_group_size rows.
+    Attributes that are not in get_parquet_schema() are not exported.
+    """
+
+    def __init__(self, path: str, row_group_size: Optional[int] = None):
+        try:
+            # pylint: disable=import-outside-toplevel
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RekognitionConfigurationError("Parquet exports need pyarrow: pip install pyarrow") from e
+        self.pa = pa
+        self.schema = get_parquet_schema()
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.row_group_size = row_group_size or PARQUET_ROW_GROUP_SIZE
+        self.rows = []
+
+    def flush(self) -> None:
+        """write the buffered rows as a row group"""
+        if self.rows:
+            self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def write(self, rows: List[dict]) -> None:
+        """append rows"""
+        self.rows += rows
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def close(self) -> None:
+        """write the last row group and close the file"""
+        self.flush()
+        self.writer.close()
+
+
+def get_export_format(path: str, export_format: Optional[str] = None) -> str:
+    """return export_format, or the format that the path's suffix implies"""
+    if export_format is None:
+        export_format = "parquet" if path.lower().endswith(".parquet") else "ndjson"
+    if export_format not in EXPORT_FORMATS:
+        raise RekognitionValueError(f"unsupported export format: {export_format}. Use one of {EXPORT_FORMATS}")
+    return export_format
+
+
+def get_writer(path: str, export_format: str):
+    """return the writer of export_format"""
+    if export_format == "parquet":
+        return ParquetWriter(path)
+    return NdjsonWriter(path)
+
+
+class AdaptivePageSize:
+    """The Scan Limit of one segment: doubled after clean pages, halved after throttled ones."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = max(minimum, min(initial, maximum))
+
+    def update(self, throttled: bool) -> None:
+        """adapt to the outcome of the last request"""
+        if throttled:
+            self.value = max(self.minimum, self.value // 2)
+        else:
+            self.value = min(self.maximum, self.value * 2)
+
+
+class Export:
+    """
+    Scan a DynamoDB table with total_segments parallel segments, and write
+    its rows with writer. page_size is the initial Scan Limit of each segment.
+    """
+
+    def __init__(
+        self,
+        table,
+        writer,
+        total_segments: int = 8,
+        page_size: int = 1000,
+        min_page_size: int = 25,
+        max_page_size: int = 10000,
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.table = table
+        # the Table resource's own client deserializes items into Decimals
+        self.client = settings.aws_dynamodb_client
+        self.writer = writer
+        self.total_segments = total_segments
+        self.page_size = page_size
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.pages = queue.Queue(maxsize=total_segments * QUEUE_PAGES_PER_SEGMENT)
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def count(self, **values) -> None:
+        """add values to the metrics"""
+        with self.lock:
+            for key, value in values.items():
+                self.metrics[key] += value
+
+    def put(self, page) -> None:
+        """queue a page for the writer, unless the export has stopped"""
+        while not self.stopped.is_set():
+            try:
+                self.pages.put(page, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def scan(self, kwargs: dict, page_size: AdaptivePageSize) -> dict:
+        """Scan one page, halving the page size and retrying throttling errors that botocore gave up on"""
+        attempt = 0
+        while True:
+            kwargs["Limit"] = page_size.value
+            try:
+                response = self.client.scan(**kwargs)
+            except ClientError as e:
+                attempt += 1
+                if e.response.get("Error", {}).get("Code") not in THROTTLING_ERROR_CODES or attempt >= BATCH_MAX_ATTEMPTS:
+                    raise
+                self.count(throttles=1)
+                page_size.update(throttled=True)
+                time.sleep(backoff_delay(attempt))
+                continue
+            retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+            page_size.update(throttled=retries > 0)
+            self.count(
+                pages=1,
+                throttles=retries,
+                consumedReadCapacityUnits=response.get("ConsumedCapacity", {}).get("CapacityUnits", 0.0),
+            )
+            return response
+
+    def scan_segment(self, segment: int) -> None:
+        """scan one segment onto the queue, followed by None"""
+        page_size = AdaptivePageSize(self.page_size, self.min_page_size, self.max_page_size)
+        kwargs = {
+            "TableName": self.table.name,
+            "Segment": segment,
+            "TotalSegments": self.total_segments,
+            "ReturnConsumedCapacity": "TOTAL",
+        }
+        try:
+            while not self.stopped.is_set():
+                response = self.scan(kwargs, page_size)
+                self.put([deserialize_item(item) for item in response.get("Items", [])])
+                if "LastEvaluatedKey" not in response:
+                    return
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        finally:
+            self.put(None)
+
+    def write_pages(self) -> None:
+        """write the queued pages until every segment has finished"""
+        finished = 0
+        while finished < self.total_segments:
+            rows = self.pages.get()
+            if rows is None:
+                finished += 1
+                continue
+            self.writer.write(rows)
+            self.metrics["rows"] += len(rows)
+
+    def stop(self) -> None:
+        """stop the segments, and discard the pages that they queued"""
+        self.stopped.set()
+        while True:
+            try:
+                self.pages.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self) -> dict:
+        """export the table. returns the run's metrics"""
+        self.metrics = {"rows": 0, "pages": 0, "throttles": 0, "consumedReadCapacityUnits": 0.0}
+        start = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=self.total_segments, thread_name_prefix="export") as executor:
+                futures = [executor.submit(self.scan_segment, segment) for segment in range(self.total_segments)]
+                try:
+                    self.write_pages()
+                except BaseException:
+                    # the executor waits for the segments on exit, and they block on a full queue until stopped
+                    self.stop()
+                    raise
+                for future in futures:
+                    future.result()
+        finally:
+            self.stopped.set()
+            self.writer.close()
+        elapsed = max(time.monotonic() - start, 1e-9)
+        return {
+            **self.metrics,
+            "segments": self.total_segments,
+            "consumedReadCapacityUnits": round(self.metrics["consumedReadCapacityUnits"], 2),
+            "elapsedSeconds": round(elapsed, 3),
+            "rowsPerSecond": round(self.metrics["rows"] / elapsed, 2),
+            "readCapacityUnitsPerSecond": round(self.metrics["consumedReadCapacityUnits"] / elapsed, 2),
+        }
+
+
+def export_table(
+    output: str, export_format: Optional[str] = None, table_id: Optional[str] = None, **kwargs
+) -> dict:
+    """
+    Export a DynamoDB table, by default the faceprint table, to output: a
+    local path or an s3:// uri. Returns the export's metrics.
+    """
+    export_format = get_export_format(output, export_format)
+    table = settings.get_dynamodb_table(table_id) if table_id else settings.dynamodb_table
+    if not output.startswith("s3://"):
+        metrics = Export(table, get_writer(output, export_format), **kwargs).run()
+        return {**metrics, "format": export_format, "output": output, "bytes": os.path.getsize(output)}
+
+    bucket, key = parse_s3_uri(output)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, os.path.basename(key) or "export")
+        metrics = Export(table, get_writer(path, export_format), **kwargs).run()
+        size = os.path.getsize(path)
+        settings.aws_s3_client.meta.client.upload_file(path, bucket, key)
+    return {**metrics, "format": export_format, "output": output, "bytes": size}
+
+
+def main(argv=None):
+    """export the faceprint table"""
+    parser = argparse.ArgumentParser(description="Export the faceprint table to gzip NDJSON or Parquet.")
+    parser.add_argument("output", help="output file or s3:// uri. *.parquet is written as Parquet")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="output format (default: from the output suffix)")
+    parser.add_argument("--table", help="DynamoDB table id (default: the faceprint table)")
+    parser.add_argument("--segments", type=int, default=8, help="parallel scan segments (default 8)")
+    parser.add_argument("--page-size", type=int, default=1000, help="initial Scan Limit of each segment")
+    parser.add_argument("--max-page-size", type=int, default=10000, help="largest Scan Limit of each segment")
+    args = parser.parse_args(argv)
+    metrics = export_table(
+        args.output,
+        export_format=args.format,
+        table_id=args.table,
+        total_segments=args.segments,
+        page_size=args.page_size,
+        max_page_size=args.max_page_size,
+    )
+    json.dump(metrics, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped FaceId -> ExternalImageId snapshot of the faceprint table.
+
+lambda_search only needs the ExternalImageId of each FaceMatch, yet resolving
+them costs a DynamoDB round trip on every search. The snapshot is a compact,
+sorted binary file of exactly that mapping, which lambda_search downloads once
+per container, memory-maps, and binary searches. FaceIds that are missing from
+it fall back to DynamoDB, so a stale snapshot is slower but never wrong.
+
+File layout (little-endian):
+    header:  magic b"RKFS", version u16, key_width u16, count u32, built_at_ms u64
+    index:   count x (FaceId padded with NUL to key_width bytes, offset u32, length u32), sorted by FaceId
+    strings: the utf-8 ExternalImageIds that the index points into
+
+S3 layout, under Settings.aws_faceprint_snapshot_prefix:
+    snapshot.bin                        the full snapshot, built by build_snapshot()
+    deltas/<epoch ms>-<uuid>.json       FaceId -> ExternalImageId of faces indexed since,
+                                        written once per lambda_index invocation. Deltas newer than the
+                                        snapshot are applied on top of it when it is loaded.
+
+Deltas accumulate until build_snapshot() absorbs and deletes them, so run it
+periodically. Until then, a load applies at most
+Settings.aws_faceprint_snapshot_max_deltas of the newest deltas, fetched
+concurrently; the faces of older ones fall back to DynamoDB.
+
+lambda_index is only notified of image uploads (see lambda_index.tf), and
+ignores every object under the prefix.
+
+usage:
+    python -m rekognition_api.face_snapshot --segments 8
+"""
+
+# python stuff
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# 3rd party stuff
+from botocore.exceptions import ClientError
+
+# our stuff
+from rekognition_api.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"RKFS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHHIQ")
+SNAPSHOT_FILENAME = "snapshot.bin"
+DELTAS_PREFIX = "deltas/"
+DELTAS_MAX_WORKERS = 16
+
+
+def write_snapshot(file, rows: Dict[str, str], built_at_ms: int) -> None:
+    """write rows, a dict of FaceId -> ExternalImageId, to a binary file object"""
+    face_ids = sorted(rows, key=lambda face_id: face_id.encode("utf-8"))
+    key_width = max((len(face_id.encode("utf-8")) for face_id in face_ids), default=0)
+    entry = struct.Struct(f"<{key_width}sII")
+    strings = bytearray()
+    index = bytearray()
+    for face_id in face_ids:
+        value = rows[face_id].encode("utf-8")
+        index += entry.pack(face_id.encode("utf-8"), len(strings), len(value))
+        strings += value
+    file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, key_width, len(face_ids), built_at_ms))
+    file.write(index)
+    file.write(strings)
+
+
+class FaceSnapshot:
+    """Read-only view of a snapshot held in a buffer, typically an mmap"""
+
+    def __init__(self, buffer):
+        if len(buffer) < SNAPSHOT_HEADER.size:
+            raise ValueError("truncated faceprint snapshot header")
+        magic, version, self.key_width, self.count, self.built_at_ms = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"not a version {SNAPSHOT_VERSION} faceprint snapshot")
+        self._buffer = buffer
+        self._entry = struct.Struct(f"<{self.key_width}sII")
+        self._index_offset = SNAPSHOT_HEADER.size
+        self._strings_offset = self._index_offset + self.count * self._entry.size
+        if len(buffer) < self._strings_offset:
+            raise ValueError("truncated faceprint snapshot index")
+        # strings are written in index order, so the last entry's string ends the file
+        strings_size = 0
+        if self.count:
+            _, offset, length = self._entry.unpack_from(buffer, self._strings_offset - self._entry.size)
+            strings_size = offset + length
+        if len(buffer) < self._strings_offset + strings_size:
+            raise ValueError("truncated faceprint snapshot strings")
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, i: int) -> bytes:
+        offset = self._index_offset + i * self._entry.size
+        return self._buffer[offset : offset + self.key_width]
+
+    def get(self, face_id: str) -> Optional[str]:
+        """binary search for face_id, returning its ExternalImageId or None"""
+        key = face_id.encode("utf-8")
+        if len(key) > self.key_width:
+            return None
+        key = key.ljust(self.key_width, b"\0")
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self.count or self._key(low) != key:
+            return None
+        _, offset, length = self._entry.unpack_from(self._buffer, self._index_offset + low * self._entry.size)
+        start = self._strings_offset + offset
+        return bytes(self._buffer[start : start + length]).decode("utf-8")
+
+
+def map_snapshot(path: str) -> FaceSnapshot:
+    """memory-map the snapshot file at path. raises ValueError if it is empty, truncated or not a snapshot"""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError("empty faceprint snapshot")
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return FaceSnapshot(buffer)
+    except ValueError:
+        buffer.close()
+        raise
+
+
+def get_snapshot_key() -> str:
+    """the S3 key of the full snapshot"""
+    return f"{settings.aws_faceprint_snapshot_prefix}/{SNAPSHOT_FILENAME}"
+
+
+def get_deltas_prefix() -> str:
+    """the S3 key prefix of the delta files"""
+    return f"{settings.aws_faceprint_snapshot_prefix}/{DELTAS_PREFIX}"
+
+
+def is_snapshot_object(key: str) -> bool:
+    """is key one of the snapshot's own S3 objects?"""
+    return key.startswith(settings.aws_faceprint_snapshot_prefix + "/")
+
+
+def write_delta(rows: Dict[str, str]) -> Optional[str]:
+    """publish rows, a dict of FaceId -> ExternalImageId, as a new delta file. returns its S3 key"""
+    if not settings.aws_faceprint_snapshot_enabled or not rows:
+        return None
+    key = f"{get_deltas_prefix()}{int(time.time() * 1000):013d}-{uuid.uuid4().hex}.json"
+    settings.aws_s3_client.meta.client.put_object(
+        Bucket=settings.aws_s3_bucket_name, Key=key, Body=json.dumps(rows).encode("utf-8")
+    )
+    return key
+
+
+def scan_segment(segment: int, total_segments: int) -> Dict[str, str]:
+    """return FaceId -> ExternalImageId of one parallel scan segment of the faceprint table"""
+    table = settings.dynamodb_table
+    kwargs = {
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ProjectionExpression": "FaceId, ExternalImageId",
+    }
+    retval = {}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            if "ExternalImageId" in item:
+                retval[item["FaceId"]] = item["ExternalImageId"]
+        if "LastEvaluatedKey" not in response:
+            return retval
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def build_snapshot(total_segments: int = 8) -> dict:
+    """
+    Build a snapshot of the faceprint table with a parallel scan, publish it to
+    S3, and delete the delta files that it supersedes. Returns build metrics.
+    """
+    start = time.perf_counter()
+    # deltas written while the scan runs may or may not be in the scan, so only
+    # those written before it started are safe to supersede
+    built_at_ms = int(time.time() * 1000)
+    rows = {}
+    with ThreadPoolExecutor(max_workers=total_segments, thread_name_prefix="face_snapshot") as executor:
+        for segment_rows in executor.map(scan_segment, range(total_segments), [total_segments] * total_segments):
+            rows.update(segment_rows)
+
+    s3_client = settings.aws_s3_client.meta.client
+    bucket = settings.aws_s3_bucket_name
+    with tempfile.TemporaryFile() as file:
+        write_snapshot(file, rows, built_at_ms)
+        size = file.tell()
+        file.seek(0)
+        s3_client.upload_fileobj(file, bucket, get_snapshot_key())
+
+    superseded = [key for key, delta_ms in list_deltas() if delta_ms < built_at_ms]
+    for i in range(0, len(superseded), 1000):
+        s3_client.delete_objects(
+            Bucket=bucket, Delete={"Objects": [{"Key": key} for key in superseded[i : i + 1000]], "Quiet": True}
+        )
+    return {
+        "faces": len(rows),
+        "bytes": size,
+        "deltasDeleted": len(superseded),
+        "builtAtMs": built_at_ms,
+        "latencyMs": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def read_deltas(keys: List[str]) -> Dict[str, str]:
+    """return FaceId -> ExternalImageId of the delta files keys, oldest first, fetched concurrently"""
+    s3_client = settings.aws_s3_client.meta.client
+    bucket = settings.aws_s3_bucket_name
+
+    def read_delta(key: str) -> Dict[str, str]:
+        return json.loads(s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
+
+    retval = {}
+    if not keys:
+        return retval
+    with ThreadPoolExecutor(max_workers=min(len(keys), DELTAS_MAX_WORKERS), thread_name_prefix="face_snapshot") as executor:
+        # map() preserves the order of keys, so newer deltas win
+        for rows in executor.map(read_delta, keys):
+            retval.update(rows)
+    return retval
+
+
+def list_deltas() -> List[tuple]:
+    """return [(key, epoch ms)] of every delta file, oldest first"""
+    retval = []
+    paginator = settings.aws_s3_client.meta.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=settings.aws_s3_bucket_name, Prefix=get_deltas_prefix()):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(get_deltas_prefix()) :]
+            retval.append((obj["Key"], int(name.split("-", 1)[0])))
+    return sorted(retval, key=lambda delta: delta[1])
+
+
+class FaceSnapshotStore:
+    """
+    The snapshot, plus any newer deltas, loaded once per container. Loading
+    failures are logged and leave the store empty, so that every lookup falls
+    back to DynamoDB.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[FaceSnapshot] = None
+        self.deltas: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """is the snapshot enabled?"""
+        return settings.aws_faceprint_snapshot_enabled
+
+    def load(self) -> None:
+        """download and memory-map the snapshot, and apply the deltas that are newer than it"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                self._load()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("could not load the faceprint snapshot: %s", e)
+            self._loaded = True
+
+    def _load(self):
+        """
+        A missing, empty, truncated or otherwise invalid snapshot is treated
+        as no snapshot: the deltas are still applied, and the rest of the
+        faces fall back to DynamoDB.
+        """
+        s3_client = settings.aws_s3_client.meta.client
+        bucket = settings.aws_s3_bucket_name
+        built_at_ms = 0
+        with tempfile.NamedTemporaryFile(prefix="faceprint-snapshot-", delete=False) as file:
+            path = file.name
+        try:
+            s3_client.download_file(bucket, get_snapshot_key(), path)
+            self.snapshot = map_snapshot(path)
+            built_at_ms = self.snapshot.built_at_ms
+        except ClientError as e:
+            logger.warning("no faceprint snapshot at s3://%s/%s: %s", bucket, get_snapshot_key(), e)
+        except ValueError as e:
+            # treated as no snapshot: every delta is newer than it
+            logger.warning("ignoring the faceprint snapshot at s3://%s/%s: %s", bucket, get_snapshot_key(), e)
+        finally:
+            # the mmap keeps the data reachable after the file is unlinked
+            os.unlink(path)
+
+        keys = [key for key, delta_ms in list_deltas() if delta_ms >= built_at_ms]
+        max_deltas = settings.aws_faceprint_snapshot_max_deltas
+        if len(keys) > max_deltas:
+            logger.warning(
+                "%s faceprint deltas are newer than the snapshot, applying the newest %s. Run build_snapshot()",
+                len(keys),
+                max_deltas,
+            )
+            keys = keys[len(keys) - max_deltas :]
+        self.deltas = read_deltas(keys)
+
+    def get_many(self, face_ids: List[str]) -> Dict[str, str]:
+        """return FaceId -> ExternalImageId of the face_ids that are in the snapshot or its deltas"""
+        self.load()
+        retval = {}
+        for face_id in face_ids:
+            value = self.deltas.get(face_id)
+            if value is None and self.snapshot is not None:
+                value = self.snapshot.get(face_id)
+            if value is not None:
+                retval[face_id] = value
+        return retval
+
+    def clear(self) -> None:
+        """forget the loaded snapshot, so that the next lookup loads it again"""
+        with self._lock:
+            self.snapshot = None
+            self.deltas = {}
+            self._loaded = False
+
+
+face_snapshot = FaceSnapshotStore()
+
+
+def main():
+    """build and publish a snapshot of the faceprint table"""
+    parser = argparse.ArgumentParser(description="Build the faceprint snapshot used by lambda_search.")
+    parser.add_argument("--segments", type=int, default=8, help="parallel scan segments (default 8)")
+    args = parser.parse_args()
+    print(json.dumps(build_snapshot(total_segments=args.segments)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Downscale, recompress and crop /search images before they are sent to Rekognition.
+
+Phone cameras produce JPEGs of several MB, far more pixels than Rekognition
+needs to find faces, and up to and beyond its 5 MB limit on image Bytes
+(ImageTooLargeException). preprocess_image() applies the EXIF orientation,
+shrinks the image so that its longest side is at most max_dimension, and
+re-encodes it as a JPEG without EXIF metadata. Images that carry metadata,
+ie GPS position or device details, are always re-encoded, so that no
+metadata is forwarded to Rekognition.
+
+JPEGs are decoded with Image.draft(), which lets libjpeg decode directly at
+1/2, 1/4 or 1/8 scale, and the remaining resize uses thumbnail()'s reducing_gap,
+which does a fast Image.reduce() box reduction before the final resample.
+
+crop_image() cuts Rekognition bounding boxes out of an image, for the
+multi-face and region-of-interest searches of lambda_search. The image is
+decoded once, however many boxes are cropped.
+
+Pillow is imported on first use, so that it does not add to the cold start of
+Lambdas that have preprocessing disabled.
+"""
+
+# python stuff
+import io
+import logging
+import time
+from typing import List
+
+
+logger = logging.getLogger(__name__)
+
+# Image.info keys of metadata that re-encoding strips, besides EXIF
+METADATA_KEYS = ("xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+
+
+def preprocess_image(image_bytes: bytes, max_dimension: int, quality: int) -> bytes:
+    """
+    return image_bytes, oriented, downscaled to fit max_dimension and
+    re-encoded as a JPEG of the given quality. The original bytes are returned
+    if they cannot be decoded, which leaves the error to Rekognition, or if
+    they carry no metadata and re-encoding would not make them smaller.
+    """
+    # pylint: disable=import-outside-toplevel
+    from PIL import ExifTags, Image, ImageOps
+
+    start = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            size_in = image.size
+            exif = image.getexif()
+            orientation = exif.get(ExifTags.Base.Orientation, 1)
+            has_metadata = len(exif) > 0 or any(key in image.info for key in METADATA_KEYS)
+            scale = max_dimension / max(image.size)
+            if image.format == "JPEG" and scale < 1:
+                # decode at the smallest DCT scale that is still at least the target size
+                image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) > max_dimension:
+                image.thumbnail((max_dimension, max_dimension), reducing_gap=2.0)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            size_out = image.size
+            output = io.BytesIO()
+            # exif is not passed to save(), so the output carries no EXIF metadata
+            image.save(output, format="JPEG", quality=quality)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning("image preprocessing skipped, the image could not be decoded: %s", e)
+        return image_bytes
+
+    retval = output.getvalue()
+    if len(retval) >= len(image_bytes) and orientation == 1 and not has_metadata:
+        retval = image_bytes
+    logger.info(
+        "image preprocessing: %d bytes in, %d bytes out, %dx%d -> %dx%d, %.1f ms",
+        len(image_bytes),
+        len(retval),
+        *size_in,
+        *size_out,
+        (time.perf_counter() - start) * 1000,
+    )
+    return retval
+
+
+def crop_image(image_bytes: bytes, boxes: List[dict], padding: float = 0.0, quality: int = 90) -> List[bytes]:
+    """
+    return each of boxes, Rekognition BoundingBox dicts of Left, Top, Width and
+    Height ratios, cropped out of image_bytes and encoded as a JPEG. Each box is
+    grown by padding times its size on every side, and clipped to the image.
+    Rekognition reports bounding boxes of the EXIF-oriented image, so the
+    orientation is applied first.
+    """
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image, ImageOps
+
+    retval = []
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        width, height = image.size
+        for box in boxes:
+            left = (box["Left"] - box["Width"] * padding) * width
+            top = (box["Top"] - box["Height"] * padding) * height
+            right = (box["Left"] + box["Width"] * (1 + padding)) * width
+            bottom = (box["Top"] + box["Height"] * (1 + padding)) * height
+            left, top, right, bottom = max(0, int(left)), max(0, int(top)), min(width, int(right)), min(height, int(bottom))
+            if right <= left or bottom <= top:
+                # the box is entirely outside of the image
+                retval.append(b"")
+                continue
+            crop = image.crop((left, top, right, bottom))
+            output = io.BytesIO()
+            crop.save(output, format="JPEG", quality=quality)
+            retval.append(output.getvalue())
+    return retval
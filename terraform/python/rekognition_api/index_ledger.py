@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Ingest ledger for lambda_index.
+
+S3 redelivers event notifications, and ingest jobs re-upload identical files.
+Each of these would otherwise cost a Rekognition index_faces() call and add
+duplicate FaceIds to the collection, which in turn slows down every search.
+
+The ledger is a DynamoDB table keyed by bucket, key and ETag. Before calling
+Rekognition, lambda_index claims the object with a conditional put that only
+succeeds if no one has claimed it before. A claim that was never completed
+(ie the Lambda timed out mid-index) is considered abandoned after
+LEDGER_CLAIM_TIMEOUT seconds and may be claimed again. Failed records release
+their claim so that S3's retry can index them.
+
+The ledger is enabled by setting Settings.aws_index_ledger_table_id. Set
+Settings.aws_index_reindex, or pass "reindex": true in the event, to
+index objects regardless of the ledger.
+"""
+
+# python stuff
+import logging
+import time
+from typing import List
+
+# 3rd party stuff
+from botocore.exceptions import ClientError
+
+# our stuff
+from rekognition_api.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+LEDGER_STATUS_INDEXING = "indexing"
+LEDGER_STATUS_INDEXED = "indexed"
+LEDGER_CLAIM_TIMEOUT = 900  # seconds. the maximum Lambda timeout
+
+
+def ledger_key(bucket: str, key: str, etag: str) -> str:
+    """return the ledger key of an S3 object version"""
+    return f"s3://{bucket}/{key}#{etag}"
+
+
+class IndexLedger:
+    """DynamoDB-backed record of the S3 objects that have been indexed."""
+
+    @property
+    def enabled(self) -> bool:
+        """is the ledger configured?"""
+        return bool(settings.aws_index_ledger_table_id)
+
+    @property
+    def table(self):
+        """the ledger DynamoDB Table resource"""
+        return settings.get_dynamodb_table(settings.aws_index_ledger_table_id)
+
+    def claim(self, bucket: str, key: str, etag: str, reindex: bool = False) -> bool:
+        """
+        Claim an S3 object for indexing. Returns False if the object has
+        already been indexed, or is being indexed by another invocation.
+        Objects without an ETag cannot be de-duplicated and are always claimed,
+        as are all objects when reindex is True or the ledger is unavailable.
+        """
+        if not self.enabled or not etag:
+            return True
+        now = int(time.time())
+        item = {
+            "LedgerKey": ledger_key(bucket, key, etag),
+            "bucket": bucket,
+            "key": key,
+            "eTag": etag,
+            "Status": LEDGER_STATUS_INDEXING,
+            "ClaimedAt": now,
+        }
+        kwargs = {}
+        if not reindex:
+            kwargs = {
+                "ConditionExpression": "attribute_not_exists(LedgerKey) OR (#status = :indexing AND ClaimedAt < :stale)",
+                "ExpressionAttributeNames": {"#status": "Status"},
+                "ExpressionAttributeValues": {":indexing": LEDGER_STATUS_INDEXING, ":stale": now - LEDGER_CLAIM_TIMEOUT},
+            }
+        try:
+            self.table.put_item(Item=item, **kwargs)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            # the ledger is an optimization. never fail an index because of it.
+            logger.warning("index ledger claim failed for %s: %s", item["LedgerKey"], e)
+        return True
+
+    def complete(self, bucket: str, key: str, etag: str, face_ids: List[str]) -> None:
+        """record that an S3 object has been indexed, along with the FaceIds that it produced"""
+        if not self.enabled or not etag:
+            return
+        try:
+            self.table.update_item(
+                Key={"LedgerKey": ledger_key(bucket, key, etag)},
+                UpdateExpression="SET #status = :indexed, IndexedAt = :now, FaceIds = :face_ids",
+                ExpressionAttributeNames={"#status": "Status"},
+                ExpressionAttributeValues={
+                    ":indexed": LEDGER_STATUS_INDEXED,
+                    ":now": int(time.time()),
+                    ":face_ids": face_ids,
+                },
+            )
+        except ClientError as e:
+            logger.warning("index ledger complete failed for s3://%s/%s: %s", bucket, key, e)
+
+    def release(self, bucket: str, key: str, etag: str) -> None:
+        """release an uncompleted claim, so that the object can be indexed again"""
+        if not self.enabled or not etag:
+            return
+        try:
+            self.table.delete_item(
+                Key={"LedgerKey": ledger_key(bucket, key, etag)},
+                ConditionExpression="#status = :indexing",
+                ExpressionAttributeNames={"#status": "Status"},
+                ExpressionAttributeValues={":indexing": LEDGER_STATUS_INDEXING},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                logger.warning("index ledger release failed for s3://%s/%s: %s", bucket, key, e)
+
+
+index_ledger = IndexLedger()
@@ -32,9 +32,31 @@ AWS Lambda to process image files uploaded to S3.
 1.) analyze image file with Rekognition.index_faces() to generate
     'faceprints' of all faces found in the image
 
-2.) index each 'faceprint' by persisting it to DynamoDB
+2.) index each 'faceprint' by persisting it to DynamoDB, in batches of 25
+    with backoff/retry of any UnprocessedItems
 
-returns: a JSON HTTP response object.
+S3 can deliver several records in a single notification. Every record is
+processed, concurrently, on a bounded thread pool that is sized to the
+Lambda's memory tier (see Settings.lambda_index_max_workers).
+
+Objects that were already indexed (S3 redeliveries, identical re-uploads)
+are skipped before calling Rekognition. see index_ledger.py. Pass
+"reindex": true in the event to index them anyway. The faceprint snapshot's
+own objects (see face_snapshot.py) are always skipped.
+
+"view": "compact" in the event replaces each record's FaceRecords with
+their FaceIds in the response, and "fields" returns only the listed top
+level keys of the response. see projection.py.
+
+Each invocation writes one CloudWatch Embedded Metric Format line with the
+duration of each stage, summed over the records, and the record and face
+counts. see metrics.py.
+
+async_lambda_handler() is an asyncio variant that processes the records,
+and the DynamoDB writes of each record, concurrently. Deploy it with the
+handler rekognition_api.lambda_index.asyncio_lambda_handler
+
+returns: a JSON HTTP response object with per-record results.
 
 Note that this Lambda is invoked by an S3 'put' event, and as of sep-2023
 the response goes undetected by S3. I'm hopeful that the http response
@@ -43,21 +65,35 @@ detecting and forwarding these downstream to API Gateway.
 """
 
 # python stuff
-import json  # library for interacting with JSON data https://www.json.org/json-en.html
+import asyncio
 import logging  # library for interacting with application log data
-from decimal import (  # Python Decimal data type, for type casting JSON return data https://docs.python.org/3/library/decimal.html
-    Decimal,
-)
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from urllib.parse import (  # to 'de-escape' string representations of URL values
     unquote_plus,
 )
 
+from rekognition_api import metrics
 from rekognition_api.conf import settings
-from rekognition_api.exceptions import EXCEPTION_MAP, RekognitionIlligalInvocationError
+from rekognition_api.dynamodb import async_batch_write_items, batch_write_items
+from rekognition_api.exceptions import (
+    EXCEPTION_MAP,
+    RekognitionBadRequestError,
+    RekognitionIlligalInvocationError,
+)
+from rekognition_api.face_snapshot import is_snapshot_object, write_delta
+from rekognition_api.index_ledger import index_ledger
+from rekognition_api.projection import (
+    compact_index_response,
+    get_projection,
+    project,
+)
+from rekognition_api.serialization import to_decimal
+from rekognition_api.structured_logging import log, log_invocation
 
 # our stuff
 from rekognition_api.utils import (
-    cloudwatch_handler,
     exception_response_factory,
     http_response_factory,
 )
@@ -67,12 +103,19 @@ from rekognition_api.utils import (
 urllib3_logger = logging.getLogger("urllib3")
 urllib3_logger.setLevel(logging.CRITICAL)
 
+logger = logging.getLogger(__name__)
+
 
 def get_records(event):
     """returns the event records"""
     return event["Records"]
 
 
+def get_reindex(event) -> bool:
+    """returns True if already-indexed objects should be indexed again"""
+    return settings.aws_index_reindex or event.get("reindex") is True
+
+
 def get_bucket_name(event):
     """returns the bucket name from the event record"""
     records = get_records(event)
@@ -115,26 +158,67 @@ def validate_event(event):
     return True
 
 
-def unpack_s3_object(event, record):
-    """extracts the s3 object key, object, and object metadata from the event record"""
-    s3_bucket_name = get_bucket_name(event)
-    s3_object_key = unquote_plus(record["s3"]["object"]["key"], encoding="utf-8")
-    s3_object = settings.aws_s3_client.Object(s3_bucket_name, s3_object_key)
-    s3_object_metadata = {key.replace("x-amz-meta-", ""): s3_object.metadata[key] for key in s3_object.metadata.keys()}
-    return s3_object_key, s3_object_metadata
+def get_record_bucket_name(record):
+    """returns the bucket name from a single event record"""
+    return record["s3"]["bucket"]["name"]
 
 
-def get_faces(event, record):
-    """returns a list of faces found in the image"""
-    s3_bucket_name = get_bucket_name(event)
-    s3_object_key, _ = unpack_s3_object(event, record)
+class S3ObjectContext:
+    """
+    Everything the indexing stages need to know about the S3 object behind an
+    event record, computed once per record and shared by get_faces() and
+    persist_faceprints().
+
+    bucket, key, size and eTag are all carried by the S3 event itself. User
+    metadata is not, so it costs a HEAD request; it is fetched lazily, at most
+    once, and only when it is actually needed, ie when faces were found and
+    Settings.aws_s3_fetch_object_metadata is enabled.
+    """
 
+    def __init__(self, record):
+        s3_object = record["s3"]["object"]
+        self.bucket = get_record_bucket_name(record)
+        self.key = unquote_plus(s3_object["key"], encoding="utf-8")
+        self.size = s3_object.get("size")
+        self.etag = s3_object.get("eTag")
+        self._metadata = None
+
+    @property
+    def metadata(self) -> dict:
+        """the object's user metadata, without the x-amz-meta- prefix"""
+        if self._metadata is None:
+            if not settings.aws_s3_fetch_object_metadata:
+                self._metadata = {}
+                return self._metadata
+            response = settings.aws_s3_client.meta.client.head_object(Bucket=self.bucket, Key=self.key)
+            self._metadata = {
+                key.replace("x-amz-meta-", ""): value for key, value in response.get("Metadata", {}).items()
+            }
+            if self.size is None:
+                self.size = response.get("ContentLength")
+            if self.etag is None:
+                self.etag = response.get("ETag", "").strip('"') or None
+        return self._metadata
+
+
+@metrics.timed("unpack_s3_object")
+def unpack_s3_object(record) -> S3ObjectContext:
+    """extracts the s3 bucket, object key, size and eTag from the event record"""
+    return S3ObjectContext(record)
+
+
+@metrics.timed("get_faces")
+def get_faces(s3_object: S3ObjectContext):
+    """
+    returns a list of faces found in the image. Rekognition errors other than
+    'no faces found' are raised to the caller.
+    """
     faces = {"FaceRecords": []}
     try:
         faces = settings.aws_rekognition_client.index_faces(
             CollectionId=settings.aws_rekognition_collection_id,
-            Image={"S3Object": {"Bucket": s3_bucket_name, "Name": s3_object_key}},
-            ExternalImageId=s3_object_key,
+            Image={"S3Object": {"Bucket": s3_object.bucket, "Name": s3_object.key}},
+            ExternalImageId=s3_object.key,
             DetectionAttributes=[settings.aws_rekognition_face_detect_attributes],
             MaxFaces=settings.aws_rekognition_face_detect_max_faces_count,
             QualityFilter=settings.aws_rekognition_face_detect_quality_filter,
@@ -147,45 +231,281 @@ def get_faces(event, record):
         # returns an InvalidParameterException error
         pass
 
-    except Exception as e:
-        status_code, _message = EXCEPTION_MAP.get(type(e), (500, "Internal server error"))
-        return http_response_factory(status_code=status_code, body=exception_response_factory(e))
-
     return faces
 
 
-def persist_faceprints(event, record, faces):
+@metrics.timed("persist_faceprints")
+def persist_faceprints(s3_object: S3ObjectContext, faces) -> dict:
     """
-    Iterate the FaceRecords list, adding each face to DynamoDB table.
+    Add each face in the FaceRecords list to the DynamoDB table, batched
+    25 items per BatchWriteItem request. Returns the batch write metrics,
+    including how many UnprocessedItems retries were needed.
     Note: see the return JSON structure in doc/rekognition_index_faces.json
     """
-    s3_bucket_name = get_bucket_name(event)
-    s3_object_key, s3_object_metadata = unpack_s3_object(event, record)
+    return batch_write_items(settings.dynamodb_table, get_faceprint_items(s3_object, faces))
+
 
+def get_faceprint_items(s3_object: S3ObjectContext, faces) -> list:
+    """return the DynamoDB items of each face in the FaceRecords list"""
+    items = []
     for face in faces["FaceRecords"]:
         face = face["Face"]
-        face["bucket"] = s3_bucket_name
-        face["key"] = s3_object_key
-        face["metadata"] = s3_object_metadata
-        face = json.loads(json.dumps(face), parse_float=Decimal)
-        settings.dynamodb_table.put_item(Item=face)
+        face["bucket"] = s3_object.bucket
+        face["key"] = s3_object.key
+        face["metadata"] = s3_object.metadata
+        items.append(to_decimal(face))
+    return items
 
 
 def log_event_record(record):
-    """log the event record"""
-    if settings.debug_mode:
-        print(json.dumps({"event_record": record}))
+    """log the event record, if the invocation is sampled. see structured_logging.py"""
+    log("event_record", lambda: {"event_record": record})
+
+
+def record_result_factory() -> dict:
+    """return the initial per-record status dict"""
+    return {
+        "bucket": None,
+        "key": None,
+        "size": None,
+        "eTag": None,
+        "statusCode": 200,
+        "skipped": False,
+        "facesIndexed": 0,
+        "dynamodbRetries": 0,
+        "error": None,
+        "latencyMs": None,
+    }
+
+
+def set_record_object(retval: dict, s3_object: S3ObjectContext) -> None:
+    """copy the S3 object's identity into the per-record status dict"""
+    retval["bucket"] = s3_object.bucket
+    retval["key"] = s3_object.key
+    retval["size"] = s3_object.size
+    retval["eTag"] = s3_object.etag
+
+
+def claim_record(s3_object: S3ObjectContext, reindex: bool = False) -> bool:
+    """claim the record in the ingest ledger. returns False if the record is to be skipped"""
+    if is_snapshot_object(s3_object.key):
+        logger.info("skipping faceprint snapshot object %s", s3_object.key)
+        return False
+    if not index_ledger.claim(s3_object.bucket, s3_object.key, s3_object.etag, reindex=reindex):
+        logger.info("skipping already indexed record %s (eTag %s)", s3_object.key, s3_object.etag)
+        return False
+    return True
+
+
+def publish_snapshot_delta(results: list) -> None:
+    """
+    publish the new faces of every indexed record as one faceprint snapshot
+    delta per invocation, so that a batch does not add one delta per record.
+    The faces are already in DynamoDB, which lambda_search falls back to, so
+    failures are only logged.
+    """
+    rows = {
+        face["Face"]["FaceId"]: face["Face"]["ExternalImageId"]
+        for result in results
+        for face in result.get("FaceRecords", [])
+    }
+    try:
+        write_delta(rows)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning("failed to publish a faceprint snapshot delta: %s", e)
+
+
+def complete_record(retval: dict, s3_object: S3ObjectContext, faces, batch_write_metrics: dict) -> None:
+    """record a successfully indexed record in the ingest ledger and in its status dict"""
+    index_ledger.complete(
+        s3_object.bucket,
+        s3_object.key,
+        s3_object.etag,
+        face_ids=[face["Face"]["FaceId"] for face in faces["FaceRecords"]],
+    )
+    # size and eTag may have been filled in by the metadata HEAD request
+    set_record_object(retval, s3_object)
+    retval["facesIndexed"] = len(faces["FaceRecords"])
+    retval["dynamodbRetries"] = batch_write_metrics["retries"]
+    retval["FaceRecords"] = faces["FaceRecords"]
+
+
+def set_record_error(retval: dict, e: Exception, claimed: bool) -> None:
+    """record a failed record in its status dict, and release its ingest ledger claim"""
+    status_code, _message = EXCEPTION_MAP.get(type(e), (500, "Internal server error"))
+    retval["statusCode"] = status_code
+    retval["error"] = str(e)
+    logger.error("failed to index record %s: %s", retval["key"], e)
+    if claimed:
+        index_ledger.release(retval["bucket"], retval["key"], retval["eTag"])
+
+
+def process_record(record, reindex: bool = False) -> dict:
+    """
+    Index a single S3 event record: claim it in the ingest ledger, analyze the
+    image with Rekognition and persist its faceprints. Records that were
+    already indexed are skipped, unless reindex is True. Never raises; the
+    outcome is reported in the returned per-record status dict.
+    """
+    start = time.perf_counter()
+    retval = record_result_factory()
+    claimed = False
+    try:
+        s3_object = unpack_s3_object(record)
+        set_record_object(retval, s3_object)
+        log_event_record(record)
+        claimed = claim_record(s3_object, reindex=reindex)
+        if not claimed:
+            retval["skipped"] = True
+        else:
+            faces = get_faces(s3_object)
+            batch_write_metrics = persist_faceprints(s3_object, faces)
+            complete_record(retval, s3_object, faces, batch_write_metrics)
+    except Exception as e:
+        set_record_error(retval, e, claimed)
+    retval["latencyMs"] = round((time.perf_counter() - start) * 1000, 2)
+    return retval
+
+
+def process_records(event, max_workers: int = None) -> list:
+    """
+    Fan the event records out across a bounded thread pool, then publish
+    their faces as one snapshot delta. Results are returned in the same order
+    as the event records.
+    """
+    records = get_records(event)
+    process = partial(process_record, reindex=get_reindex(event))
+    max_workers = max(1, min(max_workers or settings.lambda_index_max_workers, len(records)))
+    if max_workers == 1:
+        results = [process(record) for record in records]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lambda_index") as executor:
+            results = list(executor.map(process, records))
+    publish_snapshot_delta(results)
+    return results
+
+
+def batch_response_factory(results: list) -> dict:
+    """aggregate the per-record results into a single response body"""
+    failed = [result for result in results if result["error"] is not None]
+    skipped = [result for result in results if result["skipped"]]
+    faces_indexed = sum(result["facesIndexed"] for result in results)
+    metrics.add_count("records", len(results))
+    metrics.add_count("recordsSkipped", len(skipped))
+    metrics.add_count("recordsFailed", len(failed))
+    metrics.add_count("facesIndexed", faces_indexed)
+    return {
+        "recordCount": len(results),
+        "indexedCount": len(results) - len(failed) - len(skipped),
+        "skippedCount": len(skipped),
+        "failedCount": len(failed),
+        "facesIndexed": faces_indexed,
+        "dynamodbRetries": sum(result["dynamodbRetries"] for result in results),
+        "records": results,
+    }
 
 
 # pylint: disable=unused-argument
+@metrics.handler("lambda_index")
 def lambda_handler(event, context):  # noqa: C901
     """Lambda entry point"""
 
-    cloudwatch_handler(event, settings.dump, debug_mode=settings.debug_mode)
-    validate_event(event)
-    records = get_records(event)
-    for record in records:
-        log_event_record(record)
-        faces = get_faces(event, record)
-        persist_faceprints(event, record, faces)
-        return http_response_factory(status_code=200, body=faces)
+    log_invocation(event)
+    is_valid = validate_event(event)
+    if is_valid is not True:
+        return is_valid
+    try:
+        projection = get_projection(event)
+    except RekognitionBadRequestError as e:
+        return http_response_factory(status_code=400, body=exception_response_factory(e))
+    results = process_records(event)
+    return batch_http_response_factory(results, projection)
+
+
+def batch_http_response_factory(results: list, projection: dict = None) -> dict:
+    """return the http response for the per-record results, projected to the request's view and fields"""
+    body = batch_response_factory(results)
+    status_code = 200
+    if body["failedCount"] == body["recordCount"]:
+        # every record failed. surface the first error's status code
+        status_code = results[0]["statusCode"]
+    return http_response_factory(status_code=status_code, body=project(body, projection, compact_index_response))
+
+
+@metrics.timed("persist_faceprints")
+async def async_persist_faceprints(s3_object: S3ObjectContext, faces) -> dict:
+    """async persist_faceprints(), with concurrent BatchWriteItem requests"""
+    # the object's metadata, a HEAD request, is the only i/o of get_faceprint_items()
+    await asyncio.to_thread(getattr, s3_object, "metadata")
+    items = get_faceprint_items(s3_object, faces)
+    return await async_batch_write_items(
+        settings.dynamodb_table, items, max_concurrency=settings.aws_async_max_concurrency
+    )
+
+
+async def async_process_record(record, semaphore: asyncio.Semaphore, reindex: bool = False) -> dict:
+    """async process_record(). at most semaphore's value of records are processed at a time"""
+    async with semaphore:
+        start = time.perf_counter()
+        retval = record_result_factory()
+        claimed = False
+        try:
+            s3_object = unpack_s3_object(record)
+            set_record_object(retval, s3_object)
+            log_event_record(record)
+            claimed = await asyncio.to_thread(claim_record, s3_object, reindex=reindex)
+            if not claimed:
+                retval["skipped"] = True
+            else:
+                faces = await asyncio.to_thread(get_faces, s3_object)
+                batch_write_metrics = await async_persist_faceprints(s3_object, faces)
+                await asyncio.to_thread(complete_record, retval, s3_object, faces, batch_write_metrics)
+        except Exception as e:
+            if claimed:
+                # releases the ingest ledger claim, a DynamoDB request
+                await asyncio.to_thread(set_record_error, retval, e, claimed)
+            else:
+                set_record_error(retval, e, claimed)
+        retval["latencyMs"] = round((time.perf_counter() - start) * 1000, 2)
+        return retval
+
+
+async def async_process_records(event) -> list:
+    """
+    Process every event record concurrently, at most aws_async_max_concurrency
+    at a time. Results are returned in the same order as the event records.
+    """
+    semaphore = asyncio.Semaphore(settings.aws_async_max_concurrency)
+    reindex = get_reindex(event)
+    results = await asyncio.gather(
+        *(async_process_record(record, semaphore, reindex=reindex) for record in get_records(event))
+    )
+    await asyncio.to_thread(publish_snapshot_delta, results)
+    return results
+
+
+# pylint: disable=unused-argument
+async def async_lambda_handler(event, context):
+    """
+    asyncio variant of lambda_handler(). Blocking boto3 calls run on worker
+    threads, so that records, and the DynamoDB writes of each record, are
+    processed concurrently. This only pays off for large batches: for a
+    single image it is no faster than lambda_handler(), since the event loop
+    and thread hand-offs cost about as much as the concurrency saves.
+    """
+    log_invocation(event)
+    is_valid = validate_event(event)
+    if is_valid is not True:
+        return is_valid
+    try:
+        projection = get_projection(event)
+    except RekognitionBadRequestError as e:
+        return http_response_factory(status_code=400, body=exception_response_factory(e))
+    results = await async_process_records(event)
+    return batch_http_response_factory(results, projection)
+
+
+@metrics.handler("lambda_index")
+def asyncio_lambda_handler(event, context):
+    """Lambda entry point for async_lambda_handler()"""
+    return asyncio.run(async_lambda_handler(event, context))
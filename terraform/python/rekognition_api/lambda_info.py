@@ -11,9 +11,11 @@ from rekognition_api.utils import http_response_factory
 
 # pylint: disable=unused-argument
 def lambda_handler(event, context):  # noqa: C901
-    """Lambda entry point"""
+    """Lambda entry point. ?refresh=true rebuilds the cached aws infrastructure dump"""
+    params = event.get("queryStringParameters") or {}
+    refresh = str(params.get("refresh", "")).lower() in ["true", "1", "t", "y", "yes"]
     info = {
-        "aws": aws_config.dump,
+        "aws": aws_config.get_dump(refresh=refresh),
         "settings": settings.dump,
     }
     return http_response_factory(status_code=200, body=info)
@@ -21,8 +21,14 @@
 # of the face that Amazon Rekognition used for the input image.
 #
 # Notes:
-# - incoming image file is base64 encoded.
-#   see https://code.tutsplus.com/base64-encoding-and-decoding-using-python--cms-25588t
+# - the request body is either the raw image, or multipart/form-data with the
+#   image as its first file part. API Gateway treats every media type as binary,
+#   so it delivers the body base64 encoded, with isBase64Encoded set. The body is
+#   decoded in a single pass, straight into the image bytes.
+#   see https://docs.aws.amazon.com/apigateway/latest/developerguide/api-gateway-payload-encodings.html
+#
+# - bodies larger than Settings.aws_search_max_payload_bytes are rejected with
+#   a 413, from their Content-Length, before they are decoded.
 #
 # - The image must be either a PNG or JPEG formatted file.
 #
@@ -32,29 +38,177 @@
 #
 # GISTS:
 # - https://gist.github.com/alexcasalboni/0f21a1889f09760f8981b643326730ff
+#
+# PREPROCESSING:
+# - when Settings.aws_search_preprocess_enabled, images are oriented, downscaled
+#   and re-encoded as JPEG before they are sent to Rekognition. see image_preprocessing.py.
+#
+# MULTI-FACE SEARCH:
+# - search_faces_by_image() only searches the largest face in the image. With
+#   ?faces=all, the faces are found with one detect_faces() call, cropped
+#   locally, and each crop is searched on a bounded thread pool. The response's
+#   searchedFaces lists the matches of each face, and matchedFaces all of them.
+# - ?roi=left,top,width,height (ratios of the image size, like a Rekognition
+#   BoundingBox) searches only the largest face in that region of the image. It
+#   cannot be combined with ?faces=all.
+#
+# CACHING:
+# - results are cached by image content and search parameters. see search_cache.py.
+#   X-Search-Cache reports HIT, MISS or BYPASS, and X-Search-Cache-Tier the tier of a HIT.
+#
+# FACEPRINT SNAPSHOT:
+# - when Settings.aws_faceprint_snapshot_enabled, FaceIds are first resolved
+#   against a memory-mapped snapshot of the faceprint table that is loaded once
+#   per container, and only the misses are read from DynamoDB. see face_snapshot.py.
+#
+# RESPONSE:
+# - ?view=compact drops Rekognition's raw output from the response, and
+#   ?fields=matchedFaces returns only the listed top level keys. see projection.py.
+# - responses are compressed with gzip or br for requests that send
+#   Accept-Encoding. see utils.http_response_factory().
+#
+# METRICS:
+# - each invocation writes one CloudWatch Embedded Metric Format line with the
+#   duration of each stage, the face counts and the cold start flag, and
+#   optionally adds a Server-Timing header. see metrics.py.
+#
+# LOGGING:
+# - with debug_mode, a sample of invocations log their event, with the image
+#   body redacted. see structured_logging.py.
+#
+# ASYNC:
+# - async_lambda_handler() is an asyncio variant of lambda_handler(). Its
+#   DynamoDB lookups run concurrently, see dynamodb.async_batch_get_items().
+#   Deploy it with the handler rekognition_api.lambda_search.asyncio_lambda_handler
 """
 
-import base64  # library with base63 encoding/decoding functions
+import asyncio
+import binascii  # base64 decoding without intermediate copies
 import json  # library for interacting with JSON data https://www.json.org/json-en.html
+from concurrent.futures import ThreadPoolExecutor
 
+from rekognition_api import metrics
 from rekognition_api.conf import settings
-from rekognition_api.exceptions import EXCEPTION_MAP
+from rekognition_api.dynamodb import async_batch_get_items, batch_get_items
+from rekognition_api.exceptions import (
+    EXCEPTION_MAP,
+    RekognitionBadRequestError,
+    RekognitionPayloadTooLargeError,
+)
+from rekognition_api.face_snapshot import face_snapshot
+from rekognition_api.image_preprocessing import crop_image, preprocess_image
+from rekognition_api.projection import (
+    compact_search_response,
+    get_projection,
+    project,
+)
+from rekognition_api.search_cache import search_cache, search_cache_key
+from rekognition_api.structured_logging import log_invocation
 from rekognition_api.utils import (
-    cloudwatch_handler,
     exception_response_factory,
     http_response_factory,
 )
 
 
+SEARCH_FACES_MODES = ["largest", "all"]
+
+# detected faces are cropped with this much margin, as a ratio of the face's
+# size on each side, so that Rekognition can find the face again in the crop
+FACE_CROP_PADDING = 0.25
+
+
+def get_header(event, name: str):
+    """return the value of a request header, matched case-insensitively, or None"""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def check_payload_size(event) -> None:
+    """
+    raise RekognitionPayloadTooLargeError if the request body is larger than
+    Settings.aws_search_max_payload_bytes. Uses Content-Length when the request
+    has one, and otherwise the decoded size of the body, without decoding it.
+    """
+    max_bytes = settings.aws_search_max_payload_bytes
+    content_length = get_header(event, "Content-Length")
+    if content_length is not None:
+        try:
+            size = int(content_length)
+        except ValueError as e:
+            raise RekognitionBadRequestError(f"invalid Content-Length: {content_length}") from e
+    else:
+        # every 4 base64 characters decode to at most 3 bytes
+        size = len(event.get("body") or "") * 3 // 4
+    if size > max_bytes:
+        raise RekognitionPayloadTooLargeError(f"request body of {size} bytes exceeds the {max_bytes} byte limit")
+
+
+def get_body_bytes(event) -> bytes:
+    """
+    decode the request body. API Gateway base64 encodes binary bodies and sets
+    isBase64Encoded. Clients that predate binary support send base64 text, so
+    a body without the flag is decoded as base64 too, strictly, so that a
+    binary body that API Gateway passed through as text is a bad request
+    rather than silently decoded into garbage.
+    """
+    body = event.get("body")
+    if not body:
+        raise RekognitionBadRequestError("the request body is empty")
+    try:
+        # a2b_base64() reads an ascii str in place, so the decoded image is the only copy
+        if event.get("isBase64Encoded"):
+            return binascii.a2b_base64(body)
+        # legacy clients may wrap their base64 text in lines
+        return binascii.a2b_base64("".join(body.split()), strict_mode=True)
+    except (binascii.Error, ValueError) as e:
+        raise RekognitionBadRequestError(
+            f"the request body is not valid base64: {e}. Send binary bodies with a binary Content-Type"
+        ) from e
+
+
+def get_multipart_boundary(event):
+    """return the multipart/form-data boundary of the request, as bytes, or None"""
+    content_type = get_header(event, "Content-Type") or ""
+    media_type, _, params = content_type.partition(";")
+    if media_type.strip().lower() != "multipart/form-data":
+        return None
+    for param in params.split(";"):
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            return value.strip('"').encode("latin-1")
+    raise RekognitionBadRequestError("multipart/form-data request without a boundary")
+
+
+def get_multipart_image(body: bytes, boundary: bytes) -> bytes:
+    """return the contents of the first file part of a multipart/form-data body"""
+    delimiter = b"--" + boundary
+    start = body.find(delimiter)
+    while start != -1:
+        start += len(delimiter)
+        if body[start : start + 2] == b"--":
+            break
+        headers_end = body.find(b"\r\n\r\n", start)
+        part_end = body.find(b"\r\n" + delimiter, headers_end)
+        if headers_end == -1 or part_end == -1:
+            break
+        headers = body[start:headers_end].lower()
+        if b"filename=" in headers or b"content-type: image/" in headers:
+            return body[headers_end + 4 : part_end]
+        start = part_end + 2
+    raise RekognitionBadRequestError("multipart/form-data request without an image file part")
+
+
+@metrics.timed("get_image_from_event")
 def get_image_from_event(event):
     """extract and decode the raw image data from the event"""
-    # see
-    #  - https://stackoverflow.com/questions/9942594/unicodeencodeerror-ascii-codec-cant-encode-character-u-xa0-in-position-20
-    #  - line 39, in _bytes_from_decode_data ValueError: string argument should contain only ASCII characters
-    #  - https://stackoverflow.com/questions/53340627/typeerror-expected-bytes-like-object-not-str
-    #  - alternate syntax: image_raw = ''.join(image_raw).encode('ascii').strip()
-    image_raw = str(event["body"]).encode("ascii")
-    image_decoded = base64.b64decode(image_raw)
+    check_payload_size(event)
+    image_decoded = get_body_bytes(event)
+    boundary = get_multipart_boundary(event)
+    if boundary is not None:
+        image_decoded = get_multipart_image(image_decoded, boundary)
 
     # https://stackoverflow.com/questions/6269765/what-does-the-b-character-do-in-front-of-a-string-literal
     # Image: base64-encoded bytes or an S3 object.
@@ -69,6 +223,52 @@ def get_image_from_event(event):
     return {"Bytes": image_decoded}
 
 
+def get_search_options(event) -> dict:
+    """
+    return the search options of the request's query string: faces, one of
+    SEARCH_FACES_MODES, and roi, a BoundingBox dict or None
+    """
+    params = event.get("queryStringParameters") or {}
+    faces = params.get("faces") or "largest"
+    if faces not in SEARCH_FACES_MODES:
+        raise RekognitionBadRequestError(f"faces must be one of {SEARCH_FACES_MODES}, not {faces}")
+    roi = None
+    if params.get("roi"):
+        try:
+            left, top, width, height = (float(value) for value in params["roi"].split(","))
+        except ValueError as e:
+            raise RekognitionBadRequestError(f"roi must be left,top,width,height, not {params['roi']}") from e
+        if not (0 <= left < 1 and 0 <= top < 1 and 0 < width <= 1 and 0 < height <= 1):
+            raise RekognitionBadRequestError(f"roi values must be ratios of the image size, not {params['roi']}")
+        roi = {"Left": left, "Top": top, "Width": width, "Height": height}
+        if faces == "all":
+            # searchedFaces' BoundingBoxes are ratios of the whole image
+            raise RekognitionBadRequestError("roi cannot be combined with faces=all")
+    return {"faces": faces, "roi": roi}
+
+
+def crop_region_of_interest(image, roi):
+    """
+    return the roi of the image, or the image if roi is None. raise
+    RekognitionBadRequestError if the image cannot be decoded, or if roi
+    does not cover a whole pixel of it.
+    """
+    if roi is None:
+        return image
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image
+
+    try:
+        crop = crop_image(image["Bytes"], [roi], quality=settings.aws_search_preprocess_jpeg_quality)[0]
+    except (OSError, Image.DecompressionBombError) as e:
+        # PIL.UnidentifiedImageError is an OSError
+        raise RekognitionBadRequestError(f"the image could not be decoded: {e}") from e
+    if not crop:
+        raise RekognitionBadRequestError(f"roi {roi} does not contain any pixels of the image")
+    return {"Bytes": crop}
+
+
+@metrics.timed("get_faces")
 def get_faces(image):
     """return a list of faces found in the image"""
     return settings.aws_rekognition_client.search_faces_by_image(
@@ -80,53 +280,302 @@ def get_faces(image):
     )
 
 
+@metrics.timed("preprocess_search_image")
+def preprocess_search_image(image):
+    """downscale and recompress the image for Rekognition, if preprocessing is enabled"""
+    if not settings.aws_search_preprocess_enabled:
+        return image
+    return {
+        "Bytes": preprocess_image(
+            image["Bytes"],
+            max_dimension=settings.aws_search_preprocess_max_dimension,
+            quality=settings.aws_search_preprocess_jpeg_quality,
+        )
+    }
+
+
+def get_search_cache_key(image, options: dict = None) -> str:
+    """return the search cache key of the image, the request's search options and the current search parameters"""
+    return search_cache_key(
+        image["Bytes"],
+        options=options,
+        collection_id=settings.aws_rekognition_collection_id,
+        max_faces=settings.aws_rekognition_face_detect_max_faces_count,
+        threshold=settings.aws_rekognition_face_detect_threshold,
+        quality_filter=settings.aws_rekognition_face_detect_quality_filter,
+        preprocess=(
+            [settings.aws_search_preprocess_max_dimension, settings.aws_search_preprocess_jpeg_quality]
+            if settings.aws_search_preprocess_enabled
+            else None
+        ),
+    )
+
+
+def get_display_name(external_image_id) -> str:
+    """return a human readable name derived from an indexed image's ExternalImageId"""
+    return (
+        str(external_image_id)
+        .replace("-", " ")
+        .replace("_", " ")
+        .replace(".jpg", "")
+        .replace(".png", "")
+        .capitalize()
+    )
+
+
+def get_snapshot_external_image_ids(face_ids) -> dict:
+    """return FaceId -> ExternalImageId of the face_ids found in the faceprint snapshot, if it is enabled"""
+    if not face_snapshot.enabled:
+        return {}
+    return face_snapshot.get_many(face_ids)
+
+
+def get_external_image_ids(face_ids) -> dict:
+    """
+    return FaceId -> ExternalImageId of the face_ids that are indexed.
+    FaceIds are resolved against the faceprint snapshot, if enabled, and the
+    rest against DynamoDB with a single BatchGetItem round trip (per 100
+    FaceIds) that projects only the fields we need.
+    """
+    if not face_ids:
+        return {}
+    external_image_ids = get_snapshot_external_image_ids(face_ids)
+    missing = [face_id for face_id in face_ids if face_id not in external_image_ids]
+    if missing:
+        items = batch_get_items(
+            settings.dynamodb_table,
+            key_name="FaceId",
+            key_values=missing,
+            attributes=["ExternalImageId"],
+        )
+        external_image_ids.update({face_id: item["ExternalImageId"] for face_id, item in items.items()})
+    return external_image_ids
+
+
+@metrics.timed("get_matched_faces")
 def get_matched_faces(faces):
-    """return a list of matched faces"""
-    matched_faces = []  # any indexed faces found in the Rekognition return value
+    """return a list of matched faces, in Rekognition's similarity order"""
     # ----------------------------------------------------------------------
     # return structure: doc/rekogition_search_faces_by_image.json
     # ----------------------------------------------------------------------
-    for face in faces["FaceMatches"]:
-        item = settings.dynamodb_table.get_item(Key={"FaceId": face["Face"]["FaceId"]})
-        if "Item" in item:
-            matched = (
-                str(item["Item"]["ExternalImageId"])
-                .replace("-", " ")
-                .replace("_", " ")
-                .replace(".jpg", "")
-                .replace(".png", "")
-                .capitalize()
-            )
-            matched_faces.append(matched)
-
-    return matched_faces
+    face_ids = [face["Face"]["FaceId"] for face in faces["FaceMatches"]]
+    external_image_ids = get_external_image_ids(face_ids)
+    return [get_display_name(external_image_ids[face_id]) for face_id in face_ids if face_id in external_image_ids]
+
+
+@metrics.timed("detect_faces")
+def detect_faces(image) -> list:
+    """return the FaceDetails of up to aws_search_multi_face_max_faces faces in the image, largest first"""
+    response = settings.aws_rekognition_client.detect_faces(Image=image, Attributes=["DEFAULT"])
+    face_details = sorted(
+        response["FaceDetails"],
+        key=lambda face: face["BoundingBox"]["Width"] * face["BoundingBox"]["Height"],
+        reverse=True,
+    )
+    return face_details[: settings.aws_search_multi_face_max_faces]
+
+
+def search_face(image_bytes: bytes) -> dict:
+    """search a cropped face. returns no matches if Rekognition does not find a face in the crop"""
+    if not image_bytes:
+        return {"FaceMatches": []}
+    try:
+        return get_faces({"Bytes": image_bytes})
+    except settings.aws_rekognition_client.exceptions.InvalidParameterException:
+        return {"FaceMatches": []}
+
+
+def search_all_faces(image) -> dict:
+    """
+    search every face in the image: one detect_faces() call, a local crop of
+    each face, and one search_faces_by_image() per crop, run concurrently.
+    The FaceMatches of all faces are resolved with one deduplicated lookup.
+    """
+    face_details = detect_faces(image)
+    crops = crop_image(
+        image["Bytes"],
+        [face["BoundingBox"] for face in face_details],
+        padding=FACE_CROP_PADDING,
+        quality=settings.aws_search_preprocess_jpeg_quality,
+    )
+    max_workers = max(1, min(settings.aws_search_multi_face_max_workers, len(crops)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lambda_search") as executor:
+        results = list(executor.map(search_face, crops))
+
+    face_ids = list(dict.fromkeys(match["Face"]["FaceId"] for result in results for match in result["FaceMatches"]))
+    external_image_ids = get_external_image_ids(face_ids)
+    searched_faces = []
+    for face, result in zip(face_details, results):
+        matched = [match["Face"]["FaceId"] for match in result["FaceMatches"]]
+        searched_faces.append(
+            {
+                "BoundingBox": face["BoundingBox"],
+                "Confidence": face["Confidence"],
+                "FaceMatches": result["FaceMatches"],
+                "matchedFaces": [get_display_name(external_image_ids[i]) for i in matched if i in external_image_ids],
+            }
+        )
+    metrics.add_count("facesSearched", len(searched_faces))
+    return {
+        "searchedFaces": searched_faces,  # every face found in the image, largest first, with its matches
+        "matchedFaces": list(dict.fromkeys(name for face in searched_faces for name in face["matchedFaces"])),
+    }
+
+
+@metrics.timed("get_matched_faces")
+async def async_get_matched_faces(faces):
+    """async get_matched_faces(), with concurrent BatchGetItem requests"""
+    face_ids = [face["Face"]["FaceId"] for face in faces["FaceMatches"]]
+    if not face_ids:
+        return []
+    external_image_ids = await asyncio.to_thread(get_snapshot_external_image_ids, face_ids)
+    missing = [face_id for face_id in face_ids if face_id not in external_image_ids]
+    if missing:
+        items = await async_batch_get_items(
+            settings.dynamodb_table,
+            key_name="FaceId",
+            key_values=missing,
+            max_concurrency=settings.aws_async_max_concurrency,
+            attributes=["ExternalImageId"],
+        )
+        external_image_ids.update({face_id: item["ExternalImageId"] for face_id, item in items.items()})
+    return [get_display_name(external_image_ids[face_id]) for face_id in face_ids if face_id in external_image_ids]
+
+
+def response_factory(event, status_code: int, body, headers: dict = None) -> dict:
+    """http_response_factory(), compressed for the request's Accept-Encoding, if enabled"""
+    accept_encoding = None
+    if settings.aws_response_compression_enabled:
+        accept_encoding = get_header(event, "Accept-Encoding") or ""
+    return http_response_factory(
+        status_code=status_code,
+        body=body,
+        headers=headers,
+        accept_encoding=accept_encoding,
+        compression_min_bytes=settings.aws_response_compression_min_bytes,
+    )
+
+
+def set_response_metrics(retval: dict, headers: dict) -> None:
+    """add the face counts and search cache status of a search to the current invocation's metrics"""
+    metrics.set_property("searchCache", headers["X-Search-Cache"])
+    if "faces" in retval:
+        metrics.add_count("faceMatches", len(retval["faces"]["FaceMatches"]))
+    metrics.add_count("matchedFaces", len(retval["matchedFaces"]))
 
 
 # pylint: disable=unused-argument
+@metrics.handler("lambda_search")
 def lambda_handler(event, context):  # noqa: C901
     """
     Facial recognition image analysis and search for indexed faces. invoked by API Gateway.
     """
-    cloudwatch_handler(event, settings.dump, debug_mode=settings.debug_mode)
+    log_invocation(event)
+    headers = {"X-Search-Cache": "BYPASS"}
+    projection = None
     try:
+        options = get_search_options(event)
+        projection = get_projection(event.get("queryStringParameters") or {})
         image = get_image_from_event(event)
-        faces = get_faces(image)
-        matched_faces = get_matched_faces(faces)
+        if search_cache.enabled:
+            cache_key = get_search_cache_key(image, options)
+            retval, cache_tier = search_cache.get(cache_key)
+            if retval is not None:
+                headers = {"X-Search-Cache": "HIT", "X-Search-Cache-Tier": cache_tier}
+                set_response_metrics(retval, headers)
+                return response_factory(
+                    event, status_code=200, body=project(retval, projection, compact_search_response), headers=headers
+                )
+            headers = {"X-Search-Cache": "MISS"}
+
+        image = preprocess_search_image(image)
+        if options["faces"] == "all":
+            retval = search_all_faces(image)
+        else:
+            faces = get_faces(crop_region_of_interest(image, options["roi"]))
+            matched_faces = get_matched_faces(faces)
 
-        retval = {
-            "faces": faces,  # all of the faces that Rekognition found in the image
-            "matchedFaces": matched_faces,  # any indexed faces found in DynamoDB
-        }
+            retval = {
+                "faces": faces,  # all of the faces that Rekognition found in the image
+                "matchedFaces": matched_faces,  # any indexed faces found in DynamoDB
+            }
+        if search_cache.enabled:
+            search_cache.put(cache_key, retval)
+        set_response_metrics(retval, headers)
 
     # handle anything that went wrong
     # see https://docs.aws.amazon.com/rekognition/latest/dg/error-handling.html
     except settings.aws_rekognition_client.exceptions.InvalidParameterException:
         # If no faces are detected in the image, then index_faces()
         # returns an InvalidParameterException error
-        pass
+        retval = {"faces": {"FaceMatches": []}, "matchedFaces": []}
 
     except Exception as e:
         status_code, _message = EXCEPTION_MAP.get(type(e), (500, "Internal server error"))
-        return http_response_factory(status_code=status_code, body=exception_response_factory(e))
+        return response_factory(event, status_code=status_code, body=exception_response_factory(e))
+
+    return response_factory(
+        event, status_code=200, body=project(retval, projection, compact_search_response), headers=headers
+    )
+
+
+# pylint: disable=unused-argument
+async def async_lambda_handler(event, context):  # noqa: C901
+    """
+    asyncio variant of lambda_handler(). Blocking boto3 calls run on worker
+    threads, so that DynamoDB lookups can run concurrently. This only pays
+    off for large batches of FaceMatches, more than one BatchGetItem of 100
+    keys. Otherwise it is slower than lambda_handler(), since a search makes
+    one Rekognition call, which cannot overlap with anything.
+    """
+    log_invocation(event)
+    headers = {"X-Search-Cache": "BYPASS"}
+    projection = None
+    try:
+        options = get_search_options(event)
+        projection = get_projection(event.get("queryStringParameters") or {})
+        image = get_image_from_event(event)
+        if search_cache.enabled:
+            cache_key = get_search_cache_key(image, options)
+            retval, cache_tier = await asyncio.to_thread(search_cache.get, cache_key)
+            if retval is not None:
+                headers = {"X-Search-Cache": "HIT", "X-Search-Cache-Tier": cache_tier}
+                set_response_metrics(retval, headers)
+                return response_factory(
+                    event, status_code=200, body=project(retval, projection, compact_search_response), headers=headers
+                )
+            headers = {"X-Search-Cache": "MISS"}
+
+        image = preprocess_search_image(image)
+        if options["faces"] == "all":
+            retval = await asyncio.to_thread(search_all_faces, image)
+        else:
+            faces = await asyncio.to_thread(get_faces, crop_region_of_interest(image, options["roi"]))
+            matched_faces = await async_get_matched_faces(faces)
+
+            retval = {
+                "faces": faces,  # all of the faces that Rekognition found in the image
+                "matchedFaces": matched_faces,  # any indexed faces found in DynamoDB
+            }
+        if search_cache.enabled:
+            await asyncio.to_thread(search_cache.put, cache_key, retval)
+        set_response_metrics(retval, headers)
+
+    except settings.aws_rekognition_client.exceptions.InvalidParameterException:
+        # If no faces are detected in the image, then index_faces()
+        # returns an InvalidParameterException error
+        retval = {"faces": {"FaceMatches": []}, "matchedFaces": []}
+
+    except Exception as e:
+        status_code, _message = EXCEPTION_MAP.get(type(e), (500, "Internal server error"))
+        return response_factory(event, status_code=status_code, body=exception_response_factory(e))
+
+    return response_factory(
+        event, status_code=200, body=project(retval, projection, compact_search_response), headers=headers
+    )
+
 
-    return http_response_factory(status_code=200, body=retval)
+@metrics.handler("lambda_search")
+def asyncio_lambda_handler(event, context):
+    """Lambda entry point for async_lambda_handler()"""
+    return asyncio.run(async_lambda_handler(event, context))
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory stand-in for the Rekognition client, for offline and performance testing.
+
+moto does not implement index_faces(), search_faces_by_image(),
+detect_faces(), list_faces() or delete_faces(), so this class provides them,
+with response shapes that match doc/rekognition_index_faces.json and
+doc/rekogition_search_faces_by_image.json.
+Responses are deterministic: FaceIds are derived from the collection and
+ExternalImageId, and the matches and detected faces of an image are derived
+from a hash of its bytes. Each call can be made
+to take a fixed synthetic latency, to stand in for the network round trip.
+
+Enable it by setting AWS_REKOGNITION_BACKEND=local. S3 and DynamoDB are
+expected to be provided by moto.
+"""
+
+# python stuff
+import hashlib
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+# 3rd party stuff
+import botocore.session
+
+
+FACE_MODEL_VERSION = "7.0"
+
+
+def _bounding_box(seed: bytes) -> dict:
+    """return a plausible, deterministic bounding box"""
+    return {
+        "Width": 0.2 + seed[0] / 1024,
+        "Height": 0.2 + seed[1] / 1024,
+        "Left": seed[2] / 512,
+        "Top": seed[3] / 512,
+    }
+
+
+class LocalRekognitionClient:
+    """
+    Implements the subset of the boto3 Rekognition client that lambda_index,
+    lambda_search and reconcile use. Thread-safe.
+
+    latency_ms: synthetic latency added to every api call.
+    faces_count: the number of faces that index_faces() and detect_faces() find in every image.
+    region_name: used only to build the botocore exception classes, so that
+        client.exceptions behaves exactly like a real client's.
+    """
+
+    def __init__(self, latency_ms: int = 0, faces_count: int = 1, region_name: str = "us-east-1"):
+        self.latency_ms = latency_ms
+        self.faces_count = faces_count
+        self.exceptions = (
+            botocore.session.get_session()
+            .create_client(
+                "rekognition",
+                region_name=region_name,
+                aws_access_key_id="local",
+                aws_secret_access_key="local",  # nosec B106
+            )
+            .exceptions
+        )
+        self._collections: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _response_metadata(self) -> dict:
+        request_id = str(uuid.uuid4())
+        return {
+            "RequestId": request_id,
+            "HTTPStatusCode": 200,
+            "HTTPHeaders": {"x-amzn-requestid": request_id, "content-type": "application/x-amz-json-1.1"},
+            "RetryAttempts": 0,
+        }
+
+    def _invalid_parameter(self, operation_name: str, message: str):
+        return self.exceptions.InvalidParameterException(
+            {"Error": {"Code": "InvalidParameterException", "Message": message}}, operation_name
+        )
+
+    def index_faces(self, CollectionId: str, Image: dict, ExternalImageId: str = None, MaxFaces: int = None, **kwargs):
+        """add faces_count synthetic faces for the image to the collection"""
+        # pylint: disable=invalid-name,unused-argument
+        self._sleep()
+        image_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{CollectionId}/{ExternalImageId}"))
+        faces_count = min(self.faces_count, MaxFaces or self.faces_count)
+        if not faces_count:
+            raise self._invalid_parameter("IndexFaces", "There are no faces in the image. Should be at least 1.")
+
+        face_records = []
+        for i in range(faces_count):
+            face_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{image_id}/{i}"))
+            seed = hashlib.sha256(face_id.encode("utf-8")).digest()
+            bounding_box = _bounding_box(seed)
+            face = {
+                "FaceId": face_id,
+                "BoundingBox": bounding_box,
+                "ImageId": image_id,
+                "ExternalImageId": ExternalImageId,
+                "Confidence": 99.99,
+            }
+            face_records.append(
+                {
+                    "Face": face,
+                    "FaceDetail": {
+                        "BoundingBox": bounding_box,
+                        "Pose": {"Roll": 0.0, "Yaw": 0.0, "Pitch": 0.0},
+                        "Quality": {"Brightness": 80.0, "Sharpness": 95.0},
+                        "Confidence": 99.99,
+                    },
+                }
+            )
+        with self._lock:
+            collection = self._collections.setdefault(CollectionId, {})
+            for face_record in face_records:
+                collection[face_record["Face"]["FaceId"]] = dict(face_record["Face"])
+        return {
+            "FaceRecords": face_records,
+            "FaceModelVersion": FACE_MODEL_VERSION,
+            "UnindexedFaces": [],
+            "ResponseMetadata": self._response_metadata(),
+        }
+
+    def search_faces_by_image(
+        self, CollectionId: str, Image: dict, MaxFaces: int = 80, FaceMatchThreshold: float = 80.0, **kwargs
+    ):
+        """return up to MaxFaces of the collection's faces, chosen deterministically from the image bytes"""
+        # pylint: disable=invalid-name,unused-argument
+        self._sleep()
+        image_bytes = Image.get("Bytes")
+        if not image_bytes:
+            raise self._invalid_parameter("SearchFacesByImage", "There are no faces in the image. Should be at least 1.")
+        image_hash = hashlib.sha256(image_bytes).digest()
+
+        with self._lock:
+            faces: List[dict] = list(self._collections.get(CollectionId, {}).values())
+        scored = []
+        for face in faces:
+            score = hashlib.sha256(image_hash + face["FaceId"].encode("utf-8")).digest()
+            similarity = max(float(FaceMatchThreshold), 100.0 - score[0] / 32)
+            scored.append((similarity, face["FaceId"], face))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        return {
+            "SearchedFaceBoundingBox": _bounding_box(image_hash),
+            "SearchedFaceConfidence": 99.99,
+            "FaceMatches": [
+                {"Similarity": similarity, "Face": {**face, "IndexFacesModelVersion": FACE_MODEL_VERSION}}
+                for similarity, _, face in scored[:MaxFaces]
+            ],
+            "FaceModelVersion": FACE_MODEL_VERSION,
+            "ResponseMetadata": self._response_metadata(),
+        }
+
+    def detect_faces(self, Image: dict, Attributes: list = None, **kwargs):
+        """return faces_count faces, with bounding boxes derived from the image bytes"""
+        # pylint: disable=invalid-name,unused-argument
+        self._sleep()
+        image_bytes = Image.get("Bytes")
+        if not image_bytes:
+            raise self._invalid_parameter("DetectFaces", "Requested image should either contain bytes or s3 object.")
+        image_hash = hashlib.sha256(image_bytes).digest()
+        face_details = []
+        for i in range(self.faces_count):
+            seed = hashlib.sha256(image_hash + i.to_bytes(4, "big")).digest()
+            face_details.append(
+                {
+                    "BoundingBox": _bounding_box(seed),
+                    "Pose": {"Roll": 0.0, "Yaw": 0.0, "Pitch": 0.0},
+                    "Quality": {"Brightness": 80.0, "Sharpness": 95.0},
+                    "Confidence": 99.99,
+                }
+            )
+        return {"FaceDetails": face_details, "ResponseMetadata": self._response_metadata()}
+
+    def list_faces(self, CollectionId: str, NextToken: str = None, MaxResults: int = 1000, **kwargs):
+        """return a page of the collection's faces, in FaceId order"""
+        # pylint: disable=invalid-name,unused-argument
+        self._sleep()
+        with self._lock:
+            faces = sorted(self._collections.get(CollectionId, {}).values(), key=lambda face: face["FaceId"])
+        if NextToken:
+            faces = [face for face in faces if face["FaceId"] > NextToken]
+        page = faces[:MaxResults]
+        retval = {
+            "Faces": [{**face, "IndexFacesModelVersion": FACE_MODEL_VERSION} for face in page],
+            "FaceModelVersion": FACE_MODEL_VERSION,
+            "ResponseMetadata": self._response_metadata(),
+        }
+        if len(faces) > MaxResults:
+            retval["NextToken"] = page[-1]["FaceId"]
+        return retval
+
+    def delete_faces(self, CollectionId: str, FaceIds: list, **kwargs):
+        """remove FaceIds from the collection"""
+        # pylint: disable=invalid-name,unused-argument
+        self._sleep()
+        if not 1 <= len(FaceIds) <= 4096:
+            raise self._invalid_parameter("DeleteFaces", "FaceIds should contain between 1 and 4096 items.")
+        with self._lock:
+            collection = self._collections.get(CollectionId, {})
+            deleted = [face_id for face_id in FaceIds if collection.pop(face_id, None)]
+        return {"DeletedFaces": deleted, "UnsuccessfulFaceDeletions": [], "ResponseMetadata": self._response_metadata()}
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Server-side projection of the /search and /index response bodies.
+
+Most clients only need the names and similarities of the matched faces, but
+the full responses carry Rekognition's raw output: bounding boxes, model
+versions, and, for /index, every FaceRecord with its landmarks, pose and
+quality. Clients choose what they get back with two request options, the
+query string of /search, or keys of the /index event:
+
+- view: full (the default) returns the response as is. compact drops
+  Rekognition's raw output, and keeps the matched faces' FaceId,
+  ExternalImageId and Similarity, and the searched faces' bounding boxes.
+  For /index, each record's FaceRecords are replaced by their FaceIds.
+- fields: a comma separated list of the top level keys of the response to
+  return, ie fields=matchedFaces. Keys that are not in the response are
+  omitted.
+
+The projection is applied to the response only, so the search cache always
+holds full responses.
+"""
+
+# python stuff
+from typing import Callable
+
+# our stuff
+from rekognition_api.exceptions import RekognitionBadRequestError
+
+
+VIEW_FULL = "full"
+VIEW_COMPACT = "compact"
+VIEWS = [VIEW_FULL, VIEW_COMPACT]
+
+
+def get_projection(params: dict) -> dict:
+    """return the view and fields of a request's params. fields is None when not given"""
+    view = params.get("view") or VIEW_FULL
+    if view not in VIEWS:
+        raise RekognitionBadRequestError(f"view must be one of {VIEWS}, not {view}")
+    fields = params.get("fields") or None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    return {"view": view, "fields": fields}
+
+
+def compact_face_match(match: dict) -> dict:
+    """return the FaceId, ExternalImageId and Similarity of a FaceMatches entry"""
+    face = match.get("Face", {})
+    return {
+        "Similarity": match.get("Similarity"),
+        "Face": {"FaceId": face.get("FaceId"), "ExternalImageId": face.get("ExternalImageId")},
+    }
+
+
+def compact_search_response(body: dict) -> dict:
+    """return the compact view of a /search response"""
+    retval = dict(body)
+    if "faces" in body:
+        faces = body["faces"]
+        retval["faces"] = {
+            "SearchedFaceBoundingBox": faces.get("SearchedFaceBoundingBox"),
+            "SearchedFaceConfidence": faces.get("SearchedFaceConfidence"),
+            "FaceMatches": [compact_face_match(match) for match in faces.get("FaceMatches", [])],
+        }
+    if "searchedFaces" in body:
+        retval["searchedFaces"] = [
+            {**face, "FaceMatches": [compact_face_match(match) for match in face.get("FaceMatches", [])]}
+            for face in body["searchedFaces"]
+        ]
+    return retval
+
+
+def compact_index_response(body: dict) -> dict:
+    """return the compact view of an /index response"""
+    retval = dict(body)
+    if "records" in body:
+        retval["records"] = [
+            {
+                **{key: value for key, value in record.items() if key != "FaceRecords"},
+                "faceIds": [face["Face"]["FaceId"] for face in record.get("FaceRecords", [])],
+            }
+            for record in body["records"]
+        ]
+    return retval
+
+
+def project(body: dict, projection: dict, compact: Callable[[dict], dict]) -> dict:
+    """return the projection of a response body. compact returns its compact view"""
+    if projection is None:
+        return body
+    if projection["view"] == VIEW_COMPACT:
+        body = compact(body)
+    if projection["fields"] is not None:
+        body = {field: body[field] for field in projection["fields"] if field in body}
+    return body
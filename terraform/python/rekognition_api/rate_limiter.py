@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side rate limiting of Rekognition api calls.
+
+Rekognition enforces a TPS quota per api operation, account and region (see
+https://docs.aws.amazon.com/rekognition/latest/dg/limits.html) and rejects
+calls above it with ThrottlingException or
+ProvisionedThroughputExceededException. Under bursts, ie the thread pools of
+lambda_index batches and backfill, a plain client fails those calls outright.
+
+RateLimitedClient wraps a Rekognition client. Each call of an operation that
+has a TPS budget first takes a token from that operation's bucket, so that
+bursts are spread out rather than rejected. Throttled calls are retried after
+a jittered exponential backoff, up to max_attempts, and every retry waits for
+a token too.
+
+The rate of each bucket is adjusted AIMD (additive increase, multiplicative
+decrease), like TCP congestion control. A throttle halves the rate, at most
+once per decrease_interval, so that the concurrent throttles of one burst
+count as one congestion event. Each successful call adds 1/rate TPS back,
+ie about 1 TPS per second of successful calls, up to the budget. The budget
+is a ceiling, since the quota is shared by every Lambda instance of the
+account.
+
+Buckets and the wrapped client are shared by all threads of the process.
+"""
+
+# python stuff
+import functools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# 3rd party stuff
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from botocore.exceptions import HTTPClientError
+
+# our stuff
+from rekognition_api.const import THROTTLING_ERROR_CODES
+from rekognition_api.dynamodb import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+# transient errors that are retried, without slowing down the bucket
+TRANSIENT_ERROR_CODES = ("InternalServerError", "ServiceUnavailableException")
+RATE_LIMIT_MAX_ATTEMPTS = 8
+RATE_LIMIT_BASE_DELAY = 0.1  # seconds
+RATE_LIMIT_MIN_RATE = 1.0  # TPS
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+RATE_LIMIT_DECREASE_INTERVAL = 1.0  # seconds
+
+
+class AdaptiveTokenBucket:
+    """
+    A token bucket that refills at rate tokens per second and holds up to one
+    second of tokens, with an AIMD-adjusted rate between min_rate and max_rate.
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float = RATE_LIMIT_MIN_RATE,
+        decrease_factor: float = RATE_LIMIT_DECREASE_FACTOR,
+        decrease_interval: float = RATE_LIMIT_DECREASE_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.max_rate = float(max_rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.clock = clock
+        self.rate = self.max_rate
+        self.tokens = self.capacity
+        self.throttles = 0
+        self._updated = clock()
+        self._decreased = None
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> float:
+        """the most tokens that the bucket holds: one second's worth, and at least one"""
+        return max(1.0, self.rate)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """take a token, and return the seconds to wait until it is due"""
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> float:
+        """take a token, waiting until it is due. Returns the seconds waited"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self) -> None:
+        """additive increase"""
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def on_throttle(self) -> None:
+        """multiplicative decrease, at most once per decrease_interval"""
+        with self._lock:
+            self.throttles += 1
+            now = self.clock()
+            if self._decreased is not None and now - self._decreased < self.decrease_interval:
+                return
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.tokens = min(self.tokens, self.capacity)
+            self._decreased = now
+            logger.warning("rekognition throttled, rate limit reduced to %.2f TPS", self.rate)
+
+
+def get_operation_name(client, method_name: str) -> Optional[str]:
+    """return the api operation name of a client method, ie IndexFaces for index_faces"""
+    mapping = getattr(getattr(client, "meta", None), "method_to_api_mapping", None)
+    if mapping is not None:
+        return mapping.get(method_name)
+    if method_name.startswith("_"):
+        return None
+    return "".join(part.capitalize() for part in method_name.split("_"))
+
+
+class RateLimitedClient:
+    """
+    Wraps a Rekognition client. budgets maps api operation names, ie
+    IndexFaces and SearchFacesByImage, to their TPS budget. Operations
+    without a budget are not rate limited, but are retried all the same.
+    Every other attribute, ie exceptions and meta, is the wrapped client's.
+    """
+
+    def __init__(
+        self,
+        client,
+        budgets: Dict[str, float],
+        max_attempts: int = RATE_LIMIT_MAX_ATTEMPTS,
+        base_delay: float = RATE_LIMIT_BASE_DELAY,
+    ):
+        self.client = client
+        self.buckets = {operation: AdaptiveTokenBucket(tps) for operation, tps in budgets.items() if tps}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "client":
+            raise AttributeError(name)
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+        operation = get_operation_name(self.client, name)
+        if operation is None:
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            return self.call(operation, attribute, *args, **kwargs)
+
+        return call
+
+    def call(self, operation: str, method, *args, **kwargs):
+        """call method, rate limited by the bucket of operation, retrying throttling and transient errors"""
+        bucket = self.buckets.get(operation)
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                response = method(*args, **kwargs)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if code not in THROTTLING_ERROR_CODES + TRANSIENT_ERROR_CODES or attempt >= self.max_attempts:
+                    raise
+                if code in THROTTLING_ERROR_CODES and bucket is not None:
+                    bucket.on_throttle()
+            except (BotocoreConnectionError, HTTPClientError):
+                if attempt >= self.max_attempts:
+                    raise
+            else:
+                if bucket is not None:
+                    bucket.on_success()
+                return response
+            with self._lock:
+                self.retries += 1
+            time.sleep(backoff_delay(attempt, self.base_delay))
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Reconcile the Rekognition collection with the faceprint table.
+
+lambda_index calls index_faces() and then writes the faces to DynamoDB, and
+nothing makes the two atomic. A failed write leaves orphan faces, which
+still cost search time and return matches that get_matched_faces() silently
+drops. A face deleted from the collection by hand leaves an orphan row.
+
+The FaceIds of the table are read with a parallel scan, at most
+total_segments threads, into a compact set: FaceIds are uuids, and are held
+as their 16 byte binary form. The collection is then streamed with
+list_faces(), one page at a time, and each face is checked against the set
+and removed from it. What is left in the set when the listing ends are the
+rows that have no face. Only the table's FaceIds are held in memory, never
+the collection's.
+
+The table is scanned before the collection is listed, and lambda_index
+writes its rows only after index_faces() has returned, so an image that is
+indexed during a run can show up as an orphan face, never as an orphan row.
+Repairing that orphan face only re-writes the same row.
+
+With repair=True,
+- orphan faces whose ExternalImageId (the S3 key of lambda_index) still
+  exists in the bucket get their rows rebuilt, in BatchWriteItem requests;
+- orphan faces whose image is gone are removed with delete_faces(), up to
+  4096 FaceIds per request;
+- orphan rows are deleted, in BatchWriteItem requests.
+Orphan faces are repaired page by page, as the collection is listed.
+
+usage:
+    python -m rekognition_api.reconcile --segments 8
+    python -m rekognition_api.reconcile --repair
+"""
+
+# python stuff
+import argparse
+import json
+import logging
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Set, Union
+from urllib.parse import quote_plus
+
+# 3rd party stuff
+from botocore.exceptions import ClientError
+
+# our stuff
+from rekognition_api.conf import settings
+from rekognition_api.dynamodb import batch_delete_items, batch_write_items
+from rekognition_api.face_snapshot import write_delta
+from rekognition_api.lambda_index import S3ObjectContext, get_faceprint_items
+
+
+logger = logging.getLogger(__name__)
+
+LIST_FACES_MAX_RESULTS = 4096
+DELETE_FACES_MAX_IDS = 4096
+# the attributes of a listed face that lambda_index writes to the table
+FACE_ATTRIBUTES = ("FaceId", "BoundingBox", "ImageId", "ExternalImageId", "Confidence")
+
+
+def face_id_key(face_id: str) -> Union[bytes, str]:
+    """return the compact form of a FaceId: the 16 bytes of a canonical uuid, else the FaceId itself"""
+    try:
+        key = uuid.UUID(face_id)
+    except ValueError:
+        return face_id
+    return key.bytes if str(key) == face_id else face_id
+
+
+def face_id_from_key(key: Union[bytes, str]) -> str:
+    """the inverse of face_id_key()"""
+    return str(uuid.UUID(bytes=key)) if isinstance(key, bytes) else key
+
+
+def scan_face_ids(segment: int, total_segments: int) -> Set[Union[bytes, str]]:
+    """return the compact FaceIds of one parallel scan segment of the faceprint table"""
+    table = settings.dynamodb_table
+    kwargs = {"Segment": segment, "TotalSegments": total_segments, "ProjectionExpression": "FaceId"}
+    retval = set()
+    while True:
+        response = table.scan(**kwargs)
+        retval.update(face_id_key(item["FaceId"]) for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return retval
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_table_face_ids(total_segments: int = 8) -> Set[Union[bytes, str]]:
+    """return the compact FaceIds of every row of the faceprint table, with a parallel scan"""
+    retval = set()
+    with ThreadPoolExecutor(max_workers=total_segments, thread_name_prefix="reconcile") as executor:
+        for face_ids in executor.map(scan_face_ids, range(total_segments), [total_segments] * total_segments):
+            retval |= face_ids
+    return retval
+
+
+def iter_collection_pages(page_size: int = LIST_FACES_MAX_RESULTS) -> Iterator[List[dict]]:
+    """yield the faces of the Rekognition collection, a list_faces() page at a time"""
+    client = settings.aws_rekognition_client
+    kwargs = {"CollectionId": settings.aws_rekognition_collection_id, "MaxResults": page_size}
+    while True:
+        response = client.list_faces(**kwargs)
+        yield response.get("Faces", [])
+        if not response.get("NextToken"):
+            return
+        kwargs["NextToken"] = response["NextToken"]
+
+
+def object_exists(bucket: str, key: str) -> bool:
+    """does the S3 object exist?"""
+    try:
+        settings.aws_s3_client.meta.client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+def delete_faces(face_ids: List[str]) -> int:
+    """remove face_ids from the Rekognition collection, 4096 per request. Returns the number deleted."""
+    client = settings.aws_rekognition_client
+    retval = 0
+    for i in range(0, len(face_ids), DELETE_FACES_MAX_IDS):
+        response = client.delete_faces(
+            CollectionId=settings.aws_rekognition_collection_id, FaceIds=face_ids[i : i + DELETE_FACES_MAX_IDS]
+        )
+        retval += len(response.get("DeletedFaces", []))
+        for failure in response.get("UnsuccessfulFaceDeletions", []):
+            logger.warning("delete_faces() failed for %s: %s", failure.get("FaceId"), failure.get("Reasons"))
+    return retval
+
+
+def repair_orphan_faces(faces: List[dict]) -> dict:
+    """
+    Rebuild the rows of orphan faces whose image still exists in the bucket,
+    and delete the others from the collection. Returns repair metrics.
+    """
+    bucket = settings.aws_s3_bucket_name
+    images = {}
+    stale_face_ids = []
+    for face in faces:
+        key = face.get("ExternalImageId")
+        if key and (key in images or object_exists(bucket, key)):
+            images.setdefault(key, []).append({"Face": {k: face[k] for k in FACE_ATTRIBUTES if k in face}})
+        else:
+            stale_face_ids.append(face["FaceId"])
+
+    items = []
+    for key, face_records in images.items():
+        s3_object = S3ObjectContext({"s3": {"bucket": {"name": bucket}, "object": {"key": quote_plus(key)}}})
+        items += get_faceprint_items(s3_object, {"FaceRecords": face_records})
+    if items:
+        batch_write_items(settings.dynamodb_table, items)
+        write_delta({item["FaceId"]: item["ExternalImageId"] for item in items})
+
+    return {"rowsRebuilt": len(items), "facesDeleted": delete_faces(stale_face_ids) if stale_face_ids else 0}
+
+
+def reconcile(repair: bool = False, total_segments: int = 8, page_size: int = LIST_FACES_MAX_RESULTS) -> dict:
+    """
+    Diff the FaceIds of the Rekognition collection and the faceprint table,
+    and, if repair, repair both. Returns metrics.
+    """
+    start = time.perf_counter()
+    table_face_ids = scan_table_face_ids(total_segments)
+    retval = {
+        "tableRows": len(table_face_ids),
+        "collectionFaces": 0,
+        "matched": 0,
+        "orphanFaces": 0,
+        "orphanRows": 0,
+        "rowsRebuilt": 0,
+        "facesDeleted": 0,
+        "rowsDeleted": 0,
+        "repaired": repair,
+    }
+
+    for faces in iter_collection_pages(page_size):
+        orphans = []
+        for face in faces:
+            key = face_id_key(face["FaceId"])
+            if key in table_face_ids:
+                table_face_ids.discard(key)
+            else:
+                orphans.append(face)
+        retval["collectionFaces"] += len(faces)
+        retval["matched"] += len(faces) - len(orphans)
+        retval["orphanFaces"] += len(orphans)
+        if orphans:
+            logger.info("orphan faces: %s", ", ".join(face["FaceId"] for face in orphans))
+            if repair:
+                for metric, value in repair_orphan_faces(orphans).items():
+                    retval[metric] += value
+
+    orphan_rows = [face_id_from_key(key) for key in table_face_ids]
+    retval["orphanRows"] = len(orphan_rows)
+    if orphan_rows:
+        logger.info("orphan rows: %s", ", ".join(orphan_rows))
+        if repair and not retval["collectionFaces"]:
+            # an empty listing is far more likely to be the wrong collection than
+            # a collection that was emptied on purpose
+            logger.warning("the collection is empty, so %s orphan rows were not deleted", len(orphan_rows))
+        elif repair:
+            retval["rowsDeleted"] = batch_delete_items(settings.dynamodb_table, "FaceId", orphan_rows)["items"]
+
+    retval["elapsedSeconds"] = round(time.perf_counter() - start, 3)
+    return retval
+
+
+def main(argv=None):
+    """reconcile the Rekognition collection with the faceprint table"""
+    parser = argparse.ArgumentParser(description="Reconcile the Rekognition collection with the faceprint table.")
+    parser.add_argument("--repair", action="store_true", help="repair orphan faces and rows (default: report only)")
+    parser.add_argument("--segments", type=int, default=8, help="parallel scan segments (default 8)")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=LIST_FACES_MAX_RESULTS,
+        help=f"faces per list_faces() page (default {LIST_FACES_MAX_RESULTS})",
+    )
+    args = parser.parse_args(argv)
+    json.dump(reconcile(repair=args.repair, total_segments=args.segments, page_size=args.page_size), sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed result cache for lambda_search.
+
+Clients frequently re-submit the same image (retries, kiosks re-sending the
+same frame), and each search costs a Rekognition search_faces_by_image() call
+plus a DynamoDB lookup. Results are cached under a sha256 of the decoded image
+bytes and the search parameters, so that a change to the collection, threshold,
+max faces or quality filter never serves a stale result.
+
+There are two tiers:
+- memory: a per-container LRU, sized by Settings.aws_search_cache_max_size.
+- dynamodb: an optional table shared by all containers, enabled by setting
+  Settings.aws_search_cache_table_id. Items carry an ExpiresAt epoch that is
+  also the table's TTL attribute. DynamoDB deletes expired items lazily, so
+  ExpiresAt is checked on read as well.
+
+Both tiers expire entries after Settings.aws_search_cache_ttl seconds. A ttl
+of 0 disables the cache, as does a max size of 0 with no table configured.
+"""
+
+# python stuff
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# our stuff
+from rekognition_api.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIER_MEMORY = "memory"
+CACHE_TIER_DYNAMODB = "dynamodb"
+
+
+def search_cache_key(image_bytes: bytes, **params) -> str:
+    """return a sha256 hex digest of the image bytes and the search parameters"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Any]:
+        """return the cached value, or None if it is missing or expired"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """cache value, evicting the least recently used entry if the cache is full"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """discard all entries"""
+        with self._lock:
+            self._items.clear()
+
+
+class SearchCache:
+    """
+    Two-tier search result cache. Values must be json serializable; they are
+    stored in DynamoDB as a json string so that floats survive the round trip.
+    """
+
+    def __init__(self):
+        self._memory = None
+        self._lock = threading.Lock()
+
+    @property
+    def memory(self) -> LRUCache:
+        """the in-process tier, created on first use so that importing this module reads no settings"""
+        if self._memory is None:
+            with self._lock:
+                if self._memory is None:
+                    self._memory = LRUCache(
+                        max_size=settings.aws_search_cache_max_size,
+                        ttl=settings.aws_search_cache_ttl,
+                    )
+        return self._memory
+
+    @property
+    def enabled(self) -> bool:
+        """is caching enabled at all? requires a ttl, and at least one tier"""
+        if settings.aws_search_cache_ttl <= 0:
+            return False
+        return settings.aws_search_cache_max_size > 0 or bool(settings.aws_search_cache_table_id)
+
+    @property
+    def table(self):
+        """the shared DynamoDB tier, or None if it is not configured"""
+        if not settings.aws_search_cache_table_id:
+            return None
+        return settings.get_dynamodb_table(settings.aws_search_cache_table_id)
+
+    def get(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """return (value, tier) of a cache hit, or (None, None) on a miss"""
+        if not self.enabled:
+            return None, None
+        value = self.memory.get(key)
+        if value is not None:
+            return value, CACHE_TIER_MEMORY
+
+        table = self.table
+        if table is None:
+            return None, None
+        try:
+            item = table.get_item(Key={"CacheKey": key}).get("Item")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # the shared tier is an optimization. never fail a search because of it.
+            logger.warning("search cache get_item() failed: %s", e)
+            return None, None
+        if not item or int(item["ExpiresAt"]) <= time.time():
+            return None, None
+        value = json.loads(item["Result"])
+        self.memory.put(key, value)
+        return value, CACHE_TIER_DYNAMODB
+
+    def put(self, key: str, value: Any) -> None:
+        """cache value in both tiers"""
+        if not self.enabled:
+            return
+        self.memory.put(key, value)
+
+        table = self.table
+        if table is None:
+            return
+        try:
+            table.put_item(
+                Item={
+                    "CacheKey": key,
+                    "Result": json.dumps(value),
+                    "ExpiresAt": int(time.time()) + settings.aws_search_cache_ttl,
+                }
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("search cache put_item() failed: %s", e)
+
+    def clear(self) -> None:
+        """discard the memory tier, and re-read its size and ttl from settings on next use"""
+        with self._lock:
+            self._memory = None
+
+
+search_cache = SearchCache()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Fast JSON and Decimal conversion for DynamoDB items and HTTP responses.
+
+boto3 rejects floats in DynamoDB items, so Rekognition's float-valued
+faceprints are converted to Decimal before they are written. to_decimal()
+walks the item once, where a json.dumps() / json.loads(parse_float=Decimal)
+round trip serializes and re-parses the whole item. Floats are converted
+through their repr(), exactly as the json round trip does, so the stored
+values do not change.
+
+dumps() serializes http response bodies with orjson, when it is installed,
+and with the stdlib json module otherwise. Both handle datetime, formatted
+as DateTimeEncoder does, and Decimal, ie items read back from DynamoDB.
+Both produce compact json. Values that orjson cannot serialize, ie ints
+wider than 64 bits, fall back to the stdlib.
+
+see tests/benchmarks/test_benchmark_serialization.py
+"""
+
+# python stuff
+import datetime
+import json
+from decimal import Decimal
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DATETIME_FORMAT = "%Y-%m-%d"
+
+
+def to_decimal(value):
+    """return a copy of value with every float, at any depth, converted to Decimal"""
+    # exact type checks first, since they are faster than isinstance() on the hot path
+    value_type = type(value)
+    if value_type is float:
+        return Decimal(repr(value))
+    if value_type is dict:
+        return {key: to_decimal(item) for key, item in value.items()}
+    if value_type is list:
+        return [to_decimal(item) for item in value]
+    if value_type is str or value is None:
+        return value
+    # subclasses, ie OrderedDict, and tuples
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    if isinstance(value, dict):
+        return {key: to_decimal(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_decimal(item) for item in value]
+    return value
+
+
+def default(o):
+    """serialize the types that json does not handle natively"""
+    if isinstance(o, datetime.datetime):
+        return o.strftime(DATETIME_FORMAT)
+    if isinstance(o, Decimal):
+        return int(o) if o == o.to_integral_value() else float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(obj) -> str:
+    """serialize obj to compact json with the stdlib json module"""
+    return json.dumps(obj, default=default, separators=(",", ":"))
+
+
+def dumps(obj) -> str:
+    """serialize obj to compact json, with orjson if it is installed"""
+    if orjson is None:
+        return stdlib_dumps(obj)
+    try:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode("utf-8")
+    except TypeError:
+        # orjson.JSONEncodeError is a TypeError. ie ints wider than 64 bits, or non-str dict keys
+        return stdlib_dumps(obj)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Sampled, structured diagnostics logging for debug_mode.
+
+Each entry is one json line on stdout, {"log": kind, ...fields}, which
+CloudWatch Logs Insights can query by field. Entries are cheap enough to
+leave debug_mode on under load:
+
+- sampling: whether an invocation logs is decided once, when it starts, for
+  Settings.debug_log_sample_percent of invocations. Every entry of a sampled
+  invocation is logged, so its event and records can be read together.
+- deferred serialization: fields may be passed as a callable, which is only
+  called, and its result serialized, if the entry is logged.
+- truncation: strings longer than Settings.debug_log_max_field_length are
+  cut, and long lists are shortened. Request bodies, which hold base64
+  images, and credential headers are never logged, only their size.
+- the settings dump is logged once per container, on its first invocation,
+  rather than on every invocation.
+"""
+
+# python stuff
+import json
+import random
+
+# our stuff
+from rekognition_api.conf import settings
+from rekognition_api.utils import DateTimeEncoder
+
+
+# keys, matched case-insensitively, whose values are replaced by their size
+REDACTED_KEYS = frozenset(["body", "authorization", "x-api-key", "aws_secret_access_key"])
+LOG_MAX_LIST_ITEMS = 20
+
+_sampled = False
+_settings_logged = False
+
+
+class LogEncoder(DateTimeEncoder):
+    """DateTimeEncoder that falls back to str(), so that an entry never fails to serialize"""
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+def redact(value) -> str:
+    """return a placeholder that gives the size of value"""
+    return f"<redacted {len(value) if hasattr(value, '__len__') else 1}>"
+
+
+def truncate(value, max_length: int):
+    """return a copy of value with long strings and lists cut, and redacted keys replaced"""
+    if isinstance(value, str):
+        if len(value) <= max_length:
+            return value
+        return f"{value[:max_length]}...<{len(value) - max_length} more>"
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, dict):
+        return {
+            key: (redact(item) if str(key).lower() in REDACTED_KEYS else truncate(item, max_length))
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [truncate(item, max_length) for item in value[:LOG_MAX_LIST_ITEMS]]
+        if len(value) > LOG_MAX_LIST_ITEMS:
+            items.append(f"...<{len(value) - LOG_MAX_LIST_ITEMS} more>")
+        return items
+    return value
+
+
+def start_invocation() -> bool:
+    """decide whether the invocation that is starting is sampled, and return the decision"""
+    global _sampled  # pylint: disable=global-statement
+    _sampled = settings.debug_mode and random.random() * 100 < settings.debug_log_sample_percent  # nosec B311
+    return _sampled
+
+
+def is_enabled() -> bool:
+    """is the current invocation logged?"""
+    return settings.debug_mode and _sampled
+
+
+def log(kind: str, fields) -> None:
+    """log an entry of fields, a dict or a callable that returns one, if the current invocation is sampled"""
+    if not is_enabled():
+        return
+    emit(kind, fields)
+
+
+def emit(kind: str, fields) -> None:
+    """write an entry, regardless of sampling"""
+    if callable(fields):
+        fields = fields()
+    entry = {"log": kind, **truncate(fields, settings.debug_log_max_field_length)}
+    print(json.dumps(entry, cls=LogEncoder))
+
+
+def log_invocation(event) -> None:
+    """
+    start an invocation: decide whether it is sampled, log the settings dump
+    if this is the container's first invocation, and log the event.
+    """
+    global _settings_logged  # pylint: disable=global-statement
+    start_invocation()
+    if settings.debug_mode and not _settings_logged:
+        _settings_logged = True
+        emit("settings", lambda: settings.dump)
+    log("event", lambda: {"event": event})
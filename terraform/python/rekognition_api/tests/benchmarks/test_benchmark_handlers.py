@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=redefined-outer-name
+"""
+Offline throughput and latency benchmarks of the Lambda handlers.
+
+Runs against moto (S3, DynamoDB) and the in-memory Rekognition stand-in, so
+results measure our own code, plus fixed synthetic api latencies: Rekognition
+latency is set with AWS_REKOGNITION_LOCAL_LATENCY_MS, and every DynamoDB request
+is delayed by REKOGNITION_BENCHMARK_DYNAMODB_LATENCY_MS (default 5ms) to stand in
+for the network round trip that moto does not have. p50 and p99 latencies, and
+throughput where relevant, are reported in each benchmark's extra_info.
+
+The faces= groups compare lambda_handler() with asyncio_lambda_handler() for
+images with 1, 10 and 50 faces.
+
+usage:
+    make benchmark
+    cd terraform/python && python -m pytest rekognition_api/tests/benchmarks --benchmark-only
+"""
+
+# python stuff
+import json
+import math
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# 3rd party stuff
+import pytest
+
+
+pytest.importorskip("pytest_benchmark")
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(HERE)))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search  # noqa: E402
+from rekognition_api.lambda_index import lambda_handler as index_handler  # noqa: E402
+from rekognition_api.lambda_search import lambda_handler as search_handler  # noqa: E402
+from rekognition_api.search_cache import search_cache  # noqa: E402
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+ROUNDS = int(os.environ.get("REKOGNITION_BENCHMARK_ROUNDS", 20))
+INDEX_RECORDS_COUNT = int(os.environ.get("REKOGNITION_BENCHMARK_INDEX_RECORDS", 10))
+DYNAMODB_LATENCY_MS = float(os.environ.get("REKOGNITION_BENCHMARK_DYNAMODB_LATENCY_MS", 5))
+INDEXED_IMAGES_COUNT = 50
+FACES_COUNTS = [1, 10, 50]
+HANDLER_VARIANTS = ["sync", "async"]
+
+
+def percentile(data: list, p: float) -> float:
+    """return the nearest-rank percentile p (0-100) of data"""
+    data = sorted(data)
+    return data[max(0, math.ceil(p / 100 * len(data)) - 1)]
+
+
+def record_latency(benchmark, items_per_round: int = 1) -> None:
+    """add p50 and p99 latency (ms), and throughput (items per second), to the benchmark's extra_info"""
+    if not benchmark.stats:
+        # --benchmark-disable runs each benchmark once, as a plain test, without stats
+        return
+    data = benchmark.stats.stats.data
+    benchmark.extra_info["p50_ms"] = round(percentile(data, 50) * 1000, 3)
+    benchmark.extra_info["p99_ms"] = round(percentile(data, 99) * 1000, 3)
+    benchmark.extra_info["throughput_per_s"] = round(items_per_round / benchmark.stats.stats.median, 1)
+
+
+@pytest.fixture
+def local_aws():
+    """moto for S3 and DynamoDB, and the in-memory Rekognition stand-in"""
+    test_case = LocalBackendTestCase()
+    test_case.setUp()
+    if DYNAMODB_LATENCY_MS:
+        test_case.settings.aws_dynamodb_resource.meta.client.meta.events.register(
+            "before-send.dynamodb", lambda **kwargs: time.sleep(DYNAMODB_LATENCY_MS / 1000)
+        )
+    yield test_case
+    test_case.tearDown()
+    test_case.doCleanups()
+
+
+@pytest.fixture
+def indexed_collection(local_aws):
+    """a collection of INDEXED_IMAGES_COUNT indexed images"""
+    index_handler(local_aws.get_index_event([f"person_{i}.jpg" for i in range(INDEXED_IMAGES_COUNT)]), None)
+    return local_aws
+
+
+def test_lambda_index(benchmark, local_aws):
+    """lambda_index: records indexed per second, for an event of INDEX_RECORDS_COUNT records"""
+    event = local_aws.get_index_event([f"benchmark/image_{i}.jpg" for i in range(INDEX_RECORDS_COUNT)])
+    response = benchmark.pedantic(index_handler, args=(event, None), rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    assert response["statusCode"] == 200
+    record_latency(benchmark, items_per_round=INDEX_RECORDS_COUNT)
+
+
+def test_lambda_search(benchmark, indexed_collection):
+    """lambda_search: uncached searches per second"""
+    event = indexed_collection.get_search_event(b"not-a-jpeg")
+    with patch.dict(indexed_collection.settings.__dict__, {"aws_search_cache_ttl": 0}):
+        response = benchmark.pedantic(search_handler, args=(event, None), rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    assert response["headers"]["X-Search-Cache"] == "BYPASS"
+    record_latency(benchmark)
+
+
+def test_lambda_search_cached(benchmark, indexed_collection):
+    """lambda_search: searches per second that are served by the memory tier of the search cache"""
+    event = indexed_collection.get_search_event(b"not-a-jpeg")
+    search_cache.clear()
+    # warm the cache, rather than relying on the warmup round, which --benchmark-disable skips
+    assert search_handler(event, None)["headers"]["X-Search-Cache"] == "MISS"
+    response = benchmark.pedantic(search_handler, args=(event, None), rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    assert response["headers"]["X-Search-Cache"] == "HIT"
+    record_latency(benchmark)
+
+
+@pytest.mark.parametrize("faces_count", FACES_COUNTS)
+@pytest.mark.parametrize("variant", HANDLER_VARIANTS)
+def test_lambda_index_faces(benchmark, local_aws, variant, faces_count):
+    """lambda_index: sync vs async latency for a single image with faces_count faces"""
+    benchmark.group = f"lambda_index faces={faces_count}"
+    handler = lambda_index.lambda_handler if variant == "sync" else lambda_index.asyncio_lambda_handler
+    local_aws.settings.aws_rekognition_client.faces_count = faces_count
+    event = local_aws.get_index_event(["benchmark/faces.jpg"])
+    with patch.dict(local_aws.settings.__dict__, {"aws_rekognition_face_detect_max_faces_count": faces_count}):
+        response = benchmark.pedantic(handler, args=(event, None), rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    assert json.loads(response["body"])["facesIndexed"] == faces_count
+    record_latency(benchmark)
+
+
+@pytest.mark.parametrize("faces_count", FACES_COUNTS)
+@pytest.mark.parametrize("variant", HANDLER_VARIANTS)
+def test_lambda_search_faces(benchmark, local_aws, variant, faces_count):
+    """lambda_search: sync vs async uncached latency for a search that matches faces_count faces"""
+    benchmark.group = f"lambda_search faces={faces_count}"
+    handler = lambda_search.lambda_handler if variant == "sync" else lambda_search.asyncio_lambda_handler
+    local_aws.settings.aws_rekognition_client.faces_count = max(FACES_COUNTS)
+    with patch.dict(local_aws.settings.__dict__, {"aws_rekognition_face_detect_max_faces_count": max(FACES_COUNTS)}):
+        index_handler(local_aws.get_index_event(["benchmark/faces.jpg"]), None)
+    event = local_aws.get_search_event(b"not-a-jpeg")
+    settings = {"aws_search_cache_ttl": 0, "aws_rekognition_face_detect_max_faces_count": faces_count}
+    with patch.dict(local_aws.settings.__dict__, settings):
+        response = benchmark.pedantic(handler, args=(event, None), rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    assert len(json.loads(response["body"])["matchedFaces"]) == faces_count
+    record_latency(benchmark)
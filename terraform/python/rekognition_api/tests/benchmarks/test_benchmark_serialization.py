@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+"""
+Microbenchmarks of serialization.py against the json round trips that it replaced.
+
+- to_decimal: the float to Decimal conversion of the faceprints of an
+  index_faces() response, vs json.loads(json.dumps(face), parse_float=Decimal)
+- dumps: the serialization of a search response body, vs json.dumps() with
+  DateTimeEncoder. dumps is benchmarked with orjson, and with the stdlib
+  fallback that is used when orjson is not installed.
+
+Payloads are the sample responses in tests/mock_data/json.
+
+usage:
+    make benchmark
+    cd terraform/python && python -m pytest rekognition_api/tests/benchmarks --benchmark-only
+"""
+
+# python stuff
+import json
+import os
+import sys
+from decimal import Decimal
+from unittest.mock import patch
+
+# 3rd party stuff
+import pytest
+
+
+pytest.importorskip("pytest_benchmark")
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(HERE)))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import serialization  # noqa: E402
+from rekognition_api.tests.test_setup import get_test_file  # noqa: E402
+from rekognition_api.utils import DateTimeEncoder  # noqa: E402
+
+
+FACE_RECORDS = get_test_file("json/apigateway_index_lambda_response.json")["retval"]["body"]["FaceRecords"]
+SEARCH_RESPONSE = get_test_file("json/apigateway_search_lambda_response.json")
+
+
+def json_round_trip(faces: list) -> list:
+    """the float to Decimal conversion that persist_faceprints() used to do"""
+    return [json.loads(json.dumps(face), parse_float=Decimal) for face in faces]
+
+
+def fast_to_decimal(faces: list) -> list:
+    """the float to Decimal conversion of persist_faceprints()"""
+    return [serialization.to_decimal(face) for face in faces]
+
+
+@pytest.mark.parametrize("variant", ["json_round_trip", "to_decimal"])
+def test_to_decimal(benchmark, variant):
+    """float to Decimal conversion of the faceprints of an index_faces() response"""
+    benchmark.group = "to_decimal"
+    func = json_round_trip if variant == "json_round_trip" else fast_to_decimal
+    assert benchmark(func, FACE_RECORDS) == json_round_trip(FACE_RECORDS)
+
+
+@pytest.mark.parametrize("variant", ["DateTimeEncoder", "stdlib", "orjson"])
+def test_dumps(benchmark, variant):
+    """serialization of a search response body"""
+    benchmark.group = "dumps"
+    if variant == "orjson" and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    if variant == "DateTimeEncoder":
+        result = benchmark(json.dumps, SEARCH_RESPONSE, cls=DateTimeEncoder)
+    else:
+        with patch.object(serialization, "orjson", serialization.orjson if variant == "orjson" else None):
+            result = benchmark(serialization.dumps, SEARCH_RESPONSE)
+    assert json.loads(result) == SEARCH_RESPONSE
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the asyncio variants of the Lambda handlers."""
+
+# python stuff
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search  # noqa: E402
+from rekognition_api.dynamodb import (  # noqa: E402
+    async_batch_get_items,
+    async_batch_write_items,
+)
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+FACES_COUNT = 30
+
+
+class TestAsyncHandlers(LocalBackendTestCase):
+    """Test the asyncio variants of the Lambda handlers."""
+
+    def setUp(self):
+        """Find FACES_COUNT faces in every image, and return as many search matches."""
+        super().setUp()
+        faces_count = patch.dict(
+            self.settings.__dict__,
+            {"aws_rekognition_local_faces_count": FACES_COUNT, "aws_rekognition_face_detect_max_faces_count": 100},
+        )
+        faces_count.start()
+        self.addCleanup(faces_count.stop)
+
+    def test_async_batch_helpers(self):
+        """Test that chunks are written and read concurrently, with the same results as the sync helpers."""
+        items = [{"FaceId": f"face-{i}", "ExternalImageId": f"image-{i}.jpg"} for i in range(260)]
+        metrics = asyncio.run(async_batch_write_items(self.table, items, max_concurrency=4))
+        self.assertEqual(metrics, {"items": 260, "requests": 11, "retries": 0})
+
+        face_ids = [item["FaceId"] for item in items] + ["face-0", "face-missing"]
+        found = asyncio.run(async_batch_get_items(self.table, "FaceId", face_ids, max_concurrency=2))
+        self.assertEqual(len(found), 260)
+        self.assertEqual(found["face-7"]["ExternalImageId"], "image-7.jpg")
+
+    def test_async_index(self):
+        """Test that async_lambda_handler() indexes every face of every record, in record order."""
+        keys = [f"async/image_{i}.jpg" for i in range(5)]
+        response = asyncio.run(lambda_index.async_lambda_handler(self.get_index_event(keys), None))
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(body["indexedCount"], 5)
+        self.assertEqual(body["facesIndexed"], 5 * FACES_COUNT)
+        self.assertEqual([record["key"] for record in body["records"]], keys)
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 5 * FACES_COUNT)
+
+    def test_async_index_errors(self):
+        """Test that async_lambda_handler() reports per-record errors like lambda_handler()."""
+        event = self.get_index_event(["async/ok.jpg", "async/missing.jpg"])
+        self.settings.aws_s3_client.Object(self.bucket_name, "async/missing.jpg").delete()
+        body = json.loads(lambda_index.asyncio_lambda_handler(event, None)["body"])
+        self.assertEqual(body["indexedCount"], 1)
+        self.assertEqual(body["failedCount"], 1)
+        self.assertIsNotNone(body["records"][1]["error"])
+
+    def test_async_search(self):
+        """Test that async_lambda_handler() returns the same matches as lambda_handler()."""
+        lambda_index.lambda_handler(self.get_index_event(["Jane_Doe.jpg"]), None)
+        event = self.get_search_event(b"not-a-jpeg")
+        with patch.dict(self.settings.__dict__, {"aws_search_cache_ttl": 0}):
+            expected = json.loads(lambda_search.lambda_handler(event, None)["body"])
+            response = lambda_search.asyncio_lambda_handler(event, None)
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(body["matchedFaces"], expected["matchedFaces"])
+        self.assertEqual(body["matchedFaces"], ["Jane doe"] * FACES_COUNT)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the concurrent, memoized and cached AWS infrastructure introspection of /info."""
+
+# python stuff
+import json
+import os
+import sys
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_info  # noqa: E402
+from rekognition_api.aws import aws_infrastructure_config  # noqa: E402
+from rekognition_api.conf import Services  # noqa: E402
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+DISABLED_SERVICES = {
+    "AWS_DYNAMODB": ("dynamodb", False),
+    "AWS_LAMBDA": ("lambda", False),
+    "AWS_REKOGNITION": ("rekognition", False),
+    "AWS_ROUTE53": ("route53", False),
+}
+POLICY_DOCUMENT = {
+    "Version": "2012-10-17",
+    "Statement": [{"Effect": "Allow", "Action": "rekognition:SearchFacesByImage", "Resource": "*"}],
+}
+ASSUME_ROLE_POLICY_DOCUMENT = {
+    "Version": "2012-10-17",
+    "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}],
+}
+
+
+class TestAWSInfo(MockAWSTestCase):
+    """Test AWSInfrastructureConfig.get_dump()."""
+
+    def setUp(self):
+        """Create an api, a bucket, and an iam policy and role, and enable their services only."""
+        super().setUp()
+        self.aws_config = aws_infrastructure_config
+        self.aws_config.invalidate_dump()
+        self.addCleanup(self.aws_config.invalidate_dump)
+        enabled_services = patch.multiple(Services, **DISABLED_SERVICES)
+        enabled_services.start()
+        self.addCleanup(enabled_services.stop)
+        test_settings = patch.dict(
+            self.settings.__dict__,
+            {"shared_resource_identifier": "rekognition", "aws_info_cache_ttl": 300, "debug_mode": False},
+        )
+        test_settings.start()
+        self.addCleanup(test_settings.stop)
+
+        identifier = self.settings.shared_resource_identifier
+        self.api_id = self.session.client("apigateway").create_rest_api(name=self.settings.aws_apigateway_name)["id"]
+        self.session.client("s3").create_bucket(Bucket=self.settings.aws_s3_bucket_name)
+        iam_client = self.session.client("iam")
+        policy_arn = iam_client.create_policy(
+            PolicyName=f"{identifier}-policy", PolicyDocument=json.dumps(POLICY_DOCUMENT)
+        )["Policy"]["Arn"]
+        iam_client.create_policy(PolicyName="unrelated-policy", PolicyDocument=json.dumps(POLICY_DOCUMENT))
+        for role_name in (f"{identifier}-role-a", f"{identifier}-role-b"):
+            iam_client.create_role(
+                RoleName=role_name, AssumeRolePolicyDocument=json.dumps(ASSUME_ROLE_POLICY_DOCUMENT)
+            )
+            iam_client.attach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
+
+    def test_dump(self):
+        """Test that the dump has a section per enabled service, with the same content as before."""
+        identifier = self.settings.shared_resource_identifier
+        dump = self.aws_config.get_dump()
+        self.assertEqual(list(dump), ["apigateway", "iam", "s3"])
+        self.assertEqual(dump["apigateway"]["api_id"], self.api_id)
+        self.assertEqual(dump["s3"]["bucket_name"], f"arn:aws:s3:::{self.settings.aws_s3_bucket_name}")
+        self.assertEqual(list(dump["iam"]["policies"]), [f"{identifier}-policy"])
+        self.assertEqual(dump["iam"]["policies"][f"{identifier}-policy"]["Policy"], POLICY_DOCUMENT)
+        roles = dump["iam"]["roles"]
+        self.assertEqual(sorted(roles), [f"{identifier}-role-a", f"{identifier}-role-b"])
+        for role in roles.values():
+            self.assertEqual([policy["PolicyName"] for policy in role["AttachedPolicies"]], [f"{identifier}-policy"])
+
+    def test_memoized_lookups(self):
+        """Test that get_rest_apis() is called once per dump, and on every call outside of one."""
+        client = self.settings.aws_apigateway_client
+        with patch.object(client, "get_rest_apis", wraps=client.get_rest_apis) as get_rest_apis:
+            self.aws_config.get_dump()
+            self.assertEqual(get_rest_apis.call_count, 1)
+            self.assertTrue(self.aws_config.api_exists(self.settings.aws_apigateway_name))
+            self.assertEqual(self.aws_config.get_api(self.settings.aws_apigateway_name)["id"], self.api_id)
+            self.assertEqual(get_rest_apis.call_count, 3)
+
+    def test_cached_dump(self):
+        """Test that the dump is cached, that refresh rebuilds it, and that a ttl of 0 disables the cache."""
+        with patch.object(self.aws_config, "build_dump", wraps=self.aws_config.build_dump) as build_dump:
+            dump = self.aws_config.get_dump()
+            self.assertIs(self.aws_config.get_dump(), dump)
+            self.assertEqual(build_dump.call_count, 1)
+
+            refreshed = self.aws_config.get_dump(refresh=True)
+            self.assertEqual(refreshed, dump)
+            self.assertEqual(build_dump.call_count, 2)
+            self.assertIs(self.aws_config.get_dump(), refreshed)
+
+            with patch.dict(self.settings.__dict__, {"aws_info_cache_ttl": 0}):
+                self.aws_config.get_dump()
+                self.aws_config.get_dump()
+            self.assertEqual(build_dump.call_count, 4)
+
+    def test_lambda_handler_refresh(self):
+        """Test that /info?refresh=true bypasses the cached dump."""
+        with patch.object(self.aws_config, "get_dump", wraps=self.aws_config.get_dump) as get_dump:
+            lambda_info.lambda_handler({}, None)
+            get_dump.assert_called_with(refresh=False)
+            response = lambda_info.lambda_handler({"queryStringParameters": {"refresh": "true"}}, None)
+            get_dump.assert_called_with(refresh=True)
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(json.loads(response["body"])["aws"]["apigateway"]["api_id"], self.api_id)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the resumable bulk backfill."""
+
+# python stuff
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import backfill  # noqa: E402
+from rekognition_api.backfill import (  # noqa: E402
+    Backfill,
+    BucketSource,
+    FileCheckpoint,
+    InventorySource,
+    ThrottleCounter,
+    get_checkpoint,
+)
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+IMAGE_KEYS = [f"archive/person {i}.jpg" for i in range(6)]
+
+
+class TestBackfill(LocalBackendTestCase):
+    """Test the resumable bulk backfill."""
+
+    def setUp(self):
+        """Upload an archive of images, plus an object that is not an image."""
+        super().setUp()
+        s3_client = self.settings.aws_s3_client.meta.client
+        for key in IMAGE_KEYS + ["archive/notes.txt"]:
+            s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=b"not-a-jpeg")
+        tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp.cleanup)
+        self.checkpoint_path = os.path.join(tmp.name, "checkpoint.json")
+
+    def get_backfill(self, **kwargs) -> Backfill:
+        """Return a backfill of the archive prefix, checkpointed to a file."""
+        return Backfill(
+            BucketSource(self.bucket_name, "archive/"), FileCheckpoint(self.checkpoint_path), max_workers=4, **kwargs
+        )
+
+    def test_backfill(self):
+        """Test that every image is indexed, and that the run is checkpointed as completed."""
+        metrics = self.get_backfill().run()
+        self.assertEqual(metrics["images"], 6)
+        self.assertEqual(metrics["indexed"], 6)
+        self.assertEqual(metrics["faces"], 6)
+        self.assertEqual(metrics["failed"], 0)
+        self.assertTrue(metrics["completed"])
+        self.assertGreater(metrics["imagesPerSecond"], 0)
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 6)
+
+        state = FileCheckpoint(self.checkpoint_path).load()
+        self.assertEqual(state["position"], 7)
+        self.assertEqual(state["lastKey"], "archive/person 5.jpg")
+        self.assertNotIn("imagesPerSecond", state)
+
+    def test_resume(self):
+        """Test that a second run resumes after the last checkpointed key."""
+        first = self.get_backfill(limit=2).run()
+        self.assertEqual(first["indexed"], 2)
+        self.assertFalse(first["completed"])
+
+        with patch.object(backfill, "process_record", wraps=backfill.process_record) as process_record:
+            second = self.get_backfill().run()
+        keys = [call.args[0]["s3"]["object"]["key"] for call in process_record.call_args_list]
+        self.assertEqual(
+            keys,
+            ["archive%2Fperson+2.jpg", "archive%2Fperson+3.jpg", "archive%2Fperson+4.jpg", "archive%2Fperson+5.jpg"],
+        )
+        self.assertEqual(second["indexed"], 6)
+        self.assertTrue(second["completed"])
+
+    def test_rerun_without_checkpoint(self):
+        """Test that images that are already indexed are skipped by the ingest ledger."""
+        ledger_table = self.session.resource("dynamodb").create_table(
+            TableName="rekognition-ledger",
+            KeySchema=[{"AttributeName": "LedgerKey", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "LedgerKey", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        with patch.dict(self.settings.__dict__, {"aws_index_ledger_table_id": ledger_table.name}):
+            self.get_backfill().run()
+            os.remove(self.checkpoint_path)
+            metrics = self.get_backfill().run()
+        self.assertEqual((metrics["indexed"], metrics["skipped"]), (0, 6))
+
+    def test_dynamodb_checkpoint(self):
+        """Test that progress can be checkpointed to a DynamoDB table with any string hash key."""
+        table = self.session.resource("dynamodb").create_table(
+            TableName="rekognition-backfill",
+            KeySchema=[{"AttributeName": "RunId", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "RunId", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        checkpoint = get_checkpoint("dynamodb://rekognition-backfill", run_id="run-1")
+        Backfill(BucketSource(self.bucket_name, "archive/"), checkpoint, limit=3).run()
+        item = table.get_item(Key={"RunId": "backfill#run-1"})["Item"]
+        self.assertEqual(json.loads(item["State"])["indexed"], 3)
+        self.assertEqual(checkpoint.load()["lastKey"], "archive/person 2.jpg")
+
+    def test_inventory(self):
+        """Test that keys are read from an S3 Inventory manifest, and that it resumes by row."""
+        s3_client = self.settings.aws_s3_client.meta.client
+        rows = io.StringIO()
+        writer = csv.writer(rows)
+        for key in IMAGE_KEYS:
+            writer.writerow([self.bucket_name, key.replace(" ", "+").replace("/", "%2F"), "10", "etag"])
+        s3_client.put_object(
+            Bucket=self.bucket_name, Key="inventory/data/1.csv.gz", Body=gzip.compress(rows.getvalue().encode())
+        )
+        manifest = {
+            "sourceBucket": self.bucket_name,
+            "fileFormat": "CSV",
+            "fileSchema": "Bucket, Key, Size, ETag",
+            "files": [{"key": "inventory/data/1.csv.gz"}],
+        }
+        s3_client.put_object(Bucket=self.bucket_name, Key="inventory/manifest.json", Body=json.dumps(manifest).encode())
+
+        source = InventorySource(f"s3://{self.bucket_name}/inventory/manifest.json")
+        self.assertEqual([obj[2] for obj in source.iter_objects(position=4)], IMAGE_KEYS[4:])
+        metrics = Backfill(source, FileCheckpoint(self.checkpoint_path)).run()
+        self.assertEqual(metrics["indexed"], 6)
+
+    def test_throttle_counter(self):
+        """Test that only throttling errors are counted."""
+        counter = ThrottleCounter()
+        counter(response=(None, {"Error": {"Code": "ThrottlingException"}}))
+        counter(response=(None, {"Error": {"Code": "AccessDeniedException"}}))
+        counter(response=None)
+        self.assertEqual(counter.count, 1)
+
+    def test_main(self):
+        """Test the command line entry point."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            backfill.main(["--bucket", self.bucket_name, "--prefix", "archive/", "--checkpoint", self.checkpoint_path])
+        # the summary is the last line, after any debug_mode output of lambda_index
+        self.assertEqual(json.loads(stdout.getvalue().splitlines()[-1])["indexed"], 6)
@@ -19,7 +19,7 @@ if PYTHON_ROOT not in sys.path:
 
 # our stuff
 from rekognition_api.conf import Settings, SettingsDefaults  # noqa: E402
-from rekognition_api.const import TFVARS  # noqa: E402
+from rekognition_api.const import TFVARS, parse_tfvars_scalars  # noqa: E402
 from rekognition_api.exceptions import RekognitionValueError  # noqa: E402
 
 
@@ -256,3 +256,45 @@ class TestConfiguration(unittest.TestCase):
 
         with self.assertRaises(PydanticValidationError):
             mock_settings.aws_rekognition_face_detect_threshold = 25
+
+
+class TestTFVarsScalars(unittest.TestCase):
+    """Test parse_tfvars_scalars(), which reads the Settings defaults without hcl2."""
+
+    def test_scalars(self):
+        """Test that top level strings, numbers and bools are parsed, and everything else is skipped."""
+        text = """
+# a comment
+aws_region           = "us-east-1" # trailing comment
+stage                = "v1 # not a comment"
+escaped              = "say \\"hi\\""
+lambda_memory_size   = 256
+threshold            = 0.5
+debug_mode           = true
+create_custom_domain = false
+reference            = var.stage
+tags = {
+  "terraform" = "true"
+  nested = { depth = 2 }
+}
+subnets = [
+  "subnet-a",
+]
+policy = <<EOT
+not_a_var = 1
+EOT
+log_retention_days = 3
+"""
+        self.assertEqual(
+            parse_tfvars_scalars(text),
+            {
+                "aws_region": "us-east-1",
+                "stage": "v1 # not a comment",
+                "escaped": 'say "hi"',
+                "lambda_memory_size": 256,
+                "threshold": 0.5,
+                "debug_mode": True,
+                "create_custom_domain": False,
+                "log_retention_days": 3,
+            },
+        )
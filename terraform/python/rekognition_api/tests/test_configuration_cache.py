@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+"""Test the Settings cache of values derived from AWS api calls."""
+
+# python stuff
+import os
+import sys
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.conf import Settings  # noqa: E402
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+class TestConfigurationCache(MockAWSTestCase):
+    """Test the Settings cache of values derived from AWS api calls."""
+
+    def test_aws_account_id_is_cached(self):
+        """Test that sts is called once per container."""
+        sts_client = self.settings.get_aws_client("sts")
+        with patch.object(sts_client, "get_caller_identity", wraps=sts_client.get_caller_identity) as identity:
+            account_id = self.settings.aws_account_id
+            self.assertEqual(self.settings.aws_account_id, account_id)
+            self.assertTrue(self.settings.aws_s3_bucket_name.startswith(account_id + "-"))
+        self.assertEqual(identity.call_count, 1)
+
+    def test_cache_ttl_expiry(self):
+        """Test that cached values are resolved again once aws_cache_ttl has elapsed."""
+        resolver_calls = []
+
+        def resolver():
+            resolver_calls.append(1)
+            return len(resolver_calls)
+
+        with patch("rekognition_api.conf.time.monotonic", return_value=1000.0):
+            self.assertEqual(self.settings.get_cached_value("test", resolver), 1)
+            self.assertEqual(self.settings.get_cached_value("test", resolver), 1)
+        with patch("rekognition_api.conf.time.monotonic", return_value=1000.0 + self.settings.aws_cache_ttl):
+            self.assertEqual(self.settings.get_cached_value("test", resolver), 2)
+
+    def test_cache_disabled(self):
+        """Test that an aws_cache_ttl of 0 disables the cache, and that None is never cached."""
+        with patch.dict(self.settings.__dict__, {"aws_cache_ttl": 0}):
+            self.settings.get_cached_value("test", lambda: "value")
+        self.settings.get_cached_value("none", lambda: None)
+        self.assertEqual(self.settings._cached_values, {})
+
+    def test_invalidate_cached_values(self):
+        """Test that cached values can be invalidated by name or all at once."""
+        self.settings.get_cached_value("a", lambda: "a")
+        self.settings.get_cached_value("b", lambda: "b")
+        self.settings.invalidate_cached_values("a")
+        self.assertEqual(list(self.settings._cached_values.keys()), ["b"])
+        self.settings.invalidate_cached_values()
+        self.assertEqual(self.settings._cached_values, {})
+
+    def test_aws_apigateway_domain_name_is_cached(self):
+        """Test that the api gateway lookup is made once per container."""
+        client = self.settings.aws_apigateway_client
+        rest_api = client.create_rest_api(name=self.settings.aws_apigateway_name)
+        with patch.dict(self.settings.__dict__, {"aws_apigateway_create_custom_domaim": False}):
+            with patch.object(client, "get_rest_apis", wraps=client.get_rest_apis) as get_rest_apis:
+                domain_name = self.settings.aws_apigateway_domain_name
+                self.assertEqual(self.settings.aws_apigateway_domain_name, domain_name)
+        self.assertEqual(get_rest_apis.call_count, 1)
+        self.assertTrue(domain_name.startswith(rest_api["id"] + ".execute-api."))
+
+    def test_pinned_values(self):
+        """Test that values pinned by environment variables never call aws."""
+        environ = {
+            "AWS_ACCOUNT_ID": "123456789012",
+            "AWS_S3_BUCKET_NAME": "pinned-bucket",
+            "AWS_APIGATEWAY_DOMAIN_NAME": "api.example.com",
+        }
+        with patch.dict(os.environ, environ):
+            pinned_settings = Settings()
+        pinned_settings._aws_session = self.session
+        with patch.object(self.session, "client") as session_client:
+            self.assertEqual(pinned_settings.aws_account_id, "123456789012")
+            self.assertEqual(pinned_settings.aws_s3_bucket_name, "pinned-bucket")
+            self.assertEqual(pinned_settings.aws_apigateway_domain_name, "api.example.com")
+        session_client.assert_not_called()
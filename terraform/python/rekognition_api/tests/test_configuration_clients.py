@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+"""Test the Settings boto3 client registry."""
+
+# python stuff
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.conf import Settings  # noqa: E402
+from rekognition_api.exceptions import RekognitionValueError  # noqa: E402
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+class TestConfigurationClients(MockAWSTestCase):
+    """Test the Settings boto3 client registry."""
+
+    def test_clients_are_cached(self):
+        """Test that each client and resource is created once, from aws_session."""
+        with patch.object(self.session, "client", wraps=self.session.client) as session_client:
+            rekognition_client = self.settings.aws_rekognition_client
+            self.assertIs(self.settings.aws_rekognition_client, rekognition_client)
+            self.assertIs(self.settings.aws_dynamodb_client, self.settings.aws_dynamodb_client)
+        self.assertEqual(session_client.call_count, 2)
+        self.assertIs(self.settings.aws_s3_client, self.settings.aws_s3_client)
+
+    def test_dynamodb_table_is_cached(self):
+        """Test that dynamodb_table reuses one Table per thread, all on the cached dynamodb resource's client."""
+        table = self.settings.dynamodb_table
+        self.assertIs(self.settings.dynamodb_table, table)
+        self.assertIs(table.meta.client, self.settings.aws_dynamodb_resource.meta.client)
+        self.assertEqual(table.name, self.settings.aws_dynamodb_table_id)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            thread_table, same_thread_table = executor.submit(
+                lambda: (self.settings.dynamodb_table, self.settings.dynamodb_table)
+            ).result()
+            thread_table_again = executor.submit(lambda: self.settings.dynamodb_table).result()
+        self.assertIsNot(thread_table, table)
+        self.assertIs(same_thread_table, thread_table)
+        self.assertIs(thread_table_again, thread_table)
+        self.assertIs(thread_table.meta.client, table.meta.client)
+
+    def test_client_timings(self):
+        """Test that creation timings are recorded per client."""
+        self.assertEqual(self.settings.aws_client_timings, {})
+        _ = self.settings.aws_rekognition_client
+        _ = self.settings.dynamodb_table
+        timings = self.settings.aws_client_timings
+        self.assertEqual(sorted(timings.keys()), ["dynamodb.resource", "rekognition.client"])
+        for timing in timings.values():
+            self.assertGreaterEqual(timing, 0)
+
+        self.settings.reset_aws_clients()
+        self.assertEqual(self.settings.aws_client_timings, {})
+
+    def test_concurrent_access(self):
+        """Test that concurrent first access creates a single client."""
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            clients = list(executor.map(lambda _: self.settings.aws_rekognition_client, range(64)))
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+
+class TestConnectionProfiles(MockAWSTestCase):
+    """Test the botocore connection profiles of the S3, DynamoDB and Rekognition clients."""
+
+    def test_clients_use_profiles(self):
+        """Test that each client is created with the Config of its profile."""
+        configs = {
+            "s3": self.settings.aws_s3_client.meta.client.meta.config,
+            "dynamodb": self.settings.aws_dynamodb_client.meta.config,
+            "rekognition": self.settings.aws_rekognition_client.meta.config,
+        }
+        for service_name, config in configs.items():
+            profile = self.settings.get_connection_profile(service_name)
+            self.assertGreaterEqual(profile["max_pool_connections"], 10)
+            self.assertEqual(config.max_pool_connections, profile["max_pool_connections"])
+            self.assertEqual(config.connect_timeout, profile["connect_timeout"])
+            self.assertEqual(config.read_timeout, profile["read_timeout"])
+            self.assertEqual(config.tcp_keepalive, profile["tcp_keepalive"])
+            self.assertEqual(config.retries["mode"], profile["retry_mode"])
+        self.assertEqual(configs["dynamodb"].retries["total_max_attempts"], self.settings.aws_dynamodb_max_attempts)
+        # the rate limiter does the retrying of the rekognition client
+        self.assertEqual(configs["rekognition"].retries["total_max_attempts"], 1)
+        self.assertIn("aws_connection_profiles", self.settings.dump)
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_S3_MAX_POOL_CONNECTIONS": "64",
+            "AWS_S3_RETRY_MODE": "ADAPTIVE",
+            "AWS_S3_MAX_ATTEMPTS": "3",
+            "AWS_S3_CONNECT_TIMEOUT": "2",
+            "AWS_S3_READ_TIMEOUT": "7",
+            "AWS_S3_TCP_KEEPALIVE": "false",
+        },
+    )
+    def test_env_overrides(self):
+        """Test that profiles are set with environment variables."""
+        mock_settings = Settings(aws_region="us-east-1", init_info="test_env_overrides()")
+        self.assertEqual(
+            mock_settings.get_connection_profile("s3"),
+            {
+                "max_pool_connections": 64,
+                "retry_mode": "adaptive",
+                "max_attempts": 3,
+                "connect_timeout": 2,
+                "read_timeout": 7,
+                "tcp_keepalive": False,
+            },
+        )
+
+    @patch.dict(os.environ, {"AWS_DYNAMODB_RETRY_MODE": "sometimes"})
+    def test_invalid_retry_mode(self):
+        """Test that an unknown retry mode is rejected."""
+        with self.assertRaises(RekognitionValueError):
+            Settings(aws_region="us-east-1", init_info="test_invalid_retry_mode()")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test DynamoDB batch helpers against a moto-backed table."""
+
+# python stuff
+import os
+import sys
+from decimal import Decimal
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.dynamodb import (  # noqa: E402
+    batch_delete_items,
+    batch_get_items,
+    batch_write_items,
+)
+from rekognition_api.exceptions import (  # noqa: E402
+    RekognitionBatchGetError,
+    RekognitionBatchWriteError,
+)
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+class TestDynamoDB(MockAWSTestCase):
+    """Test DynamoDB batch helpers."""
+
+    def setUp(self):
+        """Create a moto-backed faceprint table."""
+        super().setUp()
+        self.table = self.create_faceprint_table("rekognition-test")
+
+    def get_items(self, count: int) -> list:
+        """Return count faceprint items."""
+        return [
+            {"FaceId": f"face-{i}", "ExternalImageId": f"image-{i}.jpg", "Confidence": Decimal("99.5")}
+            for i in range(count)
+        ]
+
+    def test_batch_write_items_chunks(self):
+        """Test that items are written 25 per BatchWriteItem request."""
+        metrics = batch_write_items(self.table, self.get_items(60))
+        self.assertEqual(metrics, {"items": 60, "requests": 3, "retries": 0})
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 60)
+
+    def test_batch_write_items_retries_unprocessed(self):
+        """Test that UnprocessedItems are re-submitted and counted as retries."""
+        client = self.table.meta.client
+        batch_write_item = client.batch_write_item
+        calls = []
+
+        def throttled_batch_write_item(RequestItems):
+            """Write only the first item of the first two requests, returning the rest as unprocessed."""
+            calls.append(RequestItems)
+            if len(calls) > 2:
+                return batch_write_item(RequestItems=RequestItems)
+            requests = RequestItems[self.table.name]
+            batch_write_item(RequestItems={self.table.name: requests[:1]})
+            return {"UnprocessedItems": {self.table.name: requests[1:]}}
+
+        with patch.object(client, "batch_write_item", side_effect=throttled_batch_write_item):
+            metrics = batch_write_items(self.table, self.get_items(10), base_delay=0)
+
+        self.assertEqual(metrics, {"items": 10, "requests": 3, "retries": 2})
+        self.assertEqual([len(call[self.table.name]) for call in calls], [10, 9, 8])
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 10)
+
+    def test_batch_write_items_gives_up(self):
+        """Test that items that are never processed raise an error."""
+        client = self.table.meta.client
+
+        def throttled_batch_write_item(RequestItems):
+            return {"UnprocessedItems": RequestItems}
+
+        with patch.object(client, "batch_write_item", side_effect=throttled_batch_write_item):
+            with self.assertRaises(RekognitionBatchWriteError):
+                batch_write_items(self.table, self.get_items(3), max_attempts=3, base_delay=0)
+
+    def test_batch_delete_items(self):
+        """Test that keys are deleted 25 per BatchWriteItem request, and de-duplicated."""
+        batch_write_items(self.table, self.get_items(40))
+        face_ids = [f"face-{i}" for i in range(30)] + ["face-0", "face-missing"]
+        metrics = batch_delete_items(self.table, "FaceId", face_ids)
+        self.assertEqual(metrics, {"items": 31, "requests": 2, "retries": 0})
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 10)
+
+    def test_batch_get_items(self):
+        """Test that keys are read 100 per BatchGetItem request, projected, and de-duplicated."""
+        batch_write_items(self.table, self.get_items(150))
+        client = self.table.meta.client
+        face_ids = [f"face-{i}" for i in reversed(range(150))] + ["face-0", "face-missing"]
+
+        with patch.object(client, "batch_get_item", wraps=client.batch_get_item) as batch_get_item:
+            items = batch_get_items(self.table, "FaceId", face_ids, attributes=["ExternalImageId"])
+
+        self.assertEqual(batch_get_item.call_count, 2)
+        self.assertEqual(len(items), 150)
+        self.assertNotIn("face-missing", items)
+        self.assertEqual(items["face-42"], {"FaceId": "face-42", "ExternalImageId": "image-42.jpg"})
+
+    def test_batch_get_items_retries_unprocessed(self):
+        """Test that UnprocessedKeys are re-submitted."""
+        batch_write_items(self.table, self.get_items(5))
+        client = self.table.meta.client
+        batch_get_item = client.batch_get_item
+        calls = []
+
+        def throttled_batch_get_item(RequestItems):
+            """Read only the first key of the first request, returning the rest as unprocessed."""
+            calls.append(RequestItems)
+            if len(calls) > 1:
+                return batch_get_item(RequestItems=RequestItems)
+            keys_and_attributes = RequestItems[self.table.name]
+            response = batch_get_item(RequestItems={self.table.name: {"Keys": keys_and_attributes["Keys"][:1]}})
+            response["UnprocessedKeys"] = {
+                self.table.name: {**keys_and_attributes, "Keys": keys_and_attributes["Keys"][1:]}
+            }
+            return response
+
+        with patch.object(client, "batch_get_item", side_effect=throttled_batch_get_item):
+            items = batch_get_items(self.table, "FaceId", [f"face-{i}" for i in range(5)], base_delay=0)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(items.keys()), [f"face-{i}" for i in range(5)])
+
+    def test_batch_get_items_gives_up(self):
+        """Test that keys that are never processed raise an error."""
+        client = self.table.meta.client
+
+        def throttled_batch_get_item(RequestItems):
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+
+        with patch.object(client, "batch_get_item", side_effect=throttled_batch_get_item):
+            with self.assertRaises(RekognitionBatchGetError):
+                batch_get_items(self.table, "FaceId", ["face-0"], max_attempts=3, base_delay=0)
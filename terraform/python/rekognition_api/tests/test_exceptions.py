@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+"""Test exception to HTTP response mapping."""
+
+# python stuff
+import os
+import sys
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.exceptions import (  # noqa: E402
+    EXCEPTION_MAP,
+    RekognitionBadRequestError,
+    RekognitionPayloadTooLargeError,
+)
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+class TestExceptions(MockAWSTestCase):
+    """Test exception to HTTP response mapping."""
+
+    def test_exception_map_matches_rekognition_client(self):
+        """Test that the Rekognition client's modeled exceptions map by error code."""
+        exceptions = self.settings.aws_rekognition_client.exceptions
+        self.assertEqual(EXCEPTION_MAP.get(exceptions.ImageTooLargeException), (406, "ImageTooLargeException"))
+        self.assertEqual(EXCEPTION_MAP[exceptions.AccessDeniedException], (403, "AccessDeniedException"))
+        self.assertIn(exceptions.ThrottlingException, EXCEPTION_MAP)
+
+    def test_exception_map_ignores_other_services(self):
+        """Test that exceptions of other services, or of our own, with Rekognition's error names do not map."""
+
+        class ThrottlingException(Exception):
+            """A local exception named after a Rekognition error."""
+
+        dynamodb_exceptions = self.session.client("dynamodb").exceptions
+        for exception_class in (
+            dynamodb_exceptions.ResourceNotFoundException,
+            dynamodb_exceptions.ProvisionedThroughputExceededException,
+            ThrottlingException,
+        ):
+            self.assertIsNone(EXCEPTION_MAP.get(exception_class), exception_class)
+            self.assertNotIn(exception_class, EXCEPTION_MAP)
+        with self.assertRaises(KeyError):
+            EXCEPTION_MAP[ThrottlingException]  # pylint: disable=pointless-statement
+
+    def test_exception_map_creates_no_client(self):
+        """Test that mapping an error does not create a Rekognition client."""
+        exceptions = self.session.client("rekognition").exceptions
+        self.settings.reset_aws_clients()
+        self.assertIsNone(EXCEPTION_MAP.get(exceptions.ThrottlingException))
+        self.assertEqual(self.settings.aws_client_timings, {})
+
+    def test_exception_map_default(self):
+        """Test that unmapped exceptions fall through to the default."""
+        self.assertIsNone(EXCEPTION_MAP.get(ValueError))
+        self.assertEqual(EXCEPTION_MAP.get(KeyError, (500, "Internal server error")), (500, "Internal server error"))
+        self.assertEqual(EXCEPTION_MAP.get(Exception), (500, "InternalServerError"))
+        self.assertEqual(EXCEPTION_MAP.get(RekognitionBadRequestError), (400, "BadRequest"))
+        self.assertEqual(EXCEPTION_MAP[RekognitionPayloadTooLargeError], (413, "PayloadTooLarge"))
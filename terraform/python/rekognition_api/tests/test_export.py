@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the faceprint table export."""
+
+# python stuff
+import contextlib
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+# 3rd party stuff
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import export  # noqa: E402
+from rekognition_api.dynamodb import batch_write_items  # noqa: E402
+from rekognition_api.export import (  # noqa: E402
+    AdaptivePageSize,
+    deserialize_item,
+    export_table,
+)
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+ROWS_COUNT = 120
+
+
+def get_item(i: int) -> dict:
+    """Return a faceprint, as lambda_index writes it."""
+    return {
+        "FaceId": f"face-{i:04d}",
+        "ImageId": f"image-{i:04d}",
+        "ExternalImageId": f"person_{i}.jpg",
+        "Confidence": Decimal("99.99"),
+        "BoundingBox": {"Width": Decimal("0.25"), "Height": Decimal("0.5"), "Left": Decimal("0.125"), "Top": 0},
+        "bucket": "rekognition-test-bucket",
+        "key": f"person {i}.jpg",
+        "metadata": {"name": f"Person {i}"} if i % 2 else {},
+    }
+
+
+class TestExport(MockAWSTestCase):
+    """Test the faceprint table export."""
+
+    def setUp(self):
+        """Create and fill the faceprint table."""
+        super().setUp()
+        self.table = self.create_faceprint_table()
+        batch_write_items(self.table, [get_item(i) for i in range(ROWS_COUNT)])
+        tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def test_ndjson(self):
+        """Test that every row is exported to gzip NDJSON, with native numbers, and that usage is reported."""
+        path = os.path.join(self.directory, "faceprints.ndjson.gz")
+        metrics = export_table(path, total_segments=4, page_size=10)
+        self.assertEqual(metrics["rows"], ROWS_COUNT)
+        self.assertEqual((metrics["format"], metrics["segments"]), ("ndjson", 4))
+        self.assertGreaterEqual(metrics["pages"], 4)
+        self.assertGreater(metrics["consumedReadCapacityUnits"], 0)
+        self.assertGreater(metrics["rowsPerSecond"], 0)
+        self.assertEqual(metrics["bytes"], os.path.getsize(path))
+
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            rows = {row["FaceId"]: row for row in map(json.loads, file)}
+        self.assertEqual(len(rows), ROWS_COUNT)
+        row = rows["face-0007"]
+        self.assertEqual(row["Confidence"], 99.99)
+        self.assertEqual(row["BoundingBox"], {"Width": 0.25, "Height": 0.5, "Left": 0.125, "Top": 0})
+        self.assertEqual(row["metadata"], {"name": "Person 7"})
+
+    def test_parquet(self):
+        """Test that rows are exported to Parquet with the faceprint schema, in row groups."""
+        path = os.path.join(self.directory, "faceprints.parquet")
+        with patch.object(export, "PARQUET_ROW_GROUP_SIZE", 50):
+            metrics = export_table(path, total_segments=3)
+        self.assertEqual((metrics["rows"], metrics["format"]), (ROWS_COUNT, "parquet"))
+        parquet_file = pq.ParquetFile(path)
+        self.assertGreater(parquet_file.metadata.num_row_groups, 1)
+        rows = {row["FaceId"]: row for row in parquet_file.read().to_pylist()}
+        self.assertEqual(len(rows), ROWS_COUNT)
+        self.assertEqual(rows["face-0007"]["BoundingBox"]["Top"], 0.0)
+        self.assertEqual(rows["face-0007"]["metadata"], [("name", "Person 7")])
+        self.assertEqual(rows["face-0008"]["metadata"], [])
+
+    def test_s3(self):
+        """Test that an s3:// output is uploaded."""
+        s3_client = self.settings.aws_s3_client.meta.client
+        s3_client.create_bucket(Bucket="rekognition-backups")
+        metrics = export_table("s3://rekognition-backups/exports/faceprints.ndjson.gz", total_segments=2)
+        head = s3_client.head_object(Bucket="rekognition-backups", Key="exports/faceprints.ndjson.gz")
+        self.assertEqual(head["ContentLength"], metrics["bytes"])
+
+    def test_throttling(self):
+        """Test that throttling errors are retried with a smaller page size."""
+        client = self.settings.aws_dynamodb_client
+        scan = client.scan
+        limits = []
+
+        def throttled_scan(**kwargs):
+            limits.append(kwargs["Limit"])
+            if len(limits) == 1:
+                raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "Scan")
+            return scan(**kwargs)
+
+        path = os.path.join(self.directory, "faceprints.ndjson.gz")
+        with patch.object(client, "scan", side_effect=throttled_scan):
+            metrics = export_table(path, total_segments=1, page_size=40)
+        self.assertEqual((metrics["rows"], metrics["throttles"]), (ROWS_COUNT, 1))
+        self.assertEqual(limits[:3], [40, 25, 50])
+
+    def test_writer_error(self):
+        """Test that a failing writer stops the segments, and that the error is raised instead of hanging."""
+        path = os.path.join(self.directory, "faceprints.ndjson.gz")
+        writer = export.NdjsonWriter(path)
+        pages = []
+
+        def write(rows):
+            pages.append(rows)
+            if len(pages) == 3:
+                raise OSError("No space left on device")
+
+        with patch.object(writer, "write", side_effect=write):
+            exporter = export.Export(self.table, writer, total_segments=2, page_size=1, max_page_size=1)
+            with self.assertRaises(OSError):
+                exporter.run()
+        self.assertTrue(exporter.stopped.is_set())
+        self.assertEqual(len(pages), 3)
+
+    def test_adaptive_page_size(self):
+        """Test that the page size doubles and halves within its bounds."""
+        page_size = AdaptivePageSize(100, minimum=25, maximum=300)
+        page_size.update(throttled=False)
+        page_size.update(throttled=False)
+        self.assertEqual(page_size.value, 300)
+        for _ in range(5):
+            page_size.update(throttled=True)
+        self.assertEqual(page_size.value, 25)
+
+    def test_deserialize_item(self):
+        """Test that every DynamoDB type is converted to a native type."""
+        item = {
+            "s": {"S": "text"},
+            "int": {"N": "42"},
+            "float": {"N": "1.5E2"},
+            "bool": {"BOOL": True},
+            "null": {"NULL": True},
+            "list": {"L": [{"N": "1"}, {"S": "a"}]},
+            "map": {"M": {"n": {"N": "-0.5"}}},
+            "ss": {"SS": ["a", "b"]},
+            "ns": {"NS": ["1", "2.5"]},
+            "b": {"B": b"\x00\x01"},
+        }
+        self.assertEqual(
+            deserialize_item(item),
+            {
+                "s": "text",
+                "int": 42,
+                "float": 150.0,
+                "bool": True,
+                "null": None,
+                "list": [1, "a"],
+                "map": {"n": -0.5},
+                "ss": ["a", "b"],
+                "ns": [1, 2.5],
+                "b": "AAE=",
+            },
+        )
+
+    def test_main(self):
+        """Test the command line entry point."""
+        path = os.path.join(self.directory, "faceprints.json.gz")
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            export.main([path, "--segments", "2"])
+        self.assertEqual(json.loads(stdout.getvalue())["rows"], ROWS_COUNT)
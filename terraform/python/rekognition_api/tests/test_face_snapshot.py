@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the memory-mapped faceprint snapshot."""
+
+# python stuff
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search  # noqa: E402
+from rekognition_api.face_snapshot import (  # noqa: E402
+    FaceSnapshot,
+    build_snapshot,
+    face_snapshot,
+    get_snapshot_key,
+    list_deltas,
+    map_snapshot,
+    write_delta,
+    write_snapshot,
+)
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+class TestFaceSnapshot(LocalBackendTestCase):
+    """Test the memory-mapped faceprint snapshot."""
+
+    def setUp(self):
+        """Enable the snapshot, in the test bucket."""
+        super().setUp()
+        snapshot_settings = patch.dict(
+            self.settings.__dict__,
+            {
+                "aws_faceprint_snapshot_enabled": True,
+                "pinned_aws_s3_bucket_name": self.bucket_name,
+                "aws_search_cache_ttl": 0,
+            },
+        )
+        snapshot_settings.start()
+        self.addCleanup(snapshot_settings.stop)
+        face_snapshot.clear()
+        self.addCleanup(face_snapshot.clear)
+
+    def test_round_trip(self):
+        """Test that every row is found by binary search, and that misses return None."""
+        rows = {f"face-{i:04d}": f"image_{i}.jpg" for i in range(500)}
+        rows["face-long-id"] = "José_Doe.jpg"
+        file = io.BytesIO()
+        write_snapshot(file, rows, built_at_ms=1234)
+        snapshot = FaceSnapshot(file.getvalue())
+        self.assertEqual(len(snapshot), 501)
+        self.assertEqual(snapshot.built_at_ms, 1234)
+        for face_id, external_image_id in rows.items():
+            self.assertEqual(snapshot.get(face_id), external_image_id)
+        for face_id in ("face-", "face-0000x", "face-9999", "a", "z", "face-long-id-that-is-too-long"):
+            self.assertIsNone(snapshot.get(face_id))
+
+    def test_empty(self):
+        """Test that an empty snapshot is valid."""
+        file = io.BytesIO()
+        write_snapshot(file, {}, built_at_ms=0)
+        self.assertIsNone(FaceSnapshot(file.getvalue()).get("face-0"))
+
+    def test_invalid(self):
+        """Test that a buffer that is not a snapshot is rejected."""
+        with self.assertRaises(ValueError):
+            FaceSnapshot(b"\0" * 64)
+
+    def test_truncated(self):
+        """Test that empty and truncated snapshot files are rejected."""
+        file = io.BytesIO()
+        write_snapshot(file, {"face-1": "Jane_Doe.jpg", "face-2": "John_Doe.jpg"}, built_at_ms=0)
+        body = file.getvalue()
+        for size in (0, 10, len(body) - 20, len(body) - 1):
+            with tempfile.NamedTemporaryFile() as snapshot_file:
+                snapshot_file.write(body[:size])
+                snapshot_file.flush()
+                with self.assertRaises(ValueError, msg=size):
+                    map_snapshot(snapshot_file.name)
+
+    def test_invalid_snapshot_applies_deltas(self):
+        """Test that a truncated snapshot is ignored, and that the deltas are still applied."""
+        self.settings.aws_s3_client.Object(self.bucket_name, get_snapshot_key()).put(Body=b"RKFS\x01\x00")
+        write_delta({"face-1": "Jane_Doe.jpg"})
+        self.assertEqual(face_snapshot.get_many(["face-1", "face-2"]), {"face-1": "Jane_Doe.jpg"})
+        self.assertIsNone(face_snapshot.snapshot)
+
+    def test_one_delta_per_invocation(self):
+        """Test that lambda_index publishes the faces of all of an invocation's records as one delta."""
+        for handler in (lambda_index.lambda_handler, lambda_index.asyncio_lambda_handler):
+            with self.subTest(handler=handler.__name__):
+                face_snapshot.clear()
+                for key, _ in list_deltas():
+                    self.settings.aws_s3_client.Object(self.bucket_name, key).delete()
+                event = self.get_index_event(["Jane_Doe.jpg", "John_Doe.jpg"])
+                event["reindex"] = True
+                body = json.loads(handler(event, None)["body"])
+                self.assertEqual(body["indexedCount"], 2)
+                self.assertEqual(len(list_deltas()), 1)
+                face_ids = [face["Face"]["FaceId"] for record in body["records"] for face in record["FaceRecords"]]
+                self.assertEqual(len(face_snapshot.get_many(face_ids)), body["facesIndexed"])
+
+    def test_build(self):
+        """Test that build_snapshot() publishes the table to S3 and deletes the deltas that it supersedes."""
+        self.table.put_item(Item={"FaceId": "face-1", "ExternalImageId": "Jane_Doe.jpg"})
+        self.table.put_item(Item={"FaceId": "face-2", "ExternalImageId": "John_Doe.jpg"})
+        write_delta({"face-1": "Jane_Doe.jpg"})
+        time.sleep(0.002)
+
+        metrics = build_snapshot(total_segments=4)
+        self.assertEqual(metrics["faces"], 2)
+        self.assertEqual(metrics["deltasDeleted"], 1)
+        self.assertEqual(list_deltas(), [])
+        body = self.settings.aws_s3_client.Object(self.bucket_name, get_snapshot_key()).get()["Body"].read()
+        self.assertEqual(FaceSnapshot(body).get("face-2"), "John_Doe.jpg")
+
+    def test_search_without_dynamodb(self):
+        """Test that lambda_search resolves every match from the snapshot, without DynamoDB reads."""
+        lambda_index.lambda_handler(self.get_index_event(["Jane_Doe.jpg"]), None)
+        build_snapshot()
+        event = self.get_search_event(b"not-a-jpeg")
+        with patch.object(lambda_search, "batch_get_items") as batch_get_items:
+            body = json.loads(lambda_search.lambda_handler(event, None)["body"])
+        batch_get_items.assert_not_called()
+        self.assertEqual(body["matchedFaces"], ["Jane doe"])
+
+    def test_fallback_and_deltas(self):
+        """Test that deltas newer than the snapshot are applied, and that misses fall back to DynamoDB."""
+        lambda_index.lambda_handler(self.get_index_event(["Jane_Doe.jpg"]), None)
+        build_snapshot()
+        time.sleep(0.002)
+        lambda_index.lambda_handler(self.get_index_event(["John_Doe.jpg"]), None)
+        self.assertEqual(len(list_deltas()), 1)
+
+        event = self.get_search_event(b"not-a-jpeg")
+        expected = sorted(["Jane doe", "John doe"])
+        with patch.object(lambda_search, "batch_get_items", wraps=lambda_search.batch_get_items) as batch_get_items:
+            body = json.loads(lambda_search.lambda_handler(event, None)["body"])
+        batch_get_items.assert_not_called()
+        self.assertEqual(sorted(body["matchedFaces"]), expected)
+
+        # a face that is in neither the snapshot nor a delta
+        with patch.dict(self.settings.__dict__, {"aws_faceprint_snapshot_enabled": False}):
+            lambda_index.lambda_handler(self.get_index_event(["Jim_Doe.jpg"]), None)
+        with patch.object(lambda_search, "batch_get_items", wraps=lambda_search.batch_get_items) as batch_get_items:
+            body = json.loads(lambda_search.lambda_handler(event, None)["body"])
+        self.assertEqual(len(batch_get_items.call_args.kwargs["key_values"]), 1)
+        self.assertEqual(sorted(body["matchedFaces"]), sorted(expected + ["Jim doe"]))
+        body = json.loads(lambda_search.asyncio_lambda_handler(event, None)["body"])
+        self.assertEqual(sorted(body["matchedFaces"]), sorted(expected + ["Jim doe"]))
+
+    def test_max_deltas(self):
+        """Test that only the newest aws_faceprint_snapshot_max_deltas deltas are applied, newest last."""
+        for i in range(4):
+            write_delta({f"face-{i}": f"image_{i}.jpg", "face-shared": f"image_{i}.jpg"})
+            time.sleep(0.002)
+        with patch.dict(self.settings.__dict__, {"aws_faceprint_snapshot_max_deltas": 2}):
+            self.assertEqual(
+                face_snapshot.get_many(["face-0", "face-1", "face-2", "face-3", "face-shared"]),
+                {"face-2": "image_2.jpg", "face-3": "image_3.jpg", "face-shared": "image_3.jpg"},
+            )
+
+    def test_missing_snapshot(self):
+        """Test that searches fall back to DynamoDB when no snapshot has been published."""
+        with patch.dict(self.settings.__dict__, {"aws_faceprint_snapshot_enabled": False}):
+            lambda_index.lambda_handler(self.get_index_event(["Jane_Doe.jpg"]), None)
+        body = json.loads(lambda_search.lambda_handler(self.get_search_event(b"not-a-jpeg"), None)["body"])
+        self.assertEqual(body["matchedFaces"], ["Jane doe"])
+
+    def test_index_skips_snapshot_objects(self):
+        """Test that lambda_index does not index the snapshot's own S3 objects."""
+        key = write_delta({"face-1": "Jane_Doe.jpg"})
+        body = json.loads(lambda_index.lambda_handler(self.get_index_event([key]), None)["body"])
+        self.assertEqual(body["skippedCount"], 1)
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 0)
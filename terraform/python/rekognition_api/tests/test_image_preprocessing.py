@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test downscaling and recompression of /search images."""
+
+# python stuff
+import io
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 3rd party stuff
+from PIL import ExifTags, Image, JpegImagePlugin
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_search  # noqa: E402
+from rekognition_api.image_preprocessing import (  # noqa: E402
+    crop_image,
+    preprocess_image,
+)
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+def make_image(
+    size: tuple,
+    image_format: str = "JPEG",
+    orientation: int = None,
+    mode: str = "RGB",
+    quality: int = 95,
+    make: str = "Phone",
+) -> bytes:
+    """Return a noisy image of the given size, with EXIF Make and optionally Orientation tags."""
+    image = Image.effect_noise(size, 64).convert(mode)
+    exif = Image.Exif()
+    if make:
+        exif[ExifTags.Base.Make] = make
+    if orientation:
+        exif[ExifTags.Base.Orientation] = orientation
+    output = io.BytesIO()
+    image.save(output, format=image_format, exif=exif, quality=quality)
+    return output.getvalue()
+
+
+class TestPreprocessImage(unittest.TestCase):
+    """Test preprocess_image()."""
+
+    def test_downscale(self):
+        """Test that a large JPEG is shrunk to max_dimension, re-encoded, and stripped of EXIF."""
+        image_bytes = make_image((4000, 3000))
+        with self.assertLogs("rekognition_api.image_preprocessing", level="INFO") as logs:
+            result = preprocess_image(image_bytes, max_dimension=1000, quality=85)
+        self.assertLess(len(result), len(image_bytes))
+        self.assertIn(f"{len(image_bytes)} bytes in, {len(result)} bytes out, 4000x3000 -> 1000x750", logs.output[0])
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (1000, 750))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_draft(self):
+        """Test that large JPEGs are decoded at reduced scale."""
+        jpeg_image_file = JpegImagePlugin.JpegImageFile
+        with patch.object(jpeg_image_file, "draft", autospec=True, side_effect=jpeg_image_file.draft) as draft:
+            preprocess_image(make_image((4000, 3000)), max_dimension=1000, quality=85)
+        draft.assert_called_once()
+        self.assertEqual(draft.call_args.args[2], (1000, 750))
+
+    def test_orientation(self):
+        """Test that the EXIF orientation is applied before the tag is stripped."""
+        result = preprocess_image(make_image((400, 300), orientation=6), max_dimension=1000, quality=85)
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual(image.size, (300, 400))
+            self.assertNotIn(ExifTags.Base.Orientation, image.getexif())
+
+    def test_png(self):
+        """Test that an RGBA PNG is converted to a JPEG."""
+        result = preprocess_image(make_image((3000, 1500), "PNG", mode="RGBA"), max_dimension=1000, quality=85)
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual((image.format, image.mode, image.size), ("JPEG", "RGB", (1000, 500)))
+
+    def test_small_image_unchanged(self):
+        """Test that a small, upright JPEG without metadata that would not shrink is returned as is."""
+        image_bytes = make_image((400, 300), quality=50, make=None)
+        self.assertIs(preprocess_image(image_bytes, max_dimension=1000, quality=95), image_bytes)
+
+    def test_small_image_metadata_stripped(self):
+        """Test that a JPEG with EXIF metadata is re-encoded without it, even if that does not shrink it."""
+        image_bytes = make_image((400, 300), quality=50)
+        result = preprocess_image(image_bytes, max_dimension=1000, quality=95)
+        self.assertGreater(len(result), len(image_bytes))
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_not_an_image(self):
+        """Test that undecodable bytes are returned as is, for Rekognition to reject."""
+        self.assertEqual(preprocess_image(b"not-a-jpeg", max_dimension=1000, quality=85), b"not-a-jpeg")
+
+
+class TestCropImage(unittest.TestCase):
+    """Test crop_image()."""
+
+    def test_crop(self):
+        """Test that boxes are padded, clipped to the image, and cropped after the EXIF orientation is applied."""
+        image_bytes = make_image((400, 300), orientation=6)
+        boxes = [
+            {"Left": 0.25, "Top": 0.25, "Width": 0.5, "Height": 0.5},
+            {"Left": 0.9, "Top": 0.0, "Width": 0.2, "Height": 0.1},
+            {"Left": 1.5, "Top": 0.0, "Width": 0.1, "Height": 0.1},
+        ]
+        crops = crop_image(image_bytes, boxes, padding=0.1)
+        self.assertEqual(len(crops), 3)
+        sizes = []
+        for crop in crops[:2]:
+            with Image.open(io.BytesIO(crop)) as image:
+                self.assertEqual(image.format, "JPEG")
+                sizes.append(image.size)
+        # the oriented image is 300x400
+        self.assertEqual(sizes, [(180, 240), (36, 44)])
+        self.assertEqual(crops[2], b"")
+
+
+class TestSearchPreprocessing(LocalBackendTestCase):
+    """Test preprocessing in lambda_search."""
+
+    def test_search(self):
+        """Test that lambda_search sends the preprocessed image to Rekognition, when enabled."""
+        event = self.get_search_event(make_image((2000, 1500), quality=50))
+        client = self.settings.aws_rekognition_client
+        settings = {"aws_search_preprocess_enabled": True, "aws_search_preprocess_max_dimension": 800, "debug_mode": False}
+        with patch.dict(self.settings.__dict__, settings):
+            with patch.object(client, "search_faces_by_image", wraps=client.search_faces_by_image) as search:
+                response = lambda_search.lambda_handler(event, None)
+        self.assertEqual(response["statusCode"], 200)
+        self.assertIn("faces", json.loads(response["body"]))
+        with Image.open(io.BytesIO(search.call_args.kwargs["Image"]["Bytes"])) as image:
+            self.assertEqual(image.size, (800, 600))
+
+    def test_disabled(self):
+        """Test that images are sent unchanged when preprocessing is disabled."""
+        image_bytes = make_image((400, 300))
+        self.assertIs(lambda_search.preprocess_search_image({"Bytes": image_bytes})["Bytes"], image_bytes)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+"""
+Test that importing the Lambda entry points is fast and side-effect free.
+
+Each Lambda cold start pays for these imports, so they must not create boto3
+clients, make AWS api calls, or import slow modules that are only needed later.
+The import runs in a fresh interpreter with no AWS credentials, so any api call
+made at import time fails the import outright.
+"""
+
+# python stuff
+import os
+import subprocess  # nosec B404
+import sys
+import tempfile
+import unittest
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# combined self time of all rekognition_api modules, in milliseconds. This
+# excludes 3rd party packages (boto3, pydantic) that we cannot make faster.
+# This is currently 40-60ms, so the default leaves headroom for a loaded
+# machine, but still catches regressions such as parsing terraform.tfvars with
+# hcl2 at import, which costs another 150ms or so.
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("REKOGNITION_IMPORT_TIME_BUDGET_MS", 100))
+LAMBDA_MODULES = ["rekognition_api.lambda_index", "rekognition_api.lambda_search", "rekognition_api.lambda_info"]
+FORBIDDEN_MODULES = ["pkg_resources"]
+
+
+def import_time(modules: list) -> dict:
+    """
+    Import modules in a fresh interpreter with python -X importtime and
+    return {module: (self_us, cumulative_us)}.
+    """
+    with tempfile.TemporaryDirectory() as home:
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": home,
+            "PYTHONPATH": PYTHON_ROOT,
+            "AWS_REGION": "us-east-1",
+            "AWS_CONFIG_FILE": os.path.join(home, "config"),
+            "AWS_SHARED_CREDENTIALS_FILE": os.path.join(home, "credentials"),
+            "AWS_EC2_METADATA_DISABLED": "true",
+        }
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {module}" for module in modules)],
+            capture_output=True,
+            check=False,
+            cwd=home,
+            env=env,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise AssertionError(f"import failed:\n{result.stderr[-4000:]}")
+
+    retval = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        retval[module.strip()] = (int(self_us), int(cumulative_us))
+    return retval
+
+
+class TestImportTime(unittest.TestCase):
+    """Test import time of the Lambda entry points."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.timings = import_time(LAMBDA_MODULES)
+
+    def test_no_forbidden_modules(self):
+        """Test that slow, deferred-only modules are not imported."""
+        for module in FORBIDDEN_MODULES:
+            self.assertNotIn(module, self.timings)
+
+    def test_import_time_budget(self):
+        """Test that our own modules import within budget."""
+        own_us = sum(self_us for module, (self_us, _) in self.timings.items() if module.startswith("rekognition_api"))
+        own_ms = own_us / 1000
+        self.assertLess(
+            own_ms,
+            IMPORT_TIME_BUDGET_MS,
+            f"rekognition_api import self time is {own_ms:.1f}ms, over the {IMPORT_TIME_BUDGET_MS}ms budget",
+        )
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test that lambda_index skips already-indexed S3 objects."""
+
+# python stuff
+import copy
+import json
+import os
+import sys
+import time
+import uuid
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.index_ledger import (  # noqa: E402
+    LEDGER_CLAIM_TIMEOUT,
+    LEDGER_STATUS_INDEXED,
+    LEDGER_STATUS_INDEXING,
+    index_ledger,
+    ledger_key,
+)
+from rekognition_api.lambda_index import lambda_handler  # noqa: E402
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    MockAWSTestCase,
+    get_test_file,
+)
+
+
+LEDGER_TABLE_ID = "rekognition-index-ledger"
+
+
+class TestIndexLedger(MockAWSTestCase):
+    """Test the lambda_index ingest ledger."""
+
+    event_template = get_test_file("json/apigateway_index_lambda_event.json")["event"]
+    response_template = get_test_file("json/apigateway_index_lambda_response.json")["retval"]["body"]
+
+    def setUp(self):
+        """Set up moto-backed S3, the faceprint table and the ledger table."""
+        super().setUp()
+        self.bucket_name = "rekognition-test-bucket"
+        self.settings.aws_s3_client.create_bucket(Bucket=self.bucket_name)
+        self.table = self.create_faceprint_table()
+        self.settings.aws_dynamodb_client.create_table(
+            TableName=LEDGER_TABLE_ID,
+            KeySchema=[{"AttributeName": "LedgerKey", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "LedgerKey", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        self.ledger = self.settings.get_dynamodb_table(LEDGER_TABLE_ID)
+        ledger_settings = patch.dict(self.settings.__dict__, {"aws_index_ledger_table_id": LEDGER_TABLE_ID})
+        ledger_settings.start()
+        self.addCleanup(ledger_settings.stop)
+
+    def index_faces(self, **kwargs):
+        """Stand-in for Rekognition.index_faces(), which moto does not implement."""
+        face_record = copy.deepcopy(self.response_template["FaceRecords"][0])
+        face_record["Face"]["FaceId"] = str(uuid.uuid4())
+        face_record["Face"]["ExternalImageId"] = kwargs["ExternalImageId"]
+        return {"FaceRecords": [face_record], "UnindexedFaces": []}
+
+    def get_event(self, etag: str = "etag-1", **kwargs) -> dict:
+        """Upload an object and return a matching S3 event."""
+        key = "ledger/image.jpg"
+        self.settings.aws_s3_client.Object(self.bucket_name, key).put(Body=b"not-a-jpeg")
+        record = copy.deepcopy(self.event_template["Records"][0])
+        record["s3"]["bucket"]["name"] = self.bucket_name
+        record["s3"]["object"]["key"] = key
+        record["s3"]["object"]["eTag"] = etag
+        return {"Records": [record], **kwargs}
+
+    def invoke(self, event: dict, side_effect=None) -> dict:
+        """Invoke lambda_index and return the response body."""
+        client = self.settings.aws_rekognition_client
+        with patch.object(client, "index_faces", side_effect=side_effect or self.index_faces) as index_faces:
+            response = lambda_handler(event, None)
+        self.index_faces_calls = index_faces.call_count
+        self.status_code = response["statusCode"]
+        return json.loads(response["body"])
+
+    def test_duplicate_is_skipped(self):
+        """Test that a redelivered event does not call Rekognition again."""
+        body = self.invoke(self.get_event())
+        self.assertEqual(self.index_faces_calls, 1)
+        self.assertEqual(body["indexedCount"], 1)
+
+        body = self.invoke(self.get_event())
+        self.assertEqual(self.index_faces_calls, 0)
+        self.assertEqual(self.status_code, 200)
+        self.assertEqual(body["indexedCount"], 0)
+        self.assertEqual(body["skippedCount"], 1)
+        self.assertTrue(body["records"][0]["skipped"])
+        self.assertEqual(len(self.table.scan()["Items"]), 1)
+
+        item = self.ledger.get_item(Key={"LedgerKey": ledger_key(self.bucket_name, "ledger/image.jpg", "etag-1")})
+        self.assertEqual(item["Item"]["Status"], LEDGER_STATUS_INDEXED)
+        self.assertEqual(len(item["Item"]["FaceIds"]), 1)
+
+    def test_new_etag_is_indexed(self):
+        """Test that new content at the same key is indexed."""
+        self.invoke(self.get_event(etag="etag-1"))
+        body = self.invoke(self.get_event(etag="etag-2"))
+        self.assertEqual(self.index_faces_calls, 1)
+        self.assertEqual(body["indexedCount"], 1)
+
+    def test_reindex_override(self):
+        """Test that reindex indexes an already-indexed object."""
+        self.invoke(self.get_event())
+        self.invoke(self.get_event(reindex=True))
+        self.assertEqual(self.index_faces_calls, 1)
+
+        with patch.dict(self.settings.__dict__, {"aws_index_reindex": True}):
+            self.invoke(self.get_event())
+        self.assertEqual(self.index_faces_calls, 1)
+
+    def test_failure_releases_claim(self):
+        """Test that a failed record can be indexed by a retry."""
+        client = self.settings.aws_rekognition_client
+        error = client.exceptions.ProvisionedThroughputExceededException(
+            {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "slow down"}}, "IndexFaces"
+        )
+        body = self.invoke(self.get_event(), side_effect=error)
+        self.assertEqual(body["failedCount"], 1)
+        self.assertEqual(self.ledger.scan()["Count"], 0)
+
+        body = self.invoke(self.get_event())
+        self.assertEqual(self.index_faces_calls, 1)
+        self.assertEqual(body["indexedCount"], 1)
+
+    def test_abandoned_claim(self):
+        """Test that a claim that was never completed can be re-claimed once it is stale."""
+        self.assertTrue(index_ledger.claim(self.bucket_name, "image.jpg", "etag-1"))
+        self.assertFalse(index_ledger.claim(self.bucket_name, "image.jpg", "etag-1"))
+        item = self.ledger.get_item(Key={"LedgerKey": ledger_key(self.bucket_name, "image.jpg", "etag-1")})["Item"]
+        self.assertEqual(item["Status"], LEDGER_STATUS_INDEXING)
+
+        with patch("rekognition_api.index_ledger.time.time", return_value=time.time() + LEDGER_CLAIM_TIMEOUT + 1):
+            self.assertTrue(index_ledger.claim(self.bucket_name, "image.jpg", "etag-1"))
+
+    def test_ledger_disabled(self):
+        """Test that every record is indexed when no ledger table is configured."""
+        with patch.dict(self.settings.__dict__, {"aws_index_ledger_table_id": None}):
+            self.invoke(self.get_event())
+            self.invoke(self.get_event())
+        self.assertEqual(self.index_faces_calls, 1)
+        self.assertEqual(self.ledger.scan()["Count"], 0)
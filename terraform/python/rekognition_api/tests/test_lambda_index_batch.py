@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test lambda_index batch processing against moto-backed S3 and DynamoDB."""
+
+# python stuff
+import copy
+import json
+import os
+import sys
+import uuid
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.lambda_index import lambda_handler  # noqa: E402
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    MockAWSTestCase,
+    get_test_file,
+)
+
+
+RECORD_COUNT = 50
+FACES_PER_IMAGE = 3
+
+
+class TestLambdaIndexBatch(MockAWSTestCase):
+    """Test lambda_index batch processing."""
+
+    event_template = get_test_file("json/apigateway_index_lambda_event.json")["event"]
+    response_template = get_test_file("json/apigateway_index_lambda_response.json")["retval"]["body"]
+
+    def setUp(self):
+        """Set up moto-backed S3 and DynamoDB."""
+        super().setUp()
+        self.bucket_name = "rekognition-test-bucket"
+        self.settings.aws_s3_client.create_bucket(Bucket=self.bucket_name)
+        self.table = self.create_faceprint_table()
+
+    def index_faces(self, **kwargs):
+        """Stand-in for Rekognition.index_faces(), which moto does not implement."""
+        face_record = self.response_template["FaceRecords"][0]
+        face_records = []
+        for _ in range(FACES_PER_IMAGE):
+            face_record = copy.deepcopy(face_record)
+            face_record["Face"]["FaceId"] = str(uuid.uuid4())
+            face_record["Face"]["ExternalImageId"] = kwargs["ExternalImageId"]
+            face_records.append(face_record)
+        return {"FaceRecords": face_records, "UnindexedFaces": []}
+
+    def get_event(self, record_count: int) -> dict:
+        """Upload record_count objects and return a matching multi-record S3 event."""
+        template = self.event_template["Records"][0]
+        records = []
+        for i in range(record_count):
+            key = f"batch/image {i}.jpg"
+            self.settings.aws_s3_client.Object(self.bucket_name, key).put(Body=b"not-a-jpeg", Metadata={"index": str(i)})
+            record = copy.deepcopy(template)
+            record["s3"]["bucket"]["name"] = self.bucket_name
+            record["s3"]["object"]["key"] = key.replace(" ", "+")
+            records.append(record)
+        return {"Records": records}
+
+    def test_batch_indexes_every_record(self):
+        """Test that every record of a 50-record event is indexed and persisted."""
+        event = self.get_event(RECORD_COUNT)
+        with patch.object(self.settings.aws_rekognition_client, "index_faces", side_effect=self.index_faces):
+            response = lambda_handler(event, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(body["recordCount"], RECORD_COUNT)
+        self.assertEqual(body["indexedCount"], RECORD_COUNT)
+        self.assertEqual(body["failedCount"], 0)
+        self.assertEqual(body["facesIndexed"], RECORD_COUNT * FACES_PER_IMAGE)
+        self.assertEqual([record["key"] for record in body["records"]], [f"batch/image {i}.jpg" for i in range(50)])
+        for record in body["records"]:
+            self.assertEqual(record["facesIndexed"], FACES_PER_IMAGE)
+            self.assertIsNone(record["error"])
+            self.assertGreaterEqual(record["latencyMs"], 0)
+
+        items = self.table.scan()["Items"]
+        self.assertEqual(len(items), RECORD_COUNT * FACES_PER_IMAGE)
+        item = next(item for item in items if item["key"] == "batch/image 7.jpg")
+        self.assertEqual(item["bucket"], self.bucket_name)
+        self.assertEqual(item["metadata"], {"index": "7"})
+
+    def test_batch_reports_per_record_errors(self):
+        """Test that a failing record is reported without dropping the rest of the batch."""
+        event = self.get_event(5)
+        event["Records"][2]["s3"]["object"]["key"] = "does-not-exist.jpg"
+        with patch.object(self.settings.aws_rekognition_client, "index_faces", side_effect=self.index_faces):
+            response = lambda_handler(event, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(body["indexedCount"], 4)
+        self.assertEqual(body["failedCount"], 1)
+        self.assertEqual(body["records"][2]["key"], "does-not-exist.jpg")
+        self.assertIsNotNone(body["records"][2]["error"])
+        self.assertEqual(body["records"][2]["facesIndexed"], 0)
+        self.assertEqual(len(self.table.scan()["Items"]), 4 * FACES_PER_IMAGE)
+
+    def test_one_head_request_per_record(self):
+        """Test that object metadata costs at most one HEAD per record, and none when no faces are found."""
+        event = self.get_event(4)
+        s3_client = self.settings.aws_s3_client.meta.client
+
+        def index_faces(**kwargs):
+            if kwargs["ExternalImageId"] == "batch/image 0.jpg":
+                return {"FaceRecords": [], "UnindexedFaces": []}
+            return self.index_faces(**kwargs)
+
+        with patch.object(self.settings.aws_rekognition_client, "index_faces", side_effect=index_faces):
+            with patch.object(s3_client, "head_object", wraps=s3_client.head_object) as head_object:
+                body = json.loads(lambda_handler(event, None)["body"])
+
+        self.assertEqual(head_object.call_count, 3)
+        self.assertEqual(body["records"][1]["size"], event["Records"][1]["s3"]["object"]["size"])
+        self.assertEqual(body["records"][1]["eTag"], event["Records"][1]["s3"]["object"]["eTag"])
+
+    def test_skip_metadata(self):
+        """Test that metadata fetching can be switched off entirely."""
+        event = self.get_event(2)
+        s3_client = self.settings.aws_s3_client.meta.client
+        with patch.object(self.settings.aws_rekognition_client, "index_faces", side_effect=self.index_faces):
+            with patch.object(s3_client, "head_object", wraps=s3_client.head_object) as head_object:
+                with patch.dict(self.settings.__dict__, {"aws_s3_fetch_object_metadata": False}):
+                    lambda_handler(event, None)
+
+        self.assertEqual(head_object.call_count, 0)
+        self.assertTrue(all(item["metadata"] == {} for item in self.table.scan()["Items"]))
@@ -3,10 +3,13 @@
 """Test Search Lambda function."""
 
 # python stuff
+import base64
+import json
 import logging
 import os
 import sys
 import unittest
+from unittest.mock import patch
 
 
 logger = logging.getLogger(__file__)
@@ -17,8 +20,20 @@ if PYTHON_ROOT not in sys.path:
 
 # our stuff
 from rekognition_api.conf import settings  # noqa: E402
-from rekognition_api.lambda_search import get_faces, get_image_from_event  # noqa: E402
+from rekognition_api.exceptions import (  # noqa: E402
+    RekognitionBadRequestError,
+    RekognitionPayloadTooLargeError,
+)
+from rekognition_api.lambda_search import (  # noqa: E402
+    get_body_bytes,
+    get_faces,
+    get_image_from_event,
+    get_matched_faces,
+    lambda_handler,
+)
 from rekognition_api.tests.test_setup import (  # noqa: E402
+    LocalBackendTestCase,
+    MockAWSTestCase,
     get_test_file,
     get_test_image,
     pack_image_data,
@@ -62,3 +77,124 @@ class TestLambdaIndex(unittest.TestCase):
         # faces = get_faces(self.image_packed)
         logger.debug("Not implemented")
         assert True
+
+
+class TestGetMatchedFaces(MockAWSTestCase):
+    """Test get_matched_faces against a moto-backed DynamoDB table."""
+
+    response = get_test_file("json/apigateway_search_lambda_response.json")
+
+    def setUp(self):
+        """Index a distinct ExternalImageId for each FaceMatch, in reverse order."""
+        super().setUp()
+        self.table = self.create_faceprint_table()
+        self.face_matches = self.response["faces"]["FaceMatches"]
+        for i, face_match in reversed(list(enumerate(self.face_matches))):
+            self.table.put_item(
+                Item={"FaceId": face_match["Face"]["FaceId"], "ExternalImageId": f"Person_{i}.jpg", "key": "x"}
+            )
+
+    def test_get_matched_faces(self):
+        """Test that matches are resolved in one BatchGetItem and keep Rekognition's ordering."""
+        client = self.settings.dynamodb_table.meta.client
+        with patch.object(client, "batch_get_item", wraps=client.batch_get_item) as batch_get_item:
+            matched_faces = get_matched_faces(self.response["faces"])
+
+        self.assertEqual(batch_get_item.call_count, 1)
+        self.assertEqual(matched_faces, [f"Person {i}" for i in range(len(self.face_matches))])
+
+    def test_get_matched_faces_skips_unindexed(self):
+        """Test that FaceMatches without a DynamoDB item are skipped."""
+        self.table.delete_item(Key={"FaceId": self.face_matches[1]["Face"]["FaceId"]})
+        matched_faces = get_matched_faces(self.response["faces"])
+        self.assertEqual(matched_faces, [f"Person {i}" for i in range(len(self.face_matches)) if i != 1])
+
+    def test_get_matched_faces_no_matches(self):
+        """Test that an empty FaceMatches list does not call DynamoDB."""
+        self.assertEqual(get_matched_faces({"FaceMatches": []}), [])
+
+
+class TestGetImageFromEvent(unittest.TestCase):
+    """Test decoding of raw binary, legacy base64 and multipart/form-data request bodies."""
+
+    image = get_test_image(filename="Keanu-Reeves.jpg")
+
+    def get_event(self, body: bytes, headers: dict = None, is_base64_encoded: bool = True) -> dict:
+        """Return an API Gateway event for the body, base64 encoded as API Gateway does for binary media types."""
+        return {
+            "headers": headers or {},
+            "body": base64.b64encode(body).decode("ascii"),
+            "isBase64Encoded": is_base64_encoded,
+        }
+
+    def get_multipart_body(self, boundary: str) -> bytes:
+        """Return a multipart/form-data body with a text field followed by the image."""
+        return (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="note"\r\n\r\n'
+            f"not an image\r\n--{boundary}\r\n"
+            'Content-Disposition: form-data; name="image"; filename="Keanu-Reeves.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode("latin-1") + self.image + f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+    def test_binary(self):
+        """Test that a raw binary body is decoded to the image bytes."""
+        event = self.get_event(self.image, {"Content-Type": "image/jpeg", "Content-Length": str(len(self.image))})
+        self.assertEqual(get_image_from_event(event), {"Bytes": self.image})
+
+    def test_legacy_base64_text(self):
+        """Test that base64 text sent without isBase64Encoded is still decoded."""
+        event = self.get_event(self.image, {"Content-Type": "text/plain"}, is_base64_encoded=False)
+        self.assertEqual(get_image_from_event(event)["Bytes"], self.image)
+
+    def test_legacy_base64_text_strict(self):
+        """Test that a body sent without isBase64Encoded that is not base64 text is a bad request."""
+        wrapped = base64.encodebytes(self.image).decode("ascii")
+        self.assertEqual(get_body_bytes({"body": wrapped, "isBase64Encoded": False}), self.image)
+        for body in ("not base64!", self.get_multipart_body("xyz").decode("latin-1")):
+            with self.assertRaises(RekognitionBadRequestError):
+                get_body_bytes({"body": body, "isBase64Encoded": False})
+
+    def test_multipart(self):
+        """Test that the first file part of a multipart/form-data body is extracted."""
+        boundary = "----WebKitFormBoundary7MA4YWxkTrZu0gW"
+        headers = {"content-type": f'multipart/form-data; boundary="{boundary}"'}
+        event = self.get_event(self.get_multipart_body(boundary), headers)
+        self.assertEqual(get_image_from_event(event)["Bytes"], self.image)
+
+    def test_multipart_without_image(self):
+        """Test that a multipart/form-data body without a file part is a bad request."""
+        body = b'--xyz\r\nContent-Disposition: form-data; name="note"\r\n\r\nhello\r\n--xyz--\r\n'
+        event = self.get_event(body, {"Content-Type": "multipart/form-data; boundary=xyz"})
+        with self.assertRaises(RekognitionBadRequestError):
+            get_image_from_event(event)
+
+    def test_empty_body(self):
+        """Test that an empty body is a bad request."""
+        with self.assertRaises(RekognitionBadRequestError):
+            get_image_from_event({"headers": {}, "body": None})
+
+    def test_payload_too_large(self):
+        """Test that oversized bodies are rejected from Content-Length, or from the body size, before decoding."""
+        with patch.dict(settings.__dict__, {"aws_search_max_payload_bytes": len(self.image) - 1}):
+            with patch("rekognition_api.lambda_search.get_body_bytes") as get_body_bytes:
+                with self.assertRaises(RekognitionPayloadTooLargeError):
+                    get_image_from_event(self.get_event(self.image, {"CONTENT-LENGTH": str(len(self.image))}))
+                with self.assertRaises(RekognitionPayloadTooLargeError):
+                    get_image_from_event(self.get_event(self.image))
+            get_body_bytes.assert_not_called()
+
+
+class TestSearchPayloadErrors(LocalBackendTestCase):
+    """Test the HTTP responses to requests that cannot be searched."""
+
+    def test_status_codes(self):
+        """Test that oversized bodies return 413, and undecodable bodies 400."""
+        with patch.dict(self.settings.__dict__, {"aws_search_max_payload_bytes": 8}):
+            response = lambda_handler(self.get_search_event(b"0123456789abcdef"), None)
+        self.assertEqual(response["statusCode"], 413)
+        self.assertIn("byte limit", json.loads(response["body"])["error"])
+
+        event = self.get_search_event(b"not-a-jpeg")
+        event["headers"] = {"Content-Type": "multipart/form-data; boundary=xyz"}
+        self.assertEqual(lambda_handler(event, None)["statusCode"], 400)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the in-memory Rekognition stand-in, end to end through both Lambda handlers."""
+
+# python stuff
+import json
+import os
+import sys
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.lambda_index import lambda_handler as index_handler  # noqa: E402
+from rekognition_api.lambda_search import lambda_handler as search_handler  # noqa: E402
+from rekognition_api.local_rekognition import LocalRekognitionClient  # noqa: E402
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+class TestLocalRekognition(LocalBackendTestCase):
+    """Test the in-memory Rekognition stand-in."""
+
+    def test_settings_backend(self):
+        """Test that settings hands out one cached stand-in, without touching aws_session."""
+        with patch.object(self.session, "client") as session_client:
+            client = self.settings.aws_rekognition_client
+            self.assertIsInstance(client, LocalRekognitionClient)
+            self.assertIs(self.settings.aws_rekognition_client, client)
+        session_client.assert_not_called()
+        self.assertIn("rekognition.local", self.settings.aws_client_timings)
+
+    def test_index_then_search(self):
+        """Test that faces indexed by lambda_index are found by lambda_search."""
+        with patch.dict(self.settings.__dict__, {"aws_rekognition_local_faces_count": 2}):
+            response = index_handler(self.get_index_event(["Jane_Doe.jpg", "John_Doe.jpg"]), None)
+        body = json.loads(response["body"])
+        self.assertEqual(body["facesIndexed"], 4)
+        self.assertEqual(len(self.table.scan()["Items"]), 4)
+
+        response = search_handler(self.get_search_event(b"not-a-jpeg"), None)
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(len(body["faces"]["FaceMatches"]), 4)
+        self.assertEqual(sorted(body["matchedFaces"]), ["Jane doe", "Jane doe", "John doe", "John doe"])
+
+    def test_deterministic(self):
+        """Test that FaceIds and search results depend only on their inputs."""
+        first = LocalRekognitionClient(faces_count=3)
+        second = LocalRekognitionClient(faces_count=3)
+        for client in (first, second):
+            for name in ("a.jpg", "b.jpg"):
+                client.index_faces(CollectionId="test", Image={}, ExternalImageId=name)
+
+        def face_ids(response):
+            return [face["Face"]["FaceId"] for face in response["FaceMatches"]]
+
+        search = {"CollectionId": "test", "Image": {"Bytes": b"image"}, "MaxFaces": 4}
+        self.assertEqual(face_ids(first.search_faces_by_image(**search)), face_ids(second.search_faces_by_image(**search)))
+        self.assertEqual(len(face_ids(first.search_faces_by_image(**search))), 4)
+
+    def test_no_faces(self):
+        """Test that an image without faces raises InvalidParameterException, like Rekognition does."""
+        client = LocalRekognitionClient(faces_count=0)
+        with self.assertRaises(client.exceptions.InvalidParameterException):
+            client.index_faces(CollectionId="test", Image={}, ExternalImageId="empty.jpg")
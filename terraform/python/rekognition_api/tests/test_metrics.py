@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the per-stage latency metrics of the Lambda handlers."""
+
+# python stuff
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search, metrics  # noqa: E402
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    LocalBackendTestCase,
+    get_test_image,
+)
+
+
+# per-stage overhead of timed(), in microseconds, within an invocation
+STAGE_OVERHEAD_BUDGET_US = float(os.environ.get("REKOGNITION_STAGE_OVERHEAD_BUDGET_US", 50))
+
+
+def get_emf_lines(stdout: str) -> list:
+    """Return the EMF documents that were written to stdout."""
+    return [json.loads(line) for line in stdout.splitlines() if line.startswith('{"_aws"')]
+
+
+class TestMetrics(LocalBackendTestCase):
+    """Test the EMF lines and Server-Timing headers of the Lambda handlers."""
+
+    def setUp(self):
+        """Index one image with two faces."""
+        super().setUp()
+        test_settings = patch.dict(
+            self.settings.__dict__,
+            {"aws_rekognition_local_faces_count": 2, "aws_search_cache_ttl": 0, "debug_mode": False},
+        )
+        test_settings.start()
+        self.addCleanup(test_settings.stop)
+        lambda_index.lambda_handler(self.get_index_event(["Keanu_Reeves.jpg"]), None)
+
+    def invoke(self, handler, event) -> tuple:
+        """Invoke handler, and return its response and its EMF document."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            response = handler(event, None)
+        lines = get_emf_lines(stdout.getvalue())
+        self.assertEqual(len(lines), 1)
+        self.assertIsNone(metrics.current())
+        return response, lines[0]
+
+    def assert_emf(self, document: dict, stages: list, counts: dict) -> None:
+        """Assert that document is valid EMF, with a duration for each stage, and counts."""
+        directive = document["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(directive["Namespace"], self.settings.aws_metrics_namespace)
+        self.assertEqual(directive["Dimensions"], [["FunctionName"]])
+        units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+        for name in ["latency"] + stages:
+            self.assertEqual(units[name], "Milliseconds")
+            self.assertGreaterEqual(document[name], 0)
+        for name, value in counts.items():
+            self.assertEqual(units[name], "Count")
+            self.assertEqual(document[name], value)
+        # every metric has a value in the document
+        self.assertTrue(set(units).issubset(document))
+
+    def test_search(self):
+        """Test that a search reports its stages and face counts, and returns a Server-Timing header."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        with patch.dict(self.settings.__dict__, {"aws_metrics_server_timing_enabled": True}):
+            response, document = self.invoke(lambda_search.lambda_handler, event)
+        self.assertEqual(response["statusCode"], 200)
+        self.assert_emf(
+            document,
+            stages=["get_image_from_event", "preprocess_search_image", "get_faces", "get_matched_faces"],
+            counts={"faceMatches": 2, "matchedFaces": 2, "coldStart": 0},
+        )
+        self.assertEqual((document["FunctionName"], document["statusCode"]), ("lambda_search", 200))
+        self.assertEqual(document["searchCache"], "BYPASS")
+        server_timing = response["headers"]["Server-Timing"]
+        self.assertIn("get_faces;dur=", server_timing)
+        self.assertRegex(server_timing, r"total;dur=\d+\.\d$")
+
+    def test_search_async(self):
+        """Test that the async handler reports the same stages."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        response, document = self.invoke(lambda_search.asyncio_lambda_handler, event)
+        self.assertNotIn("Server-Timing", response["headers"])
+        self.assert_emf(document, stages=["get_faces", "get_matched_faces"], counts={"matchedFaces": 2})
+
+    def test_index(self):
+        """Test that the stages of every record are summed, and that records and faces are counted."""
+        event = self.get_index_event(["Avril_Lavigne.jpg", "Mike_Myers.jpg", "snapshots/faceprints/delta.json"])
+        _response, document = self.invoke(lambda_index.lambda_handler, event)
+        self.assert_emf(
+            document,
+            stages=["unpack_s3_object", "get_faces", "persist_faceprints"],
+            counts={"records": 3, "recordsSkipped": 1, "recordsFailed": 0, "facesIndexed": 4},
+        )
+        self.assertEqual(document["FunctionName"], "lambda_index")
+
+    def test_cold_start(self):
+        """Test that only the first invocation of a container is a cold start."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        with patch.object(metrics, "_cold_start", True):
+            _response, first = self.invoke(lambda_search.lambda_handler, event)
+            _response, second = self.invoke(lambda_search.lambda_handler, event)
+        self.assertEqual((first["coldStart"], second["coldStart"]), (1, 0))
+
+    def test_disabled(self):
+        """Test that nothing is written when metrics are disabled."""
+        stdout = io.StringIO()
+        with patch.dict(self.settings.__dict__, {"aws_metrics_enabled": False}), contextlib.redirect_stdout(stdout):
+            lambda_search.lambda_handler(self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg")), None)
+        self.assertEqual(get_emf_lines(stdout.getvalue()), [])
+
+
+class TestStageOverhead(unittest.TestCase):
+    """Test that timing a stage is cheap."""
+
+    def test_overhead(self):
+        """Test the per-call overhead of timed(), within and outside of an invocation."""
+        calls = 20000
+
+        def noop():
+            return None
+
+        timed_noop = metrics.timed("noop")(noop)
+
+        def elapsed_us(func) -> float:
+            start = time.perf_counter()
+            for _ in range(calls):
+                func()
+            return (time.perf_counter() - start) * 1e6
+
+        baseline = elapsed_us(noop)
+        outside = elapsed_us(timed_noop)
+        with patch.object(metrics, "_cold_start", False):
+            invocation = metrics.start_invocation("test_overhead")
+            try:
+                inside = elapsed_us(timed_noop)
+            finally:
+                metrics._current = None  # pylint: disable=protected-access
+        self.assertLess((outside - baseline) / calls, STAGE_OVERHEAD_BUDGET_US)
+        self.assertLess((inside - baseline) / calls, STAGE_OVERHEAD_BUDGET_US)
+        self.assertEqual(list(invocation.stages), ["noop"])
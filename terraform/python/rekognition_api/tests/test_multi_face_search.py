@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test multi-face and region of interest searches."""
+
+# python stuff
+import io
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# 3rd party stuff
+from PIL import Image
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search  # noqa: E402
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    LocalBackendTestCase,
+    get_test_image,
+)
+
+
+FACES_COUNT = 3
+
+
+class TestMultiFaceSearch(LocalBackendTestCase):
+    """Test multi-face and region of interest searches."""
+
+    image = get_test_image("Keanu-Avril-Mike.jpg")
+
+    def setUp(self):
+        """Index FACES_COUNT faces for each of three images, and detect FACES_COUNT faces in every image."""
+        super().setUp()
+        search_settings = patch.dict(
+            self.settings.__dict__,
+            {"aws_rekognition_local_faces_count": FACES_COUNT, "aws_search_cache_ttl": 0, "debug_mode": False},
+        )
+        search_settings.start()
+        self.addCleanup(search_settings.stop)
+        lambda_index.lambda_handler(self.get_index_event(["Keanu_Reeves.jpg", "Avril_Lavigne.jpg", "Mike_Myers.jpg"]), None)
+        self.client = self.settings.aws_rekognition_client
+
+    def get_event(self, **params) -> dict:
+        """Return a /search event for the test image, with query string params."""
+        event = self.get_search_event(self.image)
+        event["queryStringParameters"] = params
+        return event
+
+    def test_search_all_faces(self):
+        """Test that every detected face is cropped and searched, with one deduplicated DynamoDB lookup."""
+        with patch.object(self.client, "detect_faces", wraps=self.client.detect_faces) as detect_faces, patch.object(
+            self.client, "search_faces_by_image", wraps=self.client.search_faces_by_image
+        ) as search_faces_by_image, patch.object(
+            lambda_search, "batch_get_items", wraps=lambda_search.batch_get_items
+        ) as batch_get_items:
+            response = lambda_search.lambda_handler(self.get_event(faces="all"), None)
+
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(detect_faces.call_count, 1)
+        self.assertEqual(search_faces_by_image.call_count, FACES_COUNT)
+        self.assertEqual(batch_get_items.call_count, 1)
+        face_ids = batch_get_items.call_args.kwargs["key_values"]
+        self.assertEqual(len(face_ids), len(set(face_ids)))
+
+        self.assertEqual(len(body["searchedFaces"]), FACES_COUNT)
+        areas = [face["BoundingBox"]["Width"] * face["BoundingBox"]["Height"] for face in body["searchedFaces"]]
+        self.assertEqual(areas, sorted(areas, reverse=True))
+        for face in body["searchedFaces"]:
+            self.assertEqual(len(face["matchedFaces"]), len(face["FaceMatches"]))
+        self.assertEqual(sorted(body["matchedFaces"]), ["Avril lavigne", "Keanu reeves", "Mike myers"])
+
+        # each face is searched in its own crop
+        for call in search_faces_by_image.call_args_list:
+            with Image.open(io.BytesIO(call.kwargs["Image"]["Bytes"])) as crop:
+                self.assertLess(crop.width, 1924)
+
+    def test_async(self):
+        """Test that the asyncio handler returns the same multi-face results."""
+        expected = json.loads(lambda_search.lambda_handler(self.get_event(faces="all"), None)["body"])
+        body = json.loads(lambda_search.asyncio_lambda_handler(self.get_event(faces="all"), None)["body"])
+        self.assertEqual(body, expected)
+
+    def test_region_of_interest(self):
+        """Test that only the region of interest is searched."""
+        with patch.object(self.client, "search_faces_by_image", wraps=self.client.search_faces_by_image) as search:
+            response = lambda_search.lambda_handler(self.get_event(roi="0.5,0,0.5,0.5"), None)
+        self.assertEqual(response["statusCode"], 200)
+        self.assertIn("faces", json.loads(response["body"]))
+        with Image.open(io.BytesIO(search.call_args.kwargs["Image"]["Bytes"])) as crop:
+            self.assertEqual(crop.size, (962, 516))
+
+    def test_invalid_options(self):
+        """Test that invalid search options are bad requests."""
+        for params in (
+            {"faces": "some"},
+            {"roi": "0,0,1"},
+            {"roi": "0,0,2,1"},
+            {"roi": "a,b,c,d"},
+            {"faces": "all", "roi": "0,0,0.5,0.5"},
+        ):
+            response = lambda_search.lambda_handler(self.get_event(**params), None)
+            self.assertEqual(response["statusCode"], 400, params)
+
+    def test_region_of_interest_errors(self):
+        """Test that roi searches of undecodable images, or of less than a pixel, are bad requests."""
+        event = self.get_search_event(b"not-a-jpeg")
+        event["queryStringParameters"] = {"roi": "0,0,0.5,0.5"}
+        self.assertEqual(lambda_search.lambda_handler(event, None)["statusCode"], 400)
+        response = lambda_search.lambda_handler(self.get_event(roi="0.5,0,0.0001,0.5"), None)
+        self.assertEqual(response["statusCode"], 400)
+
+    def test_region_of_interest_without_faces(self):
+        """Test that a roi without faces returns an empty result, from both handlers."""
+        error = self.client.exceptions.InvalidParameterException(
+            {"Error": {"Code": "InvalidParameterException", "Message": "no faces"}}, "SearchFacesByImage"
+        )
+        for handler in (lambda_search.lambda_handler, lambda_search.asyncio_lambda_handler):
+            with patch.object(self.client, "search_faces_by_image", side_effect=error):
+                response = handler(self.get_event(roi="0,0,0.1,0.1"), None)
+            self.assertEqual(response["statusCode"], 200)
+            self.assertEqual(json.loads(response["body"]), {"faces": {"FaceMatches": []}, "matchedFaces": []})
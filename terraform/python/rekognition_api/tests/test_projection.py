@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the projection and compression of /search and /index responses."""
+
+# python stuff
+import base64
+import gzip
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, lambda_search, utils  # noqa: E402
+from rekognition_api.exceptions import RekognitionBadRequestError  # noqa: E402
+from rekognition_api.projection import get_projection  # noqa: E402
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    LocalBackendTestCase,
+    get_test_image,
+)
+from rekognition_api.utils import (  # noqa: E402
+    get_content_encoding,
+    http_response_factory,
+)
+
+
+FACES_COUNT = 3
+
+
+def get_body(response: dict) -> dict:
+    """Return the decoded, and decompressed, body of a response."""
+    if not response["isBase64Encoded"]:
+        return json.loads(response["body"])
+    return json.loads(gzip.decompress(base64.b64decode(response["body"])))
+
+
+class TestProjection(LocalBackendTestCase):
+    """Test the view and fields request options."""
+
+    def setUp(self):
+        """Index FACES_COUNT faces of one image."""
+        super().setUp()
+        test_settings = patch.dict(
+            self.settings.__dict__,
+            {"aws_rekognition_local_faces_count": FACES_COUNT, "aws_search_cache_ttl": 0, "debug_mode": False},
+        )
+        test_settings.start()
+        self.addCleanup(test_settings.stop)
+        lambda_index.lambda_handler(self.get_index_event(["Keanu_Reeves.jpg"]), None)
+
+    def search(self, **params) -> dict:
+        """Return the /search response body for the test image, with query string params."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        event["queryStringParameters"] = params
+        response = lambda_search.lambda_handler(event, None)
+        self.assertEqual(response["statusCode"], 200, response["body"])
+        return get_body(response)
+
+    def test_search_compact(self):
+        """Test that the compact view keeps the matched faces' ids and similarities only."""
+        full = self.search()
+        compact = self.search(view="compact")
+        self.assertEqual(compact["matchedFaces"], full["matchedFaces"])
+        self.assertEqual(len(compact["faces"]["FaceMatches"]), FACES_COUNT)
+        match = compact["faces"]["FaceMatches"][0]
+        self.assertEqual(set(match), {"Similarity", "Face"})
+        self.assertEqual(set(match["Face"]), {"FaceId", "ExternalImageId"})
+        self.assertNotIn("ResponseMetadata", compact["faces"])
+        self.assertLess(len(json.dumps(compact)), len(json.dumps(full)))
+
+    def test_search_all_faces_compact(self):
+        """Test that the FaceMatches of every searched face are compacted."""
+        compact = self.search(view="compact", faces="all")
+        self.assertEqual(len(compact["searchedFaces"]), FACES_COUNT)
+        for face in compact["searchedFaces"]:
+            self.assertIn("BoundingBox", face)
+            for match in face["FaceMatches"]:
+                self.assertEqual(set(match["Face"]), {"FaceId", "ExternalImageId"})
+
+    def test_search_fields(self):
+        """Test that fields returns the listed top level keys only."""
+        self.assertEqual(list(self.search(fields="matchedFaces,unknown")), ["matchedFaces"])
+
+    def test_invalid_view(self):
+        """Test that an unknown view is a bad request."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        event["queryStringParameters"] = {"view": "tiny"}
+        self.assertEqual(lambda_search.lambda_handler(event, None)["statusCode"], 400)
+        with self.assertRaises(RekognitionBadRequestError):
+            get_projection({"view": "tiny"})
+
+    def test_index_compact(self):
+        """Test that the compact view of /index replaces FaceRecords with FaceIds."""
+        event = self.get_index_event(["Avril_Lavigne.jpg"])
+        event["view"] = "compact"
+        event["fields"] = ["facesIndexed", "records"]
+        body = get_body(lambda_index.lambda_handler(event, None))
+        self.assertEqual(list(body), ["facesIndexed", "records"])
+        record = body["records"][0]
+        self.assertNotIn("FaceRecords", record)
+        self.assertEqual(len(record["faceIds"]), FACES_COUNT)
+        self.assertEqual(record["key"], "Avril_Lavigne.jpg")
+
+    def test_search_gzip(self):
+        """Test that large responses are gzip compressed for clients that accept it."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        event["headers"] = {"accept-encoding": "gzip, deflate"}
+        response = lambda_search.lambda_handler(event, None)
+        self.assertTrue(response["isBase64Encoded"])
+        self.assertEqual(response["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(response["headers"]["Vary"], "Accept-Encoding")
+        self.assertEqual(len(get_body(response)["matchedFaces"]), FACES_COUNT)
+
+        with patch.dict(self.settings.__dict__, {"aws_response_compression_enabled": False}):
+            self.assertFalse(lambda_search.lambda_handler(event, None)["isBase64Encoded"])
+
+    def test_search_vary(self):
+        """Test that every search response varies by Accept-Encoding while compression is enabled."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        response = lambda_search.lambda_handler(event, None)
+        self.assertFalse(response["isBase64Encoded"])
+        self.assertEqual(response["headers"]["Vary"], "Accept-Encoding")
+
+        with patch.dict(self.settings.__dict__, {"aws_response_compression_enabled": False}):
+            self.assertNotIn("Vary", lambda_search.lambda_handler(event, None)["headers"])
+
+
+class TestCompression(unittest.TestCase):
+    """Test the compression of http_response_factory()."""
+
+    def test_content_encoding(self):
+        """Test that Accept-Encoding is negotiated, with q-values and wildcards."""
+        with patch.object(utils, "brotli_module", return_value=None):
+            self.assertEqual(get_content_encoding("gzip, deflate, br"), "gzip")
+            self.assertEqual(get_content_encoding("*"), "gzip")
+            self.assertIsNone(get_content_encoding("gzip;q=0, deflate"))
+            self.assertIsNone(get_content_encoding("identity"))
+            self.assertIsNone(get_content_encoding(""))
+        with patch.object(utils, "brotli_module", return_value=object()):
+            self.assertEqual(get_content_encoding("gzip, br"), "br")
+            self.assertEqual(get_content_encoding("gzip, br;q=0"), "gzip")
+
+    def test_min_bytes(self):
+        """Test that small bodies are not compressed."""
+        body = {"matchedFaces": ["Keanu reeves"] * 200}
+        small = http_response_factory(200, {"matchedFaces": []}, accept_encoding="gzip")
+        self.assertFalse(small["isBase64Encoded"])
+        self.assertEqual(small["headers"]["Vary"], "Accept-Encoding")
+        self.assertNotIn("Vary", http_response_factory(200, body)["headers"])
+        large = http_response_factory(200, body, accept_encoding="gzip")
+        self.assertEqual(get_body(large), body)
+        self.assertLess(len(large["body"]), len(json.dumps(body)))
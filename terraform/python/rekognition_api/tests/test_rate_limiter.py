@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the Rekognition rate limiter."""
+
+# python stuff
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.local_rekognition import LocalRekognitionClient  # noqa: E402
+from rekognition_api.rate_limiter import (  # noqa: E402
+    AdaptiveTokenBucket,
+    RateLimitedClient,
+)
+from rekognition_api.tests.test_setup import MockAWSTestCase  # noqa: E402
+
+
+class Clock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdaptiveTokenBucket(unittest.TestCase):
+    """Test AdaptiveTokenBucket."""
+
+    def test_pacing(self):
+        """Test that a burst of one second's tokens is free, and that later tokens are paced at rate."""
+        clock = Clock()
+        bucket = AdaptiveTokenBucket(10, clock=clock)
+        self.assertEqual([bucket.reserve() for _ in range(10)], [0.0] * 10)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+        clock.now = 1.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_aimd(self):
+        """Test that throttles halve the rate once per interval, and that successes add it back."""
+        clock = Clock()
+        bucket = AdaptiveTokenBucket(40, min_rate=5, clock=clock)
+        bucket.on_throttle()
+        bucket.on_throttle()
+        self.assertEqual((bucket.rate, bucket.throttles), (20, 2))
+        for now in (1.0, 2.0, 3.0):
+            clock.now = now
+            bucket.on_throttle()
+        self.assertEqual(bucket.rate, 5)
+        for _ in range(100):
+            bucket.on_success()
+        self.assertGreater(bucket.rate, 14)
+        for _ in range(10000):
+            bucket.on_success()
+        self.assertEqual(bucket.rate, 40)
+
+
+class TestRateLimitedClient(unittest.TestCase):
+    """Test RateLimitedClient, around the local Rekognition stand-in."""
+
+    def setUp(self):
+        """Wrap a local client, with no backoff delay."""
+        self.local_client = LocalRekognitionClient()
+        self.client = RateLimitedClient(self.local_client, {"IndexFaces": 1000}, max_attempts=4, base_delay=0)
+        self.image = {"S3Object": {"Bucket": "bucket", "Name": "image.jpg"}}
+
+    def throttling(self, code: str = "ThrottlingException"):
+        """Return a Rekognition throttling error."""
+        return getattr(self.local_client.exceptions, code)({"Error": {"Code": code, "Message": "slow down"}}, "IndexFaces")
+
+    def test_passthrough(self):
+        """Test that calls and attributes reach the wrapped client."""
+        response = self.client.index_faces(CollectionId="faces", Image=self.image, ExternalImageId="image.jpg")
+        self.assertEqual(len(response["FaceRecords"]), 1)
+        self.assertIs(self.client.exceptions, self.local_client.exceptions)
+
+    def test_retries_throttling(self):
+        """Test that throttled calls are retried, and slow the operation's bucket down."""
+        errors = [self.throttling(), self.throttling("ProvisionedThroughputExceededException")]
+        index_faces = self.local_client.index_faces
+
+        def throttled_index_faces(**kwargs):
+            if errors:
+                raise errors.pop(0)
+            return index_faces(**kwargs)
+
+        with patch.object(self.local_client, "index_faces", side_effect=throttled_index_faces) as mock:
+            response = self.client.index_faces(CollectionId="faces", Image=self.image, ExternalImageId="image.jpg")
+        self.assertEqual(len(response["FaceRecords"]), 1)
+        self.assertEqual((mock.call_count, self.client.retries), (3, 2))
+        bucket = self.client.buckets["IndexFaces"]
+        self.assertEqual(bucket.throttles, 2)
+        self.assertLess(bucket.rate, 1000)
+
+    def test_gives_up(self):
+        """Test that the throttling error is raised after max_attempts."""
+        with patch.object(self.local_client, "index_faces", side_effect=self.throttling()) as mock:
+            with self.assertRaises(self.local_client.exceptions.ThrottlingException):
+                self.client.index_faces(CollectionId="faces", Image=self.image)
+        self.assertEqual(mock.call_count, 4)
+
+    def test_other_errors_are_not_retried(self):
+        """Test that errors other than throttling and transient errors are raised at once."""
+        with patch.object(self.local_client, "search_faces_by_image", wraps=self.local_client.search_faces_by_image):
+            with self.assertRaises(self.local_client.exceptions.InvalidParameterException):
+                self.client.search_faces_by_image(CollectionId="faces", Image={"Bytes": b""})
+            self.assertEqual(self.local_client.search_faces_by_image.call_count, 1)
+
+    def test_threads(self):
+        """Test that one client paces the calls of many threads to its budget."""
+        client = RateLimitedClient(self.local_client, {"IndexFaces": 50}, base_delay=0)
+
+        def index(i: int):
+            return client.index_faces(CollectionId="faces", Image=self.image, ExternalImageId=f"image_{i}.jpg")
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(index, range(75)))
+        # the first 50 calls are the burst, the other 25 take half a second at 50 TPS
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+        self.assertEqual(len(responses), 75)
+
+
+class TestSettingsRateLimitedClient(MockAWSTestCase):
+    """Test the rate limited client of Settings."""
+
+    def test_rate_limited(self):
+        """Test that the boto3 client is wrapped once, with botocore retries disabled."""
+        client = self.settings.aws_rekognition_client
+        self.assertIsInstance(client, RateLimitedClient)
+        self.assertIs(self.settings.aws_rekognition_client, client)
+        self.assertEqual(client.client.meta.config.retries["total_max_attempts"], 1)
+        self.assertEqual(
+            {operation: bucket.max_rate for operation, bucket in client.buckets.items()},
+            {"IndexFaces": 50, "SearchFacesByImage": 50},
+        )
+
+    def test_disabled(self):
+        """Test that the plain boto3 client is returned when rate limiting is disabled."""
+        with patch.dict(self.settings.__dict__, {"aws_rekognition_rate_limit_enabled": False}):
+            client = self.settings.aws_rekognition_client
+        self.assertNotIsInstance(client, RateLimitedClient)
+        self.assertIn("index_faces", dir(client))
+
+    def test_retries_do_not_stack(self):
+        """Test that the rate limited and the plain clients are cached apart, with their own retry configs."""
+        with patch.dict(self.settings.__dict__, {"aws_rekognition_rate_limit_enabled": False}):
+            client = self.settings.aws_rekognition_client
+        rate_limited_client = self.settings.aws_rekognition_client
+        self.assertIsNot(rate_limited_client.client, client)
+        self.assertEqual(rate_limited_client.client.meta.config.retries["total_max_attempts"], 1)
+        self.assertEqual(
+            client.meta.config.retries["total_max_attempts"],
+            self.settings.get_connection_profile("rekognition")["max_attempts"],
+        )
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the reconciliation of the Rekognition collection with the faceprint table."""
+
+# python stuff
+import contextlib
+import io
+import json
+import os
+import sys
+import uuid
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_index, reconcile  # noqa: E402
+from rekognition_api.reconcile import face_id_from_key, face_id_key  # noqa: E402
+from rekognition_api.tests.test_setup import LocalBackendTestCase  # noqa: E402
+
+
+FACES_COUNT = 2
+
+
+class TestReconcile(LocalBackendTestCase):
+    """Test the reconciliation of the Rekognition collection with the faceprint table."""
+
+    def setUp(self):
+        """
+        Index three images, then create an orphan face whose image exists, two
+        orphan faces whose image is gone, and two orphan rows.
+        """
+        super().setUp()
+        index_settings = patch.dict(
+            self.settings.__dict__,
+            {
+                "aws_rekognition_local_faces_count": FACES_COUNT,
+                "pinned_aws_s3_bucket_name": self.bucket_name,
+                "debug_mode": False,
+            },
+        )
+        index_settings.start()
+        self.addCleanup(index_settings.stop)
+        lambda_index.lambda_handler(self.get_index_event(["Keanu_Reeves.jpg", "Avril_Lavigne.jpg", "Mike Myers.jpg"]), None)
+        self.client = self.settings.aws_rekognition_client
+
+        self.items = {item["FaceId"]: item for item in self.table.scan()["Items"]}
+        self.assertEqual(len(self.items), 6)
+        self.lost_row = next(item for item in self.items.values() if item["key"] == "Mike Myers.jpg")
+        self.table.delete_item(Key={"FaceId": self.lost_row["FaceId"]})
+        self.client.index_faces(
+            CollectionId=self.settings.aws_rekognition_collection_id,
+            Image={"S3Object": {"Bucket": self.bucket_name, "Name": "gone.jpg"}},
+            ExternalImageId="gone.jpg",
+        )
+        self.orphan_rows = [str(uuid.uuid4()), "legacy-face"]
+        for face_id in self.orphan_rows:
+            self.table.put_item(Item={"FaceId": face_id, "key": "deleted.jpg"})
+
+    def test_report(self):
+        """Test that orphans are counted, and nothing is changed, without repair."""
+        metrics = reconcile.reconcile(total_segments=4)
+        self.assertEqual(metrics["tableRows"], 7)
+        self.assertEqual(metrics["collectionFaces"], 8)
+        self.assertEqual(metrics["matched"], 5)
+        self.assertEqual(metrics["orphanFaces"], 3)
+        self.assertEqual(metrics["orphanRows"], 2)
+        self.assertEqual((metrics["rowsRebuilt"], metrics["facesDeleted"], metrics["rowsDeleted"]), (0, 0, 0))
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 7)
+
+    def test_repair(self):
+        """Test that rows are rebuilt for images that exist, and that the other orphans are deleted."""
+        metrics = reconcile.reconcile(repair=True, total_segments=4)
+        self.assertEqual((metrics["rowsRebuilt"], metrics["facesDeleted"], metrics["rowsDeleted"]), (1, 2, 2))
+        self.assertEqual(self.table.get_item(Key={"FaceId": self.lost_row["FaceId"]})["Item"], self.lost_row)
+
+        metrics = reconcile.reconcile(total_segments=4)
+        self.assertEqual((metrics["tableRows"], metrics["collectionFaces"], metrics["matched"]), (6, 6, 6))
+        self.assertEqual((metrics["orphanFaces"], metrics["orphanRows"]), (0, 0))
+
+    def test_pages(self):
+        """Test that the collection is listed a page at a time."""
+        with patch.object(self.client, "list_faces", wraps=self.client.list_faces) as list_faces:
+            metrics = reconcile.reconcile(page_size=3)
+        self.assertEqual(list_faces.call_count, 3)
+        self.assertEqual((metrics["collectionFaces"], metrics["orphanFaces"], metrics["orphanRows"]), (8, 3, 2))
+
+    def test_empty_collection(self):
+        """Test that rows are not deleted when the collection is empty."""
+        with patch.dict(self.settings.__dict__, {"aws_rekognition_collection_id": "empty-collection"}):
+            metrics = reconcile.reconcile(repair=True)
+        self.assertEqual((metrics["orphanRows"], metrics["rowsDeleted"]), (7, 0))
+        self.assertEqual(self.table.scan(Select="COUNT")["Count"], 7)
+
+    def test_face_id_key(self):
+        """Test that canonical uuids are held as 16 bytes, and that other FaceIds are held as is."""
+        face_id = str(uuid.uuid4())
+        self.assertEqual(len(face_id_key(face_id)), 16)
+        for value in (face_id, face_id.upper(), "legacy-face"):
+            self.assertEqual(face_id_from_key(face_id_key(value)), value)
+
+    def test_main(self):
+        """Test the command line entry point."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            reconcile.main(["--segments", "2"])
+        self.assertEqual(json.loads(stdout.getvalue())["orphanFaces"], 3)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the lambda_search result cache."""
+
+# python stuff
+import base64
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api.lambda_search import lambda_handler  # noqa: E402
+from rekognition_api.search_cache import (  # noqa: E402
+    LRUCache,
+    search_cache,
+    search_cache_key,
+)
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    MockAWSTestCase,
+    get_test_file,
+)
+
+
+SEARCH_CACHE_TABLE_ID = "rekognition-search-cache"
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the in-process cache tier."""
+
+    def test_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expiry(self):
+        """Test that entries expire after ttl seconds."""
+        cache = LRUCache(max_size=2, ttl=60)
+        with patch("rekognition_api.search_cache.time.monotonic", return_value=1000.0):
+            cache.put("a", 1)
+        with patch("rekognition_api.search_cache.time.monotonic", return_value=1059.0):
+            self.assertEqual(cache.get("a"), 1)
+        with patch("rekognition_api.search_cache.time.monotonic", return_value=1060.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_search_cache_key(self):
+        """Test that the key depends on both the image bytes and the search parameters."""
+        key = search_cache_key(b"image", threshold=10, max_faces=10)
+        self.assertEqual(key, search_cache_key(b"image", max_faces=10, threshold=10))
+        self.assertNotEqual(key, search_cache_key(b"image", threshold=20, max_faces=10))
+        self.assertNotEqual(key, search_cache_key(b"other", threshold=10, max_faces=10))
+
+
+class TestLambdaSearchCache(MockAWSTestCase):
+    """Test that lambda_search serves repeated searches from the cache."""
+
+    response = get_test_file("json/apigateway_search_lambda_response.json")
+
+    def setUp(self):
+        """Index the mock FaceMatches, and start each test with an empty cache."""
+        super().setUp()
+        self.table = self.create_faceprint_table()
+        for face_match in self.response["faces"]["FaceMatches"]:
+            self.table.put_item(Item={"FaceId": face_match["Face"]["FaceId"], "ExternalImageId": "Keanu_Reeves.jpg"})
+        search_cache.clear()
+        self.addCleanup(search_cache.clear)
+        self.event = {"body": base64.b64encode(b"not-a-jpeg").decode("ascii")}
+
+    def search(self, event=None) -> dict:
+        """Invoke lambda_search with a stand-in for search_faces_by_image(), which moto does not implement."""
+        client = self.settings.aws_rekognition_client
+        with patch.object(client, "search_faces_by_image", return_value=self.response["faces"]) as search:
+            response = lambda_handler(event or self.event, None)
+        self.search_calls = search.call_count
+        return response
+
+    def test_memory_tier(self):
+        """Test that a repeated image skips Rekognition and DynamoDB."""
+        first = self.search()
+        self.assertEqual(first["headers"]["X-Search-Cache"], "MISS")
+        self.assertEqual(self.search_calls, 1)
+
+        client = self.settings.dynamodb_table.meta.client
+        with patch.object(client, "batch_get_item") as batch_get_item:
+            second = self.search()
+        self.assertEqual(self.search_calls, 0)
+        batch_get_item.assert_not_called()
+        self.assertEqual(second["headers"]["X-Search-Cache"], "HIT")
+        self.assertEqual(second["headers"]["X-Search-Cache-Tier"], "memory")
+        self.assertEqual(json.loads(second["body"]), json.loads(first["body"]))
+
+    def test_different_image_misses(self):
+        """Test that a different image is not served from the cache."""
+        self.search()
+        response = self.search({"body": base64.b64encode(b"another-image").decode("ascii")})
+        self.assertEqual(response["headers"]["X-Search-Cache"], "MISS")
+        self.assertEqual(self.search_calls, 1)
+
+    def test_dynamodb_tier(self):
+        """Test that results are shared between containers through the DynamoDB tier."""
+        self.settings.aws_dynamodb_client.create_table(
+            TableName=SEARCH_CACHE_TABLE_ID,
+            KeySchema=[{"AttributeName": "CacheKey", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "CacheKey", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        with patch.dict(self.settings.__dict__, {"aws_search_cache_table_id": SEARCH_CACHE_TABLE_ID}):
+            first = self.search()
+            # a new container starts with an empty memory tier
+            search_cache.clear()
+            second = self.search()
+
+        self.assertEqual(self.search_calls, 0)
+        self.assertEqual(second["headers"]["X-Search-Cache-Tier"], "dynamodb")
+        self.assertEqual(json.loads(second["body"]), json.loads(first["body"]))
+        items = self.settings.get_dynamodb_table(SEARCH_CACHE_TABLE_ID).scan()["Items"]
+        self.assertEqual(len(items), 1)
+        self.assertIn("ExpiresAt", items[0])
+
+    def test_cache_disabled(self):
+        """Test that a ttl of 0 bypasses the cache."""
+        with patch.dict(self.settings.__dict__, {"aws_search_cache_ttl": 0}):
+            self.search()
+            response = self.search()
+        self.assertEqual(self.search_calls, 1)
+        self.assertEqual(response["headers"]["X-Search-Cache"], "BYPASS")
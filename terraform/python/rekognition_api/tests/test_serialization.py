@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test the JSON and Decimal conversion of DynamoDB items and HTTP responses."""
+
+# python stuff
+import datetime
+import json
+import os
+import sys
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import serialization  # noqa: E402
+from rekognition_api.serialization import dumps, to_decimal  # noqa: E402
+from rekognition_api.tests.test_setup import get_test_file  # noqa: E402
+from rekognition_api.utils import DateTimeEncoder  # noqa: E402
+
+
+class TestSerialization(unittest.TestCase):
+    """Test the JSON and Decimal conversion of DynamoDB items and HTTP responses."""
+
+    def setUp(self):
+        """Load the sample faceprints and search response."""
+        self.face_records = get_test_file("json/apigateway_index_lambda_response.json")["retval"]["body"]["FaceRecords"]
+        self.search_response = get_test_file("json/rekognition_search_output.json")
+
+    def test_to_decimal(self):
+        """Test that to_decimal() returns what the json round trip that it replaces returns."""
+        for face in self.face_records:
+            expected = json.loads(json.dumps(face), parse_float=Decimal)
+            converted = to_decimal(face)
+            self.assertEqual(converted, expected)
+            self.assertIsInstance(converted["Face"]["Confidence"], Decimal)
+            self.assertEqual(str(converted["Face"]["Confidence"]), str(expected["Face"]["Confidence"]))
+        self.assertEqual(to_decimal({"a": (1, 0.1, True, None)}), {"a": [1, Decimal("0.1"), True, None]})
+
+    def test_dumps(self):
+        """Test that dumps() returns the same json as the stdlib, with and without orjson."""
+        for module in (serialization.orjson, None):
+            with patch.object(serialization, "orjson", module):
+                for value in (self.search_response, self.face_records):
+                    self.assertEqual(json.loads(dumps(value)), json.loads(json.dumps(value, cls=DateTimeEncoder)))
+
+    def test_dumps_types(self):
+        """Test that datetimes are formatted as DateTimeEncoder does, and that Decimals are numbers."""
+        value = {
+            "created": datetime.datetime(2023, 9, 1, 12, 30),
+            "count": Decimal("3"),
+            "confidence": Decimal("99.5"),
+            "big": 2**70,
+        }
+        for module in (serialization.orjson, None):
+            with patch.object(serialization, "orjson", module):
+                self.assertEqual(
+                    json.loads(dumps(value)),
+                    {"created": "2023-09-01", "count": 3, "confidence": 99.5, "big": 2**70},
+                )
+                with self.assertRaises(TypeError):
+                    dumps({"value": object()})
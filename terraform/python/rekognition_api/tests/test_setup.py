@@ -5,9 +5,16 @@
 import base64
 
 # python stuff
+import copy
 import json
 import os
 import sys
+import unittest
+from unittest.mock import patch
+
+# 3rd party stuff
+import boto3
+from moto import mock_aws
 
 
 HERE = os.path.abspath(os.path.dirname(__file__))
@@ -15,6 +22,14 @@ PYTHON_ROOT = os.path.dirname(HERE)
 if PYTHON_ROOT not in sys.path:
     sys.path.append(PYTHON_ROOT)  # noqa: E402
 
+MOCK_AWS_REGION = "us-east-1"
+MOCK_AWS_ENVIRON = {
+    "AWS_DEFAULT_REGION": MOCK_AWS_REGION,
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+}
+SETTINGS_PRIVATE_ATTRS = ("_aws_session", "_aws_clients", "_aws_client_timings", "_cached_values", "_dump")
+
 
 def noop():
     """Test to ensure that test suite setup works and that lambda_handler is importable."""
@@ -50,3 +65,88 @@ def pack_image_data(filename: str):
     #     }
     # },
     return {"Bytes": image_decoded}
+
+
+class MockAWSTestCase(unittest.TestCase):
+    """
+    Base class for tests that run against moto. Starts moto, and points the
+    settings singleton at a moto-backed boto3 session for the duration of
+    each test.
+    """
+
+    def setUp(self):
+        """Start moto and swap in a moto-backed aws_session."""
+        # pylint: disable=import-outside-toplevel
+        from rekognition_api.conf import settings
+
+        self.settings = settings
+        self.environ = patch.dict(os.environ, MOCK_AWS_ENVIRON)
+        self.environ.start()
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+
+        self.saved_settings = {attr: getattr(settings, attr) for attr in SETTINGS_PRIVATE_ATTRS}
+        settings._aws_clients = {}
+        settings._aws_client_timings = {}
+        settings._cached_values = {}
+        settings._dump = None
+        self.session = boto3.Session(region_name=MOCK_AWS_REGION)
+        settings._aws_session = self.session
+
+    def tearDown(self):
+        """Restore the settings session and clients, and stop moto."""
+        for attr, value in self.saved_settings.items():
+            setattr(self.settings, attr, value)
+        self.mock_aws.stop()
+        self.environ.stop()
+
+    def create_faceprint_table(self, table_name: str = None):
+        """Create the faceprint table, and return it as a Table resource."""
+        table_name = table_name or self.settings.aws_dynamodb_table_id
+        return self.session.resource("dynamodb").create_table(
+            TableName=table_name,
+            KeySchema=[{"AttributeName": "FaceId", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "FaceId", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+
+class LocalBackendTestCase(MockAWSTestCase):
+    """
+    Base class for offline end-to-end tests and benchmarks: moto for S3 and
+    DynamoDB, and the in-memory Rekognition stand-in (see local_rekognition.py).
+    Rekognition latency and face counts come from settings, ie from
+    AWS_REKOGNITION_LOCAL_LATENCY_MS and AWS_REKOGNITION_LOCAL_FACES_COUNT.
+    """
+
+    bucket_name = "rekognition-test-bucket"
+
+    def setUp(self):
+        """Switch to the local Rekognition backend, and create the bucket and faceprint table."""
+        super().setUp()
+        # pylint: disable=import-outside-toplevel
+        from rekognition_api.search_cache import search_cache
+
+        local_backend = patch.dict(self.settings.__dict__, {"aws_rekognition_backend": "local"})
+        local_backend.start()
+        self.addCleanup(local_backend.stop)
+        search_cache.clear()
+        self.addCleanup(search_cache.clear)
+        self.settings.aws_s3_client.create_bucket(Bucket=self.bucket_name)
+        self.table = self.create_faceprint_table()
+
+    def get_index_event(self, keys: list) -> dict:
+        """Upload an object for each key, and return a matching S3 ObjectCreated:Put event."""
+        template = get_test_file("json/apigateway_index_lambda_event.json")["event"]["Records"][0]
+        records = []
+        for key in keys:
+            self.settings.aws_s3_client.Object(self.bucket_name, key).put(Body=b"not-a-jpeg")
+            record = copy.deepcopy(template)
+            record["s3"]["bucket"]["name"] = self.bucket_name
+            record["s3"]["object"]["key"] = key
+            records.append(record)
+        return {"Records": records}
+
+    def get_search_event(self, image: bytes) -> dict:
+        """Return an API Gateway /search event for the image."""
+        return {"body": base64.b64encode(image).decode("ascii")}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+# pylint: disable=R0801
+"""Test sampled, structured debug_mode logging."""
+
+# python stuff
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PYTHON_ROOT = os.path.dirname(os.path.dirname(HERE))
+if PYTHON_ROOT not in sys.path:
+    sys.path.append(PYTHON_ROOT)  # noqa: E402
+
+# our stuff
+from rekognition_api import lambda_search, structured_logging, utils  # noqa: E402
+from rekognition_api.structured_logging import (  # noqa: E402
+    LOG_MAX_LIST_ITEMS,
+    log,
+    log_invocation,
+    truncate,
+)
+from rekognition_api.tests.test_setup import (  # noqa: E402
+    LocalBackendTestCase,
+    get_test_image,
+)
+from rekognition_api.utils import http_response_factory  # noqa: E402
+
+
+def get_entries(stdout: str) -> list:
+    """Return the structured log entries that were written to stdout."""
+    return [json.loads(line) for line in stdout.splitlines() if line.startswith('{"log"')]
+
+
+class TestStructuredLogging(LocalBackendTestCase):
+    """Test sampled, structured debug_mode logging."""
+
+    def setUp(self):
+        """Turn debug_mode on, with every invocation sampled, as if the container were new."""
+        super().setUp()
+        patches = [
+            patch.dict(self.settings.__dict__, {"debug_mode": True, "debug_log_sample_percent": 100}),
+            patch.object(structured_logging, "_settings_logged", False),
+            patch.object(structured_logging, "_sampled", False),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def capture(self, func, *args) -> list:
+        """Call func, and return the log entries that it wrote."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            func(*args)
+        return get_entries(stdout.getvalue())
+
+    def test_truncate(self):
+        """Test that long strings and lists are cut, and that bodies and credentials are redacted."""
+        value = {
+            "body": "A" * 10000,
+            "headers": {"Authorization": "secret", "Content-Type": "image/jpeg"},
+            "key": "x" * 20,
+            "bytes": b"\x00" * 3,
+            "list": list(range(LOG_MAX_LIST_ITEMS + 5)),
+        }
+        self.assertEqual(
+            truncate(value, max_length=8),
+            {
+                "body": "<redacted 10000>",
+                "headers": {"Authorization": "<redacted 6>", "Content-Type": "image/jp...<2 more>"},
+                "key": "xxxxxxxx...<12 more>",
+                "bytes": "<3 bytes>",
+                "list": list(range(LOG_MAX_LIST_ITEMS)) + ["...<5 more>"],
+            },
+        )
+
+    def test_search_event(self):
+        """Test that the settings and the event are logged, without the image body."""
+        event = self.get_search_event(get_test_image("Keanu-Avril-Mike.jpg"))
+        entries = self.capture(lambda_search.lambda_handler, event, None)
+        self.assertEqual([entry["log"] for entry in entries], ["settings", "event"])
+        self.assertIn("environment", entries[0])
+        self.assertTrue(entries[1]["event"]["body"].startswith("<redacted "))
+        self.assertNotIn(event["body"][:100], json.dumps(entries))
+
+    def test_settings_logged_once(self):
+        """Test that the settings dump is logged on the first invocation of the container only."""
+        entries = self.capture(log_invocation, {"n": 1}) + self.capture(log_invocation, {"n": 2})
+        self.assertEqual([entry["log"] for entry in entries], ["settings", "event", "event"])
+
+    def test_sampling(self):
+        """Test that entries are logged for the sampled percent of invocations only."""
+        with patch.object(structured_logging.random, "random", return_value=0.5):
+            with patch.dict(self.settings.__dict__, {"debug_log_sample_percent": 40}):
+                self.assertFalse(structured_logging.start_invocation())
+            with patch.dict(self.settings.__dict__, {"debug_log_sample_percent": 60}):
+                self.assertTrue(structured_logging.start_invocation())
+            with patch.dict(self.settings.__dict__, {"debug_mode": False}):
+                self.assertFalse(structured_logging.start_invocation())
+
+    def test_deferred(self):
+        """Test that callable fields are only called when the entry is logged."""
+        fields = MagicMock(return_value={"a": 1})
+        with patch.dict(self.settings.__dict__, {"debug_log_sample_percent": 0}):
+            self.capture(log_invocation, {})
+            self.assertEqual(self.capture(log, "test", fields), [])
+        fields.assert_not_called()
+        self.capture(log_invocation, {})
+        self.assertEqual(self.capture(log, "test", fields), [{"log": "test", "a": 1}])
+        fields.assert_called_once()
+
+    def test_serialization(self):
+        """Test that datetimes are formatted as DateTimeEncoder does, and other types with str()."""
+        self.capture(log_invocation, {})
+        fields = {"created": datetime.datetime(2023, 9, 1, 12, 30), "amount": Decimal("1.5")}
+        self.assertEqual(self.capture(log, "test", fields), [{"log": "test", "created": "2023-09-01", "amount": "1.5"}])
+
+    def test_response_serialized_once(self):
+        """Test that http_response_factory() serializes the body once, and prints nothing."""
+        stdout = io.StringIO()
+        with patch.object(utils, "dumps", wraps=utils.dumps) as dumps, contextlib.redirect_stdout(stdout):
+            response = http_response_factory(status_code=200, body={"matchedFaces": []})
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(json.loads(response["body"]), {"matchedFaces": []})
+        dumps.assert_called_once_with({"matchedFaces": []})
@@ -1,9 +1,22 @@
 # -*- coding: utf-8 -*-
 """Common functions for Lambda functions"""
+import base64
 import datetime
+import gzip
 import json
 import sys
 import traceback
+from typing import Optional
+from urllib.parse import urlparse
+
+from rekognition_api.exceptions import RekognitionValueError
+from rekognition_api.serialization import dumps
+
+
+# response bodies smaller than this are not worth compressing
+COMPRESSION_MIN_BYTES = 1024
+GZIP_COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 5
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -16,48 +29,101 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(o)
 
 
-def cloudwatch_handler(
-    event,
-    dump,
-    debug_mode: bool = False,
-    quiet: bool = False,
-):
-    """Create a CloudWatch log entry for the event and dump the event to stdout."""
-    if debug_mode and not quiet:
-        print(json.dumps(dump, cls=DateTimeEncoder))
-        print(json.dumps({"event": event}, cls=DateTimeEncoder))
+def parse_s3_uri(uri: str) -> tuple:
+    """return the (bucket, key) of an s3://bucket/key uri"""
+    parsed = urlparse(uri)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise RekognitionValueError(f"not an s3:// uri: {uri}")
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+def brotli_module():
+    """return the brotli module, or None if it is not installed"""
+    try:
+        import brotli  # pylint: disable=import-outside-toplevel
 
+        return brotli
+    except ImportError:
+        return None
 
-def http_response_factory(status_code: int, body: json, debug_mode: bool = False) -> json:
+
+def get_content_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    return the encoding, br or gzip, to compress a response with for a request's
+    Accept-Encoding header, or None. br is only chosen if brotli is installed.
+    see https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Accept-Encoding
+    """
+    weights = {}
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip().lower()] = weight
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli_module() is None:
+            continue
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """compress data with encoding, br or gzip"""
+    if encoding == "br":
+        return brotli_module().compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def http_response_factory(
+    status_code: int,
+    body: json,
+    headers: dict = None,
+    accept_encoding: str = None,
+    compression_min_bytes: int = COMPRESSION_MIN_BYTES,
+) -> json:
     """
     Generate a standardized JSON return dictionary for all possible response scenarios.
 
     status_code: an HTTP response code. see https://developer.mozilla.org/en-US/docs/Web/HTTP/Status
     body: a JSON dict of Rekognition results for status 200, an error dict otherwise.
+    headers: optional additional HTTP response headers.
+    accept_encoding: the request's Accept-Encoding header, "" if it has none,
+        or None to disable compression. Bodies of at least compression_min_bytes
+        are compressed with gzip or br, and returned base64 encoded, which API
+        Gateway decodes since every media type is binary. Unless compression is
+        disabled, every response varies by Accept-Encoding, compressed or not,
+        so that caches do not serve one client's encoding to another.
 
     see https://docs.aws.amazon.com/lambda/latest/dg/python-handler.html
     """
     if status_code < 100 or status_code > 599:
         raise ValueError(f"Invalid HTTP response code received: {status_code}")
 
-    if debug_mode:
-        retval = {
-            "isBase64Encoded": False,
-            "statusCode": status_code,
-            "headers": {"Content-Type": "application/json"},
-            "body": body,
-        }
-        # log our output to the CloudWatch log for this Lambda
-        print(json.dumps({"retval": retval}, cls=DateTimeEncoder))
-
     # see https://docs.aws.amazon.com/apigateway/latest/developerguide/http-api-develop-integrations-lambda.html
     retval = {
         "isBase64Encoded": False,
         "statusCode": status_code,
-        "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(body, cls=DateTimeEncoder),
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": dumps(body),
     }
 
+    if accept_encoding is not None:
+        retval["headers"]["Vary"] = "Accept-Encoding"
+    if accept_encoding and len(retval["body"]) >= compression_min_bytes:
+        encoding = get_content_encoding(accept_encoding)
+        if encoding is not None:
+            compressed = compress(retval["body"].encode("utf-8"), encoding)
+            retval["body"] = base64.b64encode(compressed).decode("ascii")
+            retval["isBase64Encoded"] = True
+            retval["headers"]["Content-Encoding"] = encoding
+
     return retval
 
 
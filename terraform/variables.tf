@@ -10,6 +10,11 @@ variable "debug_mode" {
   type    = bool
   default = false
 }
+variable "debug_log_sample_percent" {
+  description = "With debug_mode, the percent of Lambda invocations whose event is logged. see rekognition_api/structured_logging.py"
+  type        = number
+  default     = 100
+}
 variable "aws_profile" {
   description = "a valid AWS CLI profile located in $HOME/.aws/credentials"
   type        = string
@@ -131,3 +136,64 @@ variable "compatible_architectures" {
   description = "A list of architectures (x86_64 or arm64) that the Lambda function is compatible with."
   default     = ["x86_64"]
 }
+
+variable "aws_search_cache_dynamodb" {
+  description = "Create a DynamoDB table to share /search results between Lambda containers"
+  type        = bool
+  default     = false
+}
+variable "aws_search_cache_ttl" {
+  description = "Seconds that /search results are cached. 0 disables the cache"
+  type        = number
+  default     = 300
+}
+variable "aws_info_cache_ttl" {
+  description = "Seconds that each /info Lambda container caches its AWS infrastructure introspection. 0 disables the cache"
+  type        = number
+  default     = 300
+}
+variable "aws_search_cache_max_size" {
+  description = "Number of /search results cached in memory by each Lambda container"
+  type        = number
+  default     = 256
+}
+variable "aws_search_preprocess" {
+  description = "Orient, downscale and re-encode /search images as JPEG before sending them to Rekognition"
+  type        = bool
+  default     = false
+}
+variable "aws_search_preprocess_max_dimension" {
+  description = "Longest side, in pixels, of preprocessed /search images"
+  type        = number
+  default     = 1920
+}
+variable "aws_rekognition_index_faces_tps" {
+  description = "Client-side IndexFaces rate limit, in TPS per Lambda instance. 0 is unlimited. see rekognition_api/rate_limiter.py"
+  type        = number
+  default     = 50
+}
+variable "aws_rekognition_search_faces_tps" {
+  description = "Client-side SearchFacesByImage rate limit, in TPS per Lambda instance. 0 is unlimited"
+  type        = number
+  default     = 50
+}
+variable "aws_faceprint_snapshot" {
+  description = "Resolve /search matches from a memory-mapped snapshot of the faceprint table. see rekognition_api/face_snapshot.py"
+  type        = bool
+  default     = false
+}
+variable "aws_s3_index_suffixes" {
+  description = "Suffixes of the S3 objects that invoke lambda_index. S3 suffix filters are case sensitive"
+  type        = list(string)
+  default     = [".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG"]
+}
+variable "aws_faceprint_snapshot_prefix" {
+  description = "S3 key prefix of the faceprint snapshot and its delta files"
+  type        = string
+  default     = "snapshots/faceprints"
+}
+variable "aws_index_ledger" {
+  description = "Create a DynamoDB ingest ledger so that lambda_index skips already-indexed S3 objects"
+  type        = bool
+  default     = true
+}